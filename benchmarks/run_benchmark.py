@@ -0,0 +1,262 @@
+"""
+Benchmark the migration against local Auth0 and Descope stub servers.
+
+Each phase of main() is run on its own, one after another, then main() is run as a
+whole against an empty Descope stub. For each of them the wall time, users per second,
+requests per user, 429 responses and peak RSS are reported.
+
+Usage: python3 benchmarks/run_benchmark.py --users 5000 --merges 500 --latency 0.02
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from stub_servers import Auth0StubHandler, BenchmarkDataset, DescopeStubHandler, StubServer
+
+SRC_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def current_rss():
+    """
+    Return the resident set size of the process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Without procfs only the peak so far is known, in kilobytes except on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PeakRssSampler:
+    """
+    Samples the resident set size of the process in a background thread, to find its
+    peak while a phase runs. Worker processes, such as the password workers, are not included.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while True:
+            self.peak = max(self.peak, current_rss())
+            if self._stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def measure(name, users, servers, function):
+    """
+    Run a phase and measure it.
+
+    Args:
+    - name (string): The name of the phase.
+    - users (callable): Returns the number of users the phase handled, given the phase result.
+    - servers (dict): The stub servers, keyed by API name.
+    - function (callable): Runs the phase.
+    Returns:
+    - result: The result of the phase.
+    - report (dict): The measurements of the phase.
+    """
+    before = {api: server.snapshot() for api, server in servers.items()}
+    started = time.perf_counter()
+    with PeakRssSampler() as sampler, open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = function()
+    seconds = time.perf_counter() - started
+    after = {api: server.snapshot() for api, server in servers.items()}
+    requests = {api: after[api]["requests"] - before[api]["requests"] for api in servers}
+    count = users(result)
+    report = {
+        "phase": name,
+        "seconds": round(seconds, 3),
+        "users": count,
+        "users_per_second": round(count / seconds, 1) if seconds else None,
+        "auth0_requests": requests["auth0"],
+        "descope_requests": requests["descope"],
+        "requests_per_user": round(sum(requests.values()) / count, 3) if count else None,
+        "rate_limited": sum(after[api]["rate_limited"] - before[api]["rate_limited"] for api in servers),
+        "bytes": sum(
+            after[api]["bytes_in"] + after[api]["bytes_out"] - before[api]["bytes_in"] - before[api]["bytes_out"]
+            for api in servers
+        ),
+        "peak_rss_mb": round(sampler.peak / 2**20, 1),
+    }
+    return result, report
+
+
+def print_reports(reports):
+    columns = [
+        ("phase", "{:<14}"),
+        ("seconds", "{:>9}"),
+        ("users", "{:>8}"),
+        ("users_per_second", "{:>9}"),
+        ("auth0_requests", "{:>8}"),
+        ("descope_requests", "{:>9}"),
+        ("requests_per_user", "{:>9}"),
+        ("rate_limited", "{:>6}"),
+        ("peak_rss_mb", "{:>8}"),
+    ]
+    headers = ["phase", "seconds", "users", "users/s", "auth0", "descope", "req/user", "429s", "RSS MB"]
+    print(" ".join(fmt.format(header) for (_, fmt), header in zip(columns, headers)))
+    for report in reports:
+        print(" ".join(fmt.format("-" if report[key] is None else str(report[key])) for key, fmt in columns))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the migration against local Auth0 and Descope stub servers.")
+    parser.add_argument("--users", type=int, default=1000, help="Number of Auth0 users (default: 1000)")
+    parser.add_argument("--merges", type=int, default=100, help="Number of users with a second account to merge (default: 100)")
+    parser.add_argument("--password-users", type=int, default=1000, help="Number of users in the password file (default: 1000)")
+    parser.add_argument("--roles", type=int, default=10, help="Number of Auth0 roles (default: 10)")
+    parser.add_argument("--organizations", type=int, default=10, help="Number of Auth0 organizations (default: 10)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds each stub request takes (default: 0)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="Share of the requests answered with 429 (default: 0)")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of the 429 responses (default: 1)")
+    parser.add_argument("--source", choices=["auto", "api", "export-job"], default="auto", help="Where the users are read from, the export job beyond 1000 users by default")
+    parser.add_argument("--workers", type=int, default=1, help="Value of the --workers flag (default: 1)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Value of the --batch-size flag")
+    parser.add_argument("--graph-first", action="store_true", help="Also pass --graph-first to main()")
+    parser.add_argument("--skip-main", action="store_true", help="Only benchmark the phases one by one")
+    parser.add_argument("--metrics-file", metavar="file-path", help="Pass --metrics-file to main(), with the specified file")
+    parser.add_argument("--json-out", metavar="file-path", help="Also write the reports to the specified JSON file")
+    args = parser.parse_args()
+    if args.batch_size and args.workers > 1:
+        parser.error("--workers cannot be combined with --batch-size, as for the migration")
+    return args
+
+
+def main():
+    args = parse_args()
+    dataset = BenchmarkDataset(args.users, args.roles, args.organizations, args.merges)
+    auth0_users = len(dataset.users)
+    source = args.source if args.source != "auto" else ("export-job" if auth0_users > 1000 else "api")
+    servers = {
+        api: StubServer(handler, dataset, args.latency, args.rate_limit_ratio, args.retry_after).start()
+        for api, handler in (("auth0", Auth0StubHandler), ("descope", DescopeStubHandler))
+    }
+
+    # The migration reads its configuration on first use, and writes its logs and checkpoint to the working directory
+    work_directory = tempfile.mkdtemp(prefix="migration-benchmark-")
+    password_file = os.path.join(work_directory, "passwords.json")
+    dataset.write_password_file(password_file, args.password_users)
+    os.environ.update(
+        {
+            "AUTH0_TOKEN": "benchmark",
+            "AUTH0_BASE_URL": servers["auth0"].url,
+            "DESCOPE_PROJECT_ID": "P2benchmark",
+            "DESCOPE_MANAGEMENT_KEY": "benchmark",
+            "DESCOPE_BASE_URL": servers["descope"].url,
+        }
+    )
+    os.environ.setdefault("AUTH0_RATE_LIMIT", "1000")
+    os.environ.setdefault("DESCOPE_RATE_LIMIT", "1000")
+    original_directory = os.getcwd()
+    os.chdir(work_directory)
+    sys.path.insert(0, SRC_DIRECTORY)
+    import main as migration
+    import migration_utils
+
+    migration_utils.get_migration_context().configure_logging()
+
+    print(
+        f"Benchmarking {auth0_users} Auth0 users from the {source}, {args.password_users} password users, "
+        f"{args.roles} roles and {args.organizations} organizations"
+    )
+    reports = []
+    try:
+        _, report = measure(
+            "passwords",
+            lambda result: result[0],
+            servers,
+            lambda: migration_utils.process_users_with_passwords(
+                password_file, False, False, args.batch_size or migration_utils.DEFAULT_BATCH_SIZE
+            ),
+        )
+        reports.append(report)
+
+        def migrate_users():
+            if source == "export-job":
+                users = migration_utils.fetch_auth0_users_from_export_job(poll_interval=0)
+            else:
+                users = migration_utils.fetch_auth0_users()
+            return migration_utils.process_users(users, False, source == "export-job", False, args.workers, args.batch_size)
+
+        _, report = measure("users", lambda result: result[4], servers, migrate_users)
+        reports.append(report)
+
+        assignments = migration_utils.DescopeAssignmentAggregator()
+        snapshot = migration_utils.DescopeProjectSnapshot().load()
+        _, report = measure(
+            "roles",
+            lambda result: sum(len(members) for members in dataset.role_members.values()),
+            servers,
+            lambda: migration.migrate_roles(migration.fetch_roles(None), snapshot, False, False, None, assignments),
+        )
+        reports.append(report)
+        _, report = measure(
+            "organizations",
+            lambda result: sum(len(members) for members in dataset.organization_members.values()),
+            servers,
+            lambda: migration.migrate_organizations(
+                migration.fetch_organizations(None), snapshot, False, False, None, assignments
+            ),
+        )
+        reports.append(report)
+        _, report = measure(
+            "assignments",
+            lambda result: len(assignments.roles.keys() | assignments.tenants.keys()),
+            servers,
+            lambda: assignments.apply(),
+        )
+        reports.append(report)
+
+        if not args.skip_main:
+            servers["descope"].reset()
+            migration_utils.metrics.reset()
+            argv = ["main.py", "--with-passwords", password_file, "--workers", str(args.workers)]
+            argv += ["--checkpoint-file", os.path.join(work_directory, "checkpoint.ndjson")]
+            if source == "export-job":
+                argv.append("--from-export-job")
+            if args.batch_size:
+                argv += ["--batch-size", str(args.batch_size)]
+            if args.graph_first:
+                argv.append("--graph-first")
+            if args.metrics_file:
+                argv += ["--metrics-file", os.path.join(original_directory, args.metrics_file)]
+            sys.argv = argv
+            _, report = measure("main", lambda result: auth0_users + args.password_users, servers, migration.main)
+            reports.append(report)
+    finally:
+        os.chdir(original_directory)
+        for server in servers.values():
+            server.stop()
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    print_reports(reports)
+    if args.json_out:
+        with open(args.json_out, "w") as file:
+            json.dump({"arguments": vars(args), "reports": reports}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
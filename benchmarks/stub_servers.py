@@ -0,0 +1,369 @@
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class BenchmarkDataset:
+    """
+    Synthetic Auth0 tenant served by the Auth0 stub.
+
+    Users are password users of the Username-Password-Authentication connection. The
+    first `merges` of them also have a google-oauth2 account with the same email, which
+    the migration merges into a single Descope user. Each user belongs to one role and
+    one organization, and each role grants `permissions_per_role` permissions taken
+    from a pool shared between the roles.
+    """
+
+    def __init__(self, users=1000, roles=10, organizations=10, merges=0, permissions_per_role=5):
+        self.users = []
+        for i in range(users):
+            self.users.append(self._user(i, "auth0", "Username-Password-Authentication"))
+        for i in range(min(merges, users)):
+            self.users.append(self._user(i, "google-oauth2", "google-oauth2"))
+        self.roles = [{"id": f"rol_{i}", "name": f"Role {i}", "description": f"Benchmark role {i}"} for i in range(roles)]
+        self.permissions = {
+            role["id"]: [
+                {
+                    "permission_name": f"read:resource{(i + j) % (roles + permissions_per_role)}",
+                    "description": "Benchmark permission",
+                    "resource_server_identifier": "https://benchmark",
+                }
+                for j in range(permissions_per_role)
+            ]
+            for i, role in enumerate(self.roles)
+        }
+        self.organizations = [
+            {"id": f"org_{i}", "name": f"org-{i}", "display_name": f"Organization {i}"} for i in range(organizations)
+        ]
+        members = [{"user_id": f"auth0|{i}", "email": f"user{i}@example.com", "name": f"User {i}"} for i in range(users)]
+        self.role_members = {role["id"]: members[i :: len(self.roles)] for i, role in enumerate(self.roles)}
+        self.organization_members = {
+            organization["id"]: members[i :: len(self.organizations)] for i, organization in enumerate(self.organizations)
+        }
+
+    @staticmethod
+    def _user(i, provider, connection):
+        return {
+            "user_id": f"{provider}|{i}",
+            "email": f"user{i}@example.com",
+            "email_verified": True,
+            "name": f"User {i}",
+            "given_name": "User",
+            "family_name": str(i),
+            "picture": f"https://example.com/user{i}.png",
+            "blocked": False,
+            "identities": [{"connection": connection, "provider": provider, "user_id": str(i)}],
+        }
+
+    def export_records(self):
+        """Return the users as records of an Auth0 users export, holding the primary identity only."""
+        for user in self.users:
+            record = {key: value for key, value in user.items() if key != "identities"}
+            record["connection"] = user["identities"][0]["connection"]
+            record["provider"] = user["identities"][0]["provider"]
+            yield record
+
+    def write_password_file(self, file_path, count):
+        """Write an Auth0 password export holding `count` users, none of them served by the users API."""
+        with open(file_path, "w") as file:
+            for i in range(count):
+                record = {
+                    "_id": {"$oid": f"{i:024x}"},
+                    "email": f"password{i}@example.com",
+                    "email_verified": True,
+                    "connection": "Username-Password-Authentication",
+                    "passwordHash": "$2b$10$" + "a" * 53,
+                }
+                file.write(json.dumps(record) + "\n")
+
+
+class StubServer:
+    """
+    Runs a stub API on a local port, in a background thread.
+
+    Every request waits `latency` seconds before it is answered, and a `rate_limit_ratio`
+    share of the requests is answered with a 429 response asking to retry after
+    `retry_after` seconds. The requests, 429 responses and bytes are counted, so a
+    benchmark can compare them before and after each phase.
+    """
+
+    def __init__(self, handler, dataset, latency=0.0, rate_limit_ratio=0.0, retry_after=1, seed=0):
+        self.dataset = dataset
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "rate_limited": 0, "bytes_in": 0, "bytes_out": 0}
+        self.lock = threading.Lock()
+        self.reset()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset(self):
+        """Drop the state written to the stub, such as created users."""
+        self.state = {}
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def admit(self, bytes_in):
+        """Count a request, and return whether it should be answered with a 429 response."""
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["bytes_in"] += bytes_in
+            limited = self.rate_limit_ratio > 0 and self.random.random() < self.rate_limit_ratio
+            if limited:
+                self.stats["rate_limited"] += 1
+        return limited
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def stub(self):
+        return self.server.stub
+
+    def do_GET(self):
+        self.handle_request("GET")
+
+    def do_POST(self):
+        self.handle_request("POST")
+
+    def handle_request(self, method):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        if self.stub.latency:
+            time.sleep(self.stub.latency)
+        if self.stub.admit(length):
+            self.send_body(
+                429,
+                json.dumps({"errorCode": "E130429", "errorDescription": "Too many requests"}).encode(),
+                {"Retry-After": str(self.stub.retry_after)},
+            )
+            return
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, response = self.route(method, url.path, query, body)
+        if isinstance(response, bytes):
+            self.send_body(status, response, {"Content-Type": "application/gzip"})
+        else:
+            self.send_body(status, json.dumps(response).encode(), {"Content-Type": "application/json"})
+
+    def send_body(self, status, payload, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+        with self.stub.lock:
+            self.stub.stats["bytes_out"] += len(payload)
+
+    def route(self, method, path, query, body):
+        raise NotImplementedError
+
+
+def paged(items, key, query):
+    """Answer a page of a list endpoint the way the Auth0 management API does."""
+    page = int(query.get("page", 0))
+    per_page = int(query.get("per_page", 50))
+    window = items[page * per_page : (page + 1) * per_page]
+    if query.get("include_totals") != "true":
+        return window
+    return {key: window, "start": page * per_page, "limit": per_page, "length": len(window), "total": len(items)}
+
+
+def checkpoint_paged(items, key, query):
+    """Answer a page of a list endpoint using checkpoint pagination, with take and from."""
+    start = int(query.get("from", 0))
+    take = int(query.get("take", 50))
+    window = items[start : start + take]
+    response = {key: window}
+    if start + take < len(items):
+        response["next"] = str(start + take)
+    return response
+
+
+class Auth0StubHandler(StubHandler):
+    """Serves the Auth0 management API endpoints read by the migration."""
+
+    def route(self, method, path, query, body):
+        dataset = self.stub.dataset
+        parts = path.strip("/").split("/")
+        if method == "GET" and path == "/api/v2/users":
+            return 200, paged(dataset.users, "users", query)
+        if method == "GET" and path == "/api/v2/roles":
+            return 200, paged(dataset.roles, "roles", query)
+        if method == "GET" and parts[:3] == ["api", "v2", "roles"] and len(parts) == 5:
+            if parts[4] == "permissions":
+                return 200, paged(dataset.permissions.get(parts[3], []), "permissions", query)
+            if parts[4] == "users":
+                return 200, checkpoint_paged(dataset.role_members.get(parts[3], []), "users", query)
+        if method == "GET" and path == "/api/v2/organizations":
+            return 200, checkpoint_paged(dataset.organizations, "organizations", query)
+        if method == "GET" and parts[:3] == ["api", "v2", "organizations"] and parts[4:] == ["members"]:
+            return 200, checkpoint_paged(dataset.organization_members.get(parts[3], []), "members", query)
+        if method == "POST" and path == "/api/v2/jobs/users-exports":
+            return 201, {"id": "job_benchmark", "status": "pending"}
+        if method == "GET" and path == "/api/v2/jobs/job_benchmark":
+            return 200, {"id": "job_benchmark", "status": "completed", "location": f"{self.stub.url}/exports/users.json.gz"}
+        if method == "GET" and path == "/exports/users.json.gz":
+            return 200, gzip.compress("".join(json.dumps(record) + "\n" for record in dataset.export_records()).encode())
+        return 404, {"error": "Not Found", "message": f"{method} {path} is not served by the Auth0 stub"}
+
+
+class DescopeStubHandler(StubHandler):
+    """Serves the Descope management API endpoints written by the migration, keeping the project in memory."""
+
+    def route(self, method, path, query, body):
+        state = self.stub.state
+        with self.stub.lock:
+            users = state.setdefault("users", {})
+            login_ids = state.setdefault("login_ids", {})
+            roles = state.setdefault("roles", {})
+            tenants = state.setdefault("tenants", {})
+            permissions = state.setdefault("permissions", {})
+
+            if path == "/v1/mgmt/license":
+                return 200, {"rateLimitTier": "benchmark"}
+            if path == "/v2/mgmt/user/search":
+                found = list(users.values())
+                if body.get("emails"):
+                    emails = set(body["emails"])
+                    found = [user for user in found if user["email"] in emails]
+                if body.get("loginIds"):
+                    found = [users[login_ids[login_id]] for login_id in body["loginIds"] if login_id in login_ids]
+                limit = body.get("limit") or 100
+                page = body.get("page") or 0
+                return 200, {"users": found[page * limit : (page + 1) * limit], "total": len(found)}
+            if path == "/v1/mgmt/user/create":
+                if body["loginId"] in login_ids:
+                    return 409, {"errorCode": "E011002", "errorDescription": "User already exists"}
+                return 200, {"user": self.store_user(body)}
+            if path == "/v1/mgmt/user/create/batch":
+                created, failed = [], []
+                for user in body["users"]:
+                    if user["loginId"] in login_ids:
+                        failed.append({"user": {"loginIds": [user["loginId"]]}, "failure": "User already exists"})
+                    else:
+                        created.append(self.store_user(user))
+                return 200, {"createdUsers": created, "failedUsers": failed}
+            if path == "/v1/mgmt/user/update":
+                if body["loginId"] not in login_ids:
+                    return 400, {"errorCode": "E011003", "errorDescription": "User not found"}
+                previous = users.pop(login_ids[body["loginId"]])
+                for login_id in previous["loginIds"]:
+                    login_ids.pop(login_id, None)
+                body.setdefault("status", previous["status"])
+                return 200, {"user": self.store_user(body, previous["userId"])}
+            if path == "/v1/mgmt/user/patch/batch":
+                patched, failed = [], []
+                for patch in body["users"]:
+                    if patch["loginId"] not in login_ids:
+                        failed.append({"user": {"loginIds": [patch["loginId"]]}, "failure": "User not found"})
+                        continue
+                    user = users[login_ids[patch["loginId"]]]
+                    for key, value in patch.items():
+                        if key != "loginId":
+                            user["name" if key == "displayName" else key] = value
+                    patched.append(user)
+                return 200, {"patchedUsers": patched, "failedUsers": failed}
+            if path == "/v1/mgmt/user/update/status":
+                users[login_ids[body["loginId"]]]["status"] = body["status"]
+                return 200, {"user": users[login_ids[body["loginId"]]]}
+            if path == "/v2/mgmt/user/update/role/add":
+                user = users[login_ids[body["loginId"]]]
+                user["roleNames"] = sorted(set(user["roleNames"]) | set(body.get("roleNames") or []))
+                return 200, {"user": user}
+            if path == "/v1/mgmt/user/update/tenant/add":
+                user = users[login_ids[body["loginId"]]]
+                if body["tenantId"] not in [tenant["tenantId"] for tenant in user["userTenants"]]:
+                    user["userTenants"].append({"tenantId": body["tenantId"], "roleNames": []})
+                return 200, {"user": user}
+            if path == "/v1/mgmt/user/customattribute/create":
+                return 200, {}
+            if path == "/v1/mgmt/permission/all":
+                return 200, {"permissions": list(permissions.values())}
+            if path == "/v1/mgmt/permission/create":
+                permissions[body["name"]] = body
+                return 200, {}
+            if path == "/v1/mgmt/permission/create/batch":
+                for permission in body["permissions"]:
+                    permissions[permission["name"]] = permission
+                return 200, {}
+            if path == "/v1/mgmt/role/all":
+                return 200, {"roles": list(roles.values())}
+            if path == "/v1/mgmt/role/search":
+                names = set(body.get("roleNames") or roles)
+                return 200, {"roles": [role for name, role in roles.items() if name in names]}
+            if path == "/v1/mgmt/role/create":
+                if body["name"] in roles:
+                    return 409, {"errorCode": "E074106", "errorDescription": "Role already exists"}
+                roles[body["name"]] = body
+                return 200, {}
+            if path == "/v1/mgmt/role/create/batch":
+                if any(role["name"] in roles for role in body["roles"]):
+                    return 409, {"errorCode": "E074106", "errorDescription": "Role already exists"}
+                for role in body["roles"]:
+                    roles[role["name"]] = role
+                return 200, {}
+            if path == "/v1/mgmt/tenant/all":
+                return 200, {"tenants": list(tenants.values())}
+            if path == "/v1/mgmt/tenant" and method == "GET":
+                if query.get("id") not in tenants:
+                    return 400, {"errorCode": "E074100", "errorDescription": "Tenant not found"}
+                return 200, tenants[query["id"]]
+            if path == "/v1/mgmt/tenant/create":
+                if body.get("id") in tenants:
+                    return 409, {"errorCode": "E074101", "errorDescription": "Tenant already exists"}
+                tenants[body["id"]] = body
+                return 200, {"id": body["id"]}
+        return 404, {"errorCode": "E000404", "errorDescription": f"{method} {path} is not served by the Descope stub"}
+
+    def store_user(self, body, user_id=None):
+        state = self.stub.state
+        user_id = user_id or f"U{len(state['users']):08d}"
+        user = {
+            "userId": user_id,
+            "loginIds": [body["loginId"]] + list(body.get("additionalLoginIds") or []),
+            "email": body.get("email"),
+            "phone": body.get("phone"),
+            "name": body.get("displayName"),
+            "givenName": body.get("givenName", ""),
+            "familyName": body.get("familyName", ""),
+            "picture": body.get("picture", ""),
+            "verifiedEmail": body.get("verifiedEmail", False),
+            "verifiedPhone": body.get("verifiedPhone", False),
+            "customAttributes": body.get("customAttributes") or {},
+            "roleNames": list(body.get("roleNames") or []),
+            "userTenants": list(body.get("userTenants") or []),
+            "status": body.get("status", "invited"),
+        }
+        state["users"][user_id] = user
+        for login_id in user["loginIds"]:
+            state["login_ids"][login_id] = user_id
+        return user
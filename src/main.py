@@ -1,9 +1,94 @@
-from migration_utils import fetch_auth0_users, process_users, fetch_auth0_roles, process_roles, fetch_auth0_organizations, process_auth0_organizations, process_users_with_passwords, fetch_auth0_users_from_file
+from migration_utils import fetch_auth0_users, process_users, fetch_auth0_roles, process_roles, fetch_auth0_organizations, process_auth0_organizations, process_users_with_passwords, fetch_auth0_users_from_file, fetch_auth0_users_from_export_job, DEFAULT_BATCH_SIZE, AUTH0_USERS_API_LIMIT, DescopeUserIndex, DescopeProjectSnapshot, DescopeAssignmentAggregator, MigrationCheckpoint, PhaseScheduler, get_migration_context, metrics, MigrationPlanner, get_permissions_for_roles, get_users_in_roles, fetch_auth0_organizations_members, read_auth0_export, iter_prefetched, MigrationPlanExecutor
+from descope import AuthException
+import logging
+import os
 import sys
 import argparse
 import json
 
 
+def fetch_roles(checkpoint):
+    """
+    Fetch the Auth0 roles, unless they were migrated before resuming.
+    """
+    return [] if checkpoint and checkpoint.is_completed("roles") else fetch_auth0_roles()
+
+
+def fetch_organizations(checkpoint):
+    """
+    Fetch the Auth0 Organizations, unless they were migrated before resuming.
+    """
+    return [] if checkpoint and checkpoint.is_completed("organizations") else fetch_auth0_organizations()
+
+
+def migrate_roles(auth0_roles, descope_snapshot, dry_run, verbose, checkpoint, assignments):
+    """
+    Create, and associate users with roles and permissions.
+    """
+    return (auth0_roles,) + process_roles(auth0_roles, dry_run, verbose, checkpoint, descope_snapshot, assignments)
+
+
+def migrate_organizations(auth0_organizations, descope_snapshot, dry_run, verbose, checkpoint, assignments):
+    """
+    Create, and associate users with Organizations.
+    """
+    return (auth0_organizations,) + process_auth0_organizations(auth0_organizations, dry_run, verbose, checkpoint, descope_snapshot, assignments)
+
+
+def plan_migration(plan_file_path, passwords_file_path, fetch_users):
+    """
+    Write the plan of the migration to a file, without any write to Descope.
+
+    The Auth0 roles, organizations and their members are fetched while the existing
+    Descope users, roles, tenants and permissions are loaded, once each.
+    """
+    scheduler = PhaseScheduler()
+    scheduler.add("auth0_roles", fetch_auth0_roles)
+    scheduler.add("auth0_organizations", fetch_auth0_organizations)
+    scheduler.add("descope_snapshot", lambda: DescopeProjectSnapshot().load())
+    scheduler.add("user_index", lambda: DescopeUserIndex().load())
+    scheduler.add(
+        "role_graph",
+        lambda auth0_roles: (
+            get_permissions_for_roles([role["id"] for role in auth0_roles]),
+            get_users_in_roles([role["id"] for role in auth0_roles]),
+        ),
+        inputs=("auth0_roles",),
+    )
+    scheduler.add(
+        "organization_members",
+        lambda auth0_organizations: fetch_auth0_organizations_members([organization["id"] for organization in auth0_organizations]),
+        inputs=("auth0_organizations",),
+    )
+    results = scheduler.run()
+
+    print(f"Writing the migration plan to {plan_file_path}")
+    with open(plan_file_path, "w") as file:
+        planner = MigrationPlanner(file, results["descope_snapshot"], results["user_index"])
+        planner.plan_custom_attributes()
+        planner.plan_roles(results["auth0_roles"], *results["role_graph"])
+        planner.plan_organizations(results["auth0_organizations"], results["organization_members"])
+        if passwords_file_path:
+            planner.plan_password_users(read_auth0_export(passwords_file_path))
+        planner.plan_users(iter_prefetched(fetch_users(), DEFAULT_BATCH_SIZE))
+        planner.plan_assignments()
+    print("=================== Migration Plan =============================")
+    for line in planner.summary():
+        print(line)
+
+
+def execute_plan(plan_file_path, workers, batch_size):
+    """
+    Execute a migration plan written with --plan-out, without reading from Auth0.
+    """
+    print(f"Executing the migration plan {plan_file_path}")
+    executor = MigrationPlanExecutor(workers, batch_size)
+    executor.execute(plan_file_path)
+    print("=================== Plan Execution =============================")
+    for line in executor.summary():
+        print(line)
+
+
 def main():
     """
     Main function to process Auth0 users, roles, permissions, and organizations, creating and mapping them together within your Descope project.
@@ -21,10 +106,37 @@ def main():
     parser.add_argument('--verbose','-v', action='store_true',help='Enable verbose printing for live runs and dry runs')
     parser.add_argument('--with-passwords', nargs=1, metavar='file-path', help='Run the script with passwords from the specified file')
     parser.add_argument('--from-json', nargs=1, metavar='file-path', help='Run the script with users from the specified file rather than API')
+    parser.add_argument('--no-enrich', action='store_true', help='Use the users from the --from-json file as they are, without fetching missing fields via API')
+    parser.add_argument('--from-export-job', action='store_true', help='Run the script with users from an Auth0 users export job rather than the paged users API')
+    parser.add_argument('--workers', type=int, default=1, metavar='N', help='Migrate up to N users concurrently (default: 1)')
+    parser.add_argument('--prefetch-descope-users', action='store_true', help='Load the existing Descope users once instead of searching Descope for every user')
+    parser.add_argument('--batch-size', type=int, metavar='N', help=f'Create new users in batches of N, password users are always batched (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--checkpoint-file', default='migration_checkpoint.ndjson', metavar='file-path', help='Record the migration progress to the specified file (default: migration_checkpoint.ndjson)')
+    parser.add_argument('--resume', action='store_true', help='Resume an interrupted migration, skipping the work recorded in the checkpoint file')
+    parser.add_argument('--overwrite-checkpoint', action='store_true', help='Start a new migration even though the checkpoint file records an earlier one')
+    parser.add_argument('--graph-first', action='store_true', help='Migrate the roles and organizations first, and create new users with their roles and tenants already set')
+    parser.add_argument('--plan-out', metavar='file-path', help='Dry run which writes every planned Descope write to the specified NDJSON file, reading the Descope project once')
+    parser.add_argument('--execute-plan', metavar='file-path', help='Execute the migration plan written with --plan-out, sending up to --workers Descope requests at once, without reading from Auth0')
+    parser.add_argument('--metrics-file', metavar='file-path', help='Write the request and phase metrics to the specified file, as Prometheus text if it ends with .prom or .txt and as JSON otherwise')
     
     args = parser.parse_args()
+    if args.batch_size and args.workers > 1 and not args.execute_plan:
+        parser.error('--workers cannot be combined with --batch-size, new users are created one batch at a time')
+    # A new live run would truncate the checkpoint, the only record of an interrupted migration
+    live_run = not (args.dry_run or args.plan_out or args.execute_plan)
+    checkpoint_exists = os.path.exists(args.checkpoint_file) and os.path.getsize(args.checkpoint_file) > 0
+    if live_run and checkpoint_exists and not (args.resume or args.overwrite_checkpoint):
+        parser.error(f'{args.checkpoint_file} records an earlier migration, pass --resume to resume it or --overwrite-checkpoint to start over')
+    get_migration_context().configure_logging()
+
+    if args.execute_plan:
+        execute_plan(args.execute_plan, args.workers, args.batch_size or DEFAULT_BATCH_SIZE)
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+            print(f"Metrics written to {args.metrics_file}")
+        return
 
-    if args.dry_run:
+    if args.dry_run or args.plan_out:
         dry_run=True
     
     if args.verbose:
@@ -35,30 +147,122 @@ def main():
         with_passwords = True
         print(f"Running with passwords from file: {passwords_file_path}")
 
-    if with_passwords:
-        found_password_users, successful_password_users, failed_password_users = process_users_with_passwords(passwords_file_path, dry_run, verbose)
-    
+    checkpoint = None
+    if dry_run == False:
+        checkpoint = MigrationCheckpoint(args.checkpoint_file, resume=args.resume)
+
     if args.from_json:
         json_file_path = args.from_json[0]
         from_json=True
+    if args.from_export_job:
+        from_json=True
 
-    # Fetch and Create Users
-    if from_json == False:
-        auth0_users = fetch_auth0_users()
-        # print(auth0_users)
-    else:
-        auth0_users = fetch_auth0_users_from_file(json_file_path)
-        
-    
-    failed_users, successful_migrated_users, merged_users, disabled_users_mismatch = process_users(auth0_users, dry_run, from_json, verbose)
+    # The users API only pages through its first users, so a resume must not start past them
+    if checkpoint and from_json == False and not checkpoint.is_completed("users") and checkpoint.position("users") >= AUTH0_USERS_API_LIMIT:
+        checkpoint.close()
+        parser.error(f'Unable to resume after {checkpoint.position("users")} users, the Auth0 users API returns at most {AUTH0_USERS_API_LIMIT} users, resume with the --from-export-job or --from-json flag the migration was started with')
+
+    if args.plan_out:
+        def fetch_users():
+            if args.from_export_job:
+                return fetch_auth0_users_from_export_job()
+            if from_json:
+                return fetch_auth0_users_from_file(json_file_path, enrich=not args.no_enrich)
+            return fetch_auth0_users()
+
+        plan_migration(args.plan_out, passwords_file_path, fetch_users)
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+            print(f"Metrics written to {args.metrics_file}")
+        return
+
+    # Gather the roles and tenants of each user, to assign them with one update per user
+    assignments = DescopeAssignmentAggregator() if dry_run == False else None
+    graph_first = args.graph_first and assignments is not None
 
-    # Fetch, create, and associate users with roles and permissions
-    auth0_roles = fetch_auth0_roles()
-    failed_roles, successful_migrated_roles, roles_exist_descope, failed_permissions, successful_migrated_permissions, total_existing_permissions_descope, roles_and_users, failed_roles_and_users = process_roles(auth0_roles, dry_run, verbose)
+    # Auth0 reads start at once, and each Descope write phase once its prerequisites are met
+    scheduler = PhaseScheduler()
+    scheduler.add("auth0_roles", lambda: fetch_roles(checkpoint))
+    scheduler.add("auth0_organizations", lambda: fetch_organizations(checkpoint))
 
-    # Fetch, create, and associate users with Organizations
-    auth0_organizations = fetch_auth0_organizations()
-    successful_tenant_creation, tenant_exists_descope, failed_tenant_creation, failed_users_added_tenants, tenant_users = process_auth0_organizations(auth0_organizations, dry_run, verbose)
+    # Load the existing Descope roles and tenants once, rather than checking each of them.
+    # If they cannot be loaded, each of them is checked with Descope as it is migrated.
+    def load_descope_snapshot():
+        if dry_run == False and not (checkpoint.is_completed("roles") and checkpoint.is_completed("organizations")):
+            try:
+                return DescopeProjectSnapshot().load()
+            except AuthException as error:
+                logging.error(f"Unable to load the Descope roles, tenants and permissions. Error: {error.error_message}")
+                print("Unable to load the Descope roles and tenants, checking each of them with Descope instead")
+        return None
+
+    def load_user_index():
+        if args.prefetch_descope_users and dry_run == False and not checkpoint.is_completed("users"):
+            try:
+                return DescopeUserIndex().load()
+            except AuthException as error:
+                logging.error(f"Unable to load the Descope users. Error: {error.error_message}")
+                print("Unable to load the Descope users, searching Descope for each user instead")
+        return None
+
+    scheduler.add("descope_snapshot", load_descope_snapshot)
+    scheduler.add("user_index", load_user_index)
+
+    # Graph-first runs create the users with the roles and tenants gathered beforehand.
+    # Otherwise the roles and tenants are assigned at the end, so roles and organizations
+    # are migrated while the users are, except in dry runs which print them in order.
+    user_phases_after = ("roles", "organizations") if graph_first else ()
+    if with_passwords:
+        scheduler.add(
+            "passwords",
+            lambda: process_users_with_passwords(passwords_file_path, dry_run, verbose, args.batch_size or DEFAULT_BATCH_SIZE, checkpoint, assignments if graph_first else None),
+            after=user_phases_after,
+        )
+        user_phases_after += ("passwords",)
+
+    # Fetch and Create Users, skipping the users already migrated before resuming
+    def migrate_users(user_index):
+        skip = checkpoint.position("users") if checkpoint else 0
+        if args.from_export_job:
+            auth0_users = fetch_auth0_users_from_export_job(skip=skip, checkpoint=checkpoint)
+        elif from_json == False:
+            auth0_users = fetch_auth0_users(skip=skip)
+        else:
+            auth0_users = fetch_auth0_users_from_file(json_file_path, enrich=not args.no_enrich, skip=skip)
+        return process_users(auth0_users, dry_run, from_json, verbose, args.workers, args.batch_size, user_index, checkpoint, assignments if graph_first else None)
+
+    scheduler.add("users", migrate_users, inputs=("user_index",), after=user_phases_after)
+    scheduler.add(
+        "roles",
+        lambda auth0_roles, descope_snapshot: migrate_roles(auth0_roles, descope_snapshot, dry_run, verbose, checkpoint, assignments),
+        inputs=("auth0_roles", "descope_snapshot"),
+        after=("users",) if dry_run else (),
+    )
+    scheduler.add(
+        "organizations",
+        lambda auth0_organizations, descope_snapshot: migrate_organizations(auth0_organizations, descope_snapshot, dry_run, verbose, checkpoint, assignments),
+        inputs=("auth0_organizations", "descope_snapshot"),
+        after=("roles",) if dry_run else (),
+    )
+
+    # Users created with their roles and tenants in graph-first mode are skipped here
+    def assign_roles_and_tenants(user_index):
+        print("Assigning roles and tenants to the migrated users")
+        return assignments.summarize(assignments.apply(user_index, checkpoint=checkpoint))
+
+    if assignments is not None:
+        scheduler.add("assignments", assign_roles_and_tenants, inputs=("user_index",), after=user_phases_after + ("users", "roles", "organizations"))
+
+    results = scheduler.run()
+    if with_passwords:
+        found_password_users, successful_password_users, failed_password_users = results["passwords"]
+    failed_users, successful_migrated_users, merged_users, disabled_users_mismatch, found_users = results["users"]
+    auth0_roles, failed_roles, successful_migrated_roles, roles_exist_descope, failed_permissions, successful_migrated_permissions, total_existing_permissions_descope, roles_and_users, failed_roles_and_users = results["roles"]
+    auth0_organizations, successful_tenant_creation, tenant_exists_descope, failed_tenant_creation, failed_users_added_tenants, tenant_users = results["organizations"]
+    if assignments is not None:
+        roles_and_users, failed_roles_and_users, tenant_users, failed_users_added_tenants = results["assignments"]
+    if checkpoint:
+        checkpoint.close()
     if dry_run == False:
         if with_passwords:
             print("=================== Password User Migration ====================")
@@ -68,11 +272,11 @@ def main():
                 print(f"Failed to migrate {len(failed_password_users)}")
                 print(f"Users which failed to migrate:")
                 for failed_user in failed_password_users:
-                    print(failed_password_users)
+                    print(failed_user)
             print(f"Created users within Descope {successful_password_users}")
 
         print("=================== User Migration =============================")
-        print(f"Auth0 Users found via API {len(auth0_users)}")
+        print(f"Auth0 Users found via API {found_users}")
         print(f"Successfully migrated {successful_migrated_users} users")
         print(f"Successfully merged {len(merged_users)} users")
         if verbose:
@@ -136,5 +340,9 @@ def main():
             for failed_users_added_tenant in failed_users_added_tenants:
                 print(failed_users_added_tenant)
 
+    if args.metrics_file:
+        metrics.write(args.metrics_file)
+        print(f"Metrics written to {args.metrics_file}")
+
 if __name__ == "__main__":
     main()
@@ -1,14 +1,53 @@
+import asyncio
+import gzip
+import importlib.util
+import inspect
+import io
 import json
+import mmap
+import multiprocessing
 import os
+import queue
 import sys
 import requests
 from dotenv import load_dotenv
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import select_proxy
 import logging
+import threading
 import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
+from itertools import islice
+from typing import Optional
+from urllib.parse import urlencode, urlparse
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+# httpx only sends HTTP/2 with the h2 package, installed by httpx[http2]
+if httpx is not None and importlib.util.find_spec("h2") is None:
+    httpx = None
+
+# Faster JSON parsers for the export files, the standard library is used if neither is installed
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 from descope import (
+    API_RATE_LIMIT_RETRY_AFTER_HEADER,
     AuthException,
+    RateLimitException,
     DescopeClient,
     AssociatedTenant,
     RoleMapping,
@@ -18,664 +57,3198 @@ from descope import (
     UserObj
 )
 
-log_directory = "logs"
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
+DEFAULT_BATCH_SIZE = 500
 
-# datetime object containing current date and time
-now = datetime.now()
+# Fields the user mapping requires, exported users missing any of them are enriched via API
+AUTH0_REQUIRED_USER_FIELDS = ("identities",)
+AUTH0_ENRICH_BATCH_SIZE = 50
+AUTH0_ENRICH_WORKERS = 4
 
-dt_string = now.strftime("%d_%m_%Y_%H:%M:%S")
-logging_file_name = os.path.join(log_directory, f"migration_log_{dt_string}.log")
-logging.basicConfig(
-    filename=logging_file_name,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+# Pages of the Auth0 list endpoints fetched at once, the largest page size Auth0 allows,
+# and the most users the users API returns
+AUTH0_PAGE_SIZE = 100
+AUTH0_USERS_API_LIMIT = 1000
 
-"""Load and read environment variables from .env file"""
-load_dotenv()
-AUTH0_TOKEN = os.getenv("AUTH0_TOKEN")
-AUTH0_TENANT_ID = os.getenv("AUTH0_TENANT_ID")
-DESCOPE_PROJECT_ID = os.getenv("DESCOPE_PROJECT_ID")
-DESCOPE_MANAGEMENT_KEY = os.getenv("DESCOPE_MANAGEMENT_KEY")
+# Users are paged in creation order, so the users skipped on resume are the ones already migrated
+AUTH0_USERS_PATH = "/api/v2/users?sort=created_at:1"
 
-try:
-    descope_client = DescopeClient(
-        project_id=DESCOPE_PROJECT_ID, management_key=DESCOPE_MANAGEMENT_KEY
-    )
-except AuthException as error:
-    logging.error(f"Failed to initialize Descope Client: {error}")
-    sys.exit()
+# Number of users whose roles and tenants are updated with each Descope request
+ASSIGNMENT_BATCH_SIZE = 100
+
+# Custom attributes of the migrated users, created in Descope before the users
+DESCOPE_CUSTOM_ATTRIBUTES = {"connection": "String", "freshlyMigrated": "Boolean"}
 
+# Fields requested from Auth0 users export jobs, the export holds the primary identity only
+AUTH0_EXPORT_FIELDS = [
+    {"name": "user_id"},
+    {"name": "email"},
+    {"name": "email_verified"},
+    {"name": "name"},
+    {"name": "given_name"},
+    {"name": "family_name"},
+    {"name": "picture"},
+    {"name": "phone_number"},
+    {"name": "phone_verified"},
+    {"name": "blocked"},
+    {"name": "identities[0].connection", "export_as": "connection"},
+    {"name": "identities[0].provider", "export_as": "provider"},
+]
 
-def api_request_with_retry(action, url, headers, data=None, max_retries=4, timeout=10):
+
+class MigrationContext:
     """
-    Handles API requests with additional retry on timeout and rate limit.
+    The configuration of a migration, read from the environment variables, and the
+    Descope client built from it.
+
+    Importing this module has no side effects: the context is created on first use by
+    get_migration_context(), which loads the .env file, and the Descope client is only
+    built when the first Descope call is made. Logging to a file is configured by
+    configure_logging(), which the command line calls. A dry run or a test therefore
+    needs no credentials, and a test can set its own context with set_migration_context().
 
     Args:
-    - action (string): 'get' or 'post'
-    - url (string): The URL of the path for the api request
-    - headers (dict): Headers to be sent with the request
-    - data (json): Optional and used only for post, but the payload to post
-    - max_retries (int): The max number of retries
-    - timeout (int): The timeout for the request in seconds
-    Returns:
-    - API Response
-    - Or None
+    - environ (dict): The environment variables to read, os.environ by default.
     """
-    retries = 0
-    while retries < max_retries:
-        try:
-            if action == "get":
-                response = requests.get(url, headers=headers, timeout=timeout)
-            else:
-                response = requests.post(
-                    url, headers=headers, data=data, timeout=timeout
-                )
-
-            if (
-                response.status_code != 429
-            ):  # Not a rate limit error, proceed with response
-                return response
 
-            # If rate limit error, prepare for retry
-            retries += 1
-            wait_time = 5**retries
-            logging.info(f"Rate limit reached. Retrying in {wait_time} seconds...")
-            time.sleep(wait_time)
+    def __init__(self, environ=None):
+        environ = os.environ if environ is None else environ
+        self.auth0_token = environ.get("AUTH0_TOKEN")
+        self.auth0_tenant_id = environ.get("AUTH0_TENANT_ID")
+        self.auth0_base_url = environ.get("AUTH0_BASE_URL", f"https://{self.auth0_tenant_id}.us.auth0.com")
+        self.descope_project_id = environ.get("DESCOPE_PROJECT_ID")
+        self.descope_management_key = environ.get("DESCOPE_MANAGEMENT_KEY")
+        # Left unset, the Descope SDK derives the API URL of the project from its ID
+        self.descope_base_url_override = environ.get("DESCOPE_BASE_URL")
+        self.descope_base_url = self.descope_base_url_override or "https://api.descope.com"
 
-        except requests.exceptions.ReadTimeout as e:
-            # Handle read timeout exception
-            logging.warning(f"Read timed out. (read timeout={timeout}): {e}")
-            retries += 1
-            wait_time = 5**retries
-            logging.info(f"Retrying attempt {retries}/{max_retries}...")
-            time.sleep(
-                wait_time
-            )  # Wait for 5 seconds before retrying or use a backoff strategy
+        # Requests per second sent to each upstream, lowered at runtime by its rate limit responses
+        self.auth0_rate_limit = float(environ.get("AUTH0_RATE_LIMIT", "10"))
+        self.descope_rate_limit = float(environ.get("DESCOPE_RATE_LIMIT", "50"))
+        # Pages of the Auth0 list endpoints fetched at once
+        self.auth0_fetch_concurrency = int(environ.get("AUTH0_FETCH_CONCURRENCY", "4"))
+        # Connections kept open per host, and whether to use HTTP/2 for the Auth0 and Descope APIs
+        self.http_pool_size = int(environ.get("HTTP_POOL_SIZE", "10"))
+        self.http2_enabled = environ.get("HTTP2_ENABLED", "false").lower() == "true"
+        # Password exports are split into shards of about password_shard_size bytes, migrated by password_workers processes
+        self.password_shard_size = int(environ.get("PASSWORD_SHARD_SIZE", str(64 * 1024 * 1024)))
+        self.password_workers = int(environ.get("PASSWORD_WORKERS", str(os.cpu_count() or 1)))
+        # Seconds between two progress lines when the output is not a terminal, which is redrawn every second
+        self.progress_interval = float(environ.get("PROGRESS_INTERVAL", "30"))
+        # Parser of the export files, the fastest installed one when unset
+        self.json_backend_name = environ.get("JSON_BACKEND")
 
-        except requests.exceptions.RequestException as e:
-            # Handle other request exceptions
-            logging.error(f"A request exception occurred: {e}")
-            break  # In case of other exceptions, you may want to break the loop
+        self.log_file = None
+        self._descope_client = None
+        self._json_backend = None
+        self._lock = threading.Lock()
 
-    logging.error("Max retries reached. Giving up.")
-    return None
+    def __getstate__(self):
+        # Sent to the password worker processes, which build their own Descope client and parsers
+        state = self.__dict__.copy()
+        state["_descope_client"] = None
+        state["_json_backend"] = None
+        del state["_lock"]
+        return state
 
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
 
-### Begin Auth0 Actions
+    @classmethod
+    def from_env(cls, env_file=None):
+        """
+        Create the context from the environment variables, after loading the .env file.
 
-def fetch_auth0_users_from_file(file_path):
-    """
-    Fetch and parse Auth0 users from the provided file.
-    
-    Returns:
-    - all_users (list): A list of parsed Auth0 users if successful, empty list otherwise.
-    """
-    file_users = []  # Renamed to avoid confusion with API users
-    all_users = []
-    with open(file_path, "r") as file:
-        for line in file:
-            file_users.append(json.loads(line))
-    
-    for user in file_users:
-        headers = {"Authorization": f"Bearer {AUTH0_TOKEN}"}
-        page = 0
-        per_page = 20
-        
-        while True:
-            response = api_request_with_retry(
-                "get",
-                f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/users?page={page}&per_page={per_page}&q=user_id:\"{user['user_id']}\"",
-                headers=headers,
-            )
-            if response.status_code != 200:
-                logging.error(f"Error fetching Auth0 users. Status code: {response.status_code}")
-                break  # Consider breaking instead of returning to continue with the next user
-            users_from_api = response.json()
-            if not users_from_api:
-                break
-            all_users.extend(users_from_api)
-            page += 1
-    return all_users
+        Args:
+        - env_file (string): The path of the .env file, searched from the working directory by default.
+        Returns:
+        - MigrationContext: The context.
+        """
+        load_dotenv(env_file)
+        return cls()
 
-def fetch_auth0_users():
-    """
-    Fetch and parse Auth0 users from the provided endpoint.
+    def configure_logging(self, log_directory="logs"):
+        """
+        Log to a new file within the log directory, named after the current date and time.
 
-    Returns:
-    - all_users (Dict): A list of parsed Auth0 users if successful, empty list otherwise.
-    """
-    headers = {"Authorization": f"Bearer {AUTH0_TOKEN}"}
-    page = 0
-    per_page = 20
-    all_users = []
-    while True:
-        response = api_request_with_retry(
-            "get",
-            f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/users?page={page}&per_page={per_page}",
-            headers=headers,
+        Args:
+        - log_directory (string): The directory of the log files, created if missing.
+        Returns:
+        - string: The path of the log file.
+        """
+        if not os.path.exists(log_directory):
+            os.makedirs(log_directory)
+        dt_string = datetime.now().strftime("%d_%m_%Y_%H:%M:%S")
+        self.log_file = os.path.join(log_directory, f"migration_log_{dt_string}.log")
+        logging.basicConfig(
+            filename=self.log_file,
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
         )
-        if response.status_code != 200:
-            logging.error(
-                f"Error fetching Auth0 users. Status code: {response.status_code}"
-            )
-            return all_users
-        users = response.json()
-        if not users:
-            break
-        all_users.extend(users)
-        page += 1
-    return all_users
+        return self.log_file
 
+    @property
+    def json_backend(self):
+        """
+        The JSON parser of the export files, picked on first use as load_json_backend() does.
+        """
+        if self._json_backend is None:
+            self._json_backend = load_json_backend(self.json_backend_name)
+        return self._json_backend
 
-def fetch_auth0_roles():
-    """
-    Fetch and parse Auth0 roles from the provided endpoint.
+    @property
+    def descope_client(self):
+        """
+        The rate limited Descope client, built on first use.
+        """
+        with self._lock:
+            if self._descope_client is None:
+                try:
+                    self._descope_client = RateLimitedClient(
+                        DescopeClient(
+                            project_id=self.descope_project_id,
+                            management_key=self.descope_management_key,
+                            base_url=self.descope_base_url_override,
+                        ),
+                        descope_rate_limiter,
+                    )
+                except AuthException as error:
+                    logging.error(f"Failed to initialize Descope Client: {error}")
+                    sys.exit()
+        return self._descope_client
 
-    Returns:
-    - all_roles (Dict): A list of parsed Auth0 roles if successful, empty list otherwise.
-    """
-    headers = {"Authorization": f"Bearer {AUTH0_TOKEN}"}
-    page = 0
-    per_page = 20
-    all_roles = []
-    while True:
-        response = api_request_with_retry(
-            "get",
-            f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/roles?page={page}&per_page={per_page}",
-            headers=headers,
-        )
-        if response.status_code != 200:
-            logging.error(
-                f"Error fetching Auth0 roles. Status code: {response.status_code}"
-            )
-            return all_roles
-        roles = response.json()
-        if not roles:
-            break
-        all_roles.extend(roles)
-        page += 1
-    return all_roles
 
+_migration_context = None
+_migration_context_lock = threading.Lock()
 
-def get_users_in_role(role):
+
+def get_migration_context():
     """
-    Get and parse Auth0 users associated with the provided role.
+    Get the context of the migration, creating it from the environment on first use.
 
     Returns:
-    - role (string): The role ID to get the associated members
+    - MigrationContext: The current context.
     """
-    headers = {"Authorization": f"Bearer {AUTH0_TOKEN}"}
-    page = 0
-    per_page = 20
-    all_users = []
-
-    while True:
-        response = api_request_with_retry(
-            "get",
-            f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/roles/{role}/users?page={page}&per_page={per_page}",
-            headers=headers,
-        )
-        if response.status_code != 200:
-            logging.error(
-                f"Error fetching Auth0 users in roles. Status code: {response.status_code}"
-            )
-            return all_users
-        users = response.json()
-        if not users:
-            break
-        all_users.extend(users)
-        page += 1
-    return all_users
+    with _migration_context_lock:
+        if _migration_context is None:
+            _apply_migration_context(MigrationContext.from_env())
+    return _migration_context
 
 
-def get_permissions_for_role(role):
+def set_migration_context(context):
     """
-    Get and parse Auth0 permissions for a role
+    Use a context built by the caller, such as a test or a tool embedding the migration.
 
     Args:
-    - role (string): The id of the role to query for permissions
-    Returns:
-    - all_permissions (string): Dictionary of all permissions associated to the role.
+    - context (MigrationContext): The context to use from now on.
     """
-    headers = {"Authorization": f"Bearer {AUTH0_TOKEN}"}
-    page = 0
-    per_page = 20
-    all_permissions = []
+    with _migration_context_lock:
+        _apply_migration_context(context)
 
-    while True:
-        response = api_request_with_retry(
-            "get",
-            f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/roles/{role}/permissions?per_page={per_page}&page={page}",
-            headers=headers,
-        )
-        if response.status_code != 200:
-            logging.error(
-                f"Error fetching Auth0 permissions in roles. Status code: {response.status_code}"
-            )
-            return all_permissions
-        permissions = response.json()
-        if not permissions:
-            break
-        all_permissions.extend(permissions)
-        page += 1
-    return all_permissions
 
+def _apply_migration_context(context):
+    global _migration_context, _http_session
+    _migration_context = context
+    auth0_rate_limiter.reset(context.auth0_rate_limit)
+    descope_rate_limiter.reset(context.descope_rate_limit)
+    # The shared session mounts its HTTP/2 adapter on the URLs of the context
+    _http_session = None
 
-def fetch_auth0_organizations():
-    """
-    Fetch and parse Auth0 organization members from the provided endpoint.
 
-    Returns:
-    - all_organizations (string): Dictionary of all organizations within the Auth0 tenant.
+class LazyDescopeClient:
+    """
+    Stands for the Descope client of the migration context, which is resolved on each
+    call so it is only built once a Descope call is made.
     """
-    headers = {"Authorization": f"Bearer {AUTH0_TOKEN}"}
-    page = 0
-    per_page = 20
-    all_organizations = []
 
-    while True:
-        response = api_request_with_retry(
-            "get",
-            f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/organizations?per_page={per_page}&page={page}",
-            headers=headers,
-        )
-        if response.status_code != 200:
-            logging.error(
-                f"Error fetching Auth0 organizations. Status code: {response.status_code}"
-            )
-            return all_organizations
-        organizations = response.json()
-        if not organizations:
-            break
-        all_organizations.extend(organizations)
-        page += 1
-    return all_organizations
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            # Such as the lookups of mock.patch and inspect, which must not build the client
+            raise AttributeError(name)
+        return getattr(get_migration_context().descope_client, name)
 
 
-def fetch_auth0_organization_members(organization):
+class MigrationMetrics:
     """
-    Fetch and parse Auth0 organization members from the provided endpoint.
+    Collects the latency, retries, rate limit responses and bytes of every request sent
+    to Auth0 and Descope, keyed by endpoint, along with the duration of each phase.
 
-    Args:
-    - organization (string): Auth0 organization ID to fetch the members
-    Returns:
-    - all_members (dict): Dictionary of all members within the organization.
+    Latencies are recorded per attempt in a histogram, while the time spent waiting for
+    the rate limiters is recorded separately, so the metrics show whether a call is slow
+    or held back by rate limits.
     """
-    headers = {"Authorization": f"Bearer {AUTH0_TOKEN}"}
-    page = 0
-    per_page = 20
-    all_members = []
 
-    while True:
-        response = api_request_with_retry(
-            "get",
-            f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/organizations/{organization}/members?per_page={per_page}&page={page}",
-            headers=headers,
-        )
-        if response.status_code != 200:
-            logging.error(
-                f"Error fetching Auth0 organization members. Status code: {response.status_code}"
-            )
-            return all_members
-        members = response.json()
-        if not members:
-            break
-        all_members.extend(members)
-        page += 1
-    return all_members
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
 
+    def __init__(self):
+        self.endpoints = {}
+        self.phases = {}
+        self.in_flight = 0
+        self._lock = threading.Lock()
 
-### End Auth0 Actions
+    def reset(self):
+        """
+        Drop the metrics collected so far.
+        """
+        with self._lock:
+            self.endpoints.clear()
+            self.phases.clear()
 
-### Begin Descope Actions
+    def _endpoint(self, upstream, endpoint):
+        key = (upstream, endpoint)
+        if key not in self.endpoints:
+            self.endpoints[key] = {
+                "requests": 0,
+                "errors": 0,
+                "retries": 0,
+                "rate_limited": 0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "latency_sum": 0.0,
+                "latency_buckets": [0] * len(self.LATENCY_BUCKETS),
+                "wait_seconds": 0.0,
+            }
+        return self.endpoints[key]
 
+    def observe(self, upstream, endpoint, seconds, bytes_sent=0, bytes_received=0, error=False, rate_limited=False):
+        """
+        Record one attempt of a request.
 
-def create_descope_role_and_permissions(role, permissions):
-    """
-    Create a Descope role and its associated permissions using the Descope Python SDK.
+        Args:
+        - upstream (string): The API the request was sent to, such as auth0 or descope.
+        - endpoint (string): The endpoint, such as "GET /api/v2/roles/{id}/users" or "mgmt.user.invite_batch".
+        - seconds (float): How long the attempt took.
+        - bytes_sent (int): The size of the request body.
+        - bytes_received (int): The size of the response body.
+        - error (bool): Whether the attempt failed.
+        - rate_limited (bool): Whether the attempt was answered with a rate limit error.
+        """
+        with self._lock:
+            stats = self._endpoint(upstream, endpoint)
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["rate_limited"] += int(rate_limited)
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            stats["latency_sum"] += seconds
+            for index, bucket in enumerate(self.LATENCY_BUCKETS):
+                if seconds <= bucket:
+                    stats["latency_buckets"][index] += 1
 
-    Args:
-    - role (dict): A dictionary containing role details from Auth0.
-    - permissions (dict): A dictionary containing permissions details from Auth0.
-    """
-    permissionNames = []
-    success_permissions = 0
-    existing_permissions_descope = []
-    failed_permissions = []
-    for permission in permissions:
-        name = permission["permission_name"]
-        description = permission.get("description", "")
+    def observe_retry(self, upstream, endpoint, wait_seconds=0.0):
+        """
+        Record that a request is retried, and how long it waited before being sent again.
+        """
+        with self._lock:
+            stats = self._endpoint(upstream, endpoint)
+            stats["retries"] += 1
+            stats["wait_seconds"] += wait_seconds
+
+    def observe_wait(self, upstream, endpoint, seconds):
+        """
+        Record how long a request waited for its rate limiter.
+        """
+        with self._lock:
+            self._endpoint(upstream, endpoint)["wait_seconds"] += seconds
+
+    @contextmanager
+    def track_request(self):
+        """
+        Count a request as in flight while it is sent and its response is read.
+        """
+        with self._lock:
+            self.in_flight += 1
         try:
-            descope_client.mgmt.permission.create(name=name, description=description)
-            permissionNames.append(name)
-            success_permissions += 1
-        except AuthException as error:
-            error_message_dict = json.loads(error.error_message)
-            if  error_message_dict["errorCode"] == "E024104":
-                existing_permissions_descope.append(name)
-                permissionNames.append(name)
-                logging.error(f"Unable to create permission: {name}.")
-                logging.error(f"Status Code: {error.status_code}")
-                logging.error(f"Error: {error.error_message}")
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def observe_phase(self, phase, seconds):
+        """
+        Record the duration of a migration phase.
+        """
+        with self._lock:
+            self.phases[phase] = seconds
+
+    def to_dict(self):
+        """
+        Returns:
+        - dict: The metrics, with the endpoints sorted by the total time spent in them.
+        """
+        with self._lock:
+            endpoints = [
+                dict(upstream=upstream, endpoint=endpoint, **stats)
+                for (upstream, endpoint), stats in self.endpoints.items()
+            ]
+            phases = dict(self.phases)
+        for stats in endpoints:
+            stats["latency_buckets"] = dict(zip(map(str, self.LATENCY_BUCKETS), stats["latency_buckets"]))
+        endpoints.sort(key=lambda stats: stats["latency_sum"] + stats["wait_seconds"], reverse=True)
+        return {"phases": phases, "endpoints": endpoints}
+
+    def to_prometheus(self):
+        """
+        Returns:
+        - string: The metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.to_dict()
+        lines = [
+            "# TYPE migration_phase_seconds gauge",
+            *(f'migration_phase_seconds{{phase="{phase}"}} {seconds}' for phase, seconds in snapshot["phases"].items()),
+            "# TYPE migration_request_latency_seconds histogram",
+        ]
+        counters = ["requests", "errors", "retries", "rate_limited", "bytes_sent", "bytes_received", "wait_seconds"]
+        for stats in snapshot["endpoints"]:
+            labels = f'upstream="{stats["upstream"]}",endpoint="{stats["endpoint"]}"'
+            for bucket, count in stats["latency_buckets"].items():
+                lines.append(f'migration_request_latency_seconds_bucket{{{labels},le="{bucket}"}} {count}')
+            lines.append(f'migration_request_latency_seconds_bucket{{{labels},le="+Inf"}} {stats["requests"]}')
+            lines.append(f"migration_request_latency_seconds_sum{{{labels}}} {stats['latency_sum']}")
+            lines.append(f"migration_request_latency_seconds_count{{{labels}}} {stats['requests']}")
+        for counter in counters:
+            lines.append(f"# TYPE migration_{counter}_total counter")
+            for stats in snapshot["endpoints"]:
+                labels = f'upstream="{stats["upstream"]}",endpoint="{stats["endpoint"]}"'
+                lines.append(f"migration_{counter}_total{{{labels}}} {stats[counter]}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_path):
+        """
+        Write the metrics to a file, in the Prometheus text format if its extension is
+        .prom or .txt, and as JSON otherwise.
+        """
+        with open(file_path, "w") as file:
+            if file_path.endswith((".prom", ".txt")):
+                file.write(self.to_prometheus())
             else:
-                failed_permissions.append(f"{name}, Reason: {error.error_message}")
-                logging.error(f"Unable to create permission: {name}.")
-                logging.error(f"Status Code: {error.status_code}")
-                logging.error(f"Error: {error.error_message}")
+                json.dump(self.to_dict(), file, indent=2)
 
 
-    role_name = role["name"]
-    if not check_role_exists_descope(role_name):
-        role_description = role.get("description", "")
-        try:
-            descope_client.mgmt.role.create(
-                name=role_name,
-                description=role_description,
-                permission_names=permissionNames,
-            )
-            return True, False, success_permissions, existing_permissions_descope, failed_permissions, ""
-        except AuthException as error:
-            logging.error(f"Unable to create role: {role_name}.")
-            logging.error(f"Status Code: {error.status_code}")
-            logging.error(f"Error: {error.error_message}")
-            return (
-                False,
-                False,
-                success_permissions,
-                existing_permissions_descope,
-                failed_permissions,
-                f"{role_name}  Reason: {error.error_message}",
-            )
-    else:
-        return False, True, success_permissions, existing_permissions_descope, failed_permissions, ""
+metrics = MigrationMetrics()
 
 
-def create_descope_user(user):
+def get_endpoint_name(method, url):
     """
-    Create a Descope user based on matched Auth0 user data using Descope Python SDK.
+    Name the endpoint of a request for the metrics, replacing the IDs within its path.
 
     Args:
-    - user (dict): A dictionary containing user details fetched from Auth0 API.
+    - method (string): The HTTP method of the request.
+    - url (string): The URL of the request.
+    Returns:
+    - string: The endpoint, such as "GET /api/v2/roles/{id}/users".
     """
-    try:
-        login_ids = []
-        connections = []
-        for identity in user.get("identities", []):
-            if "Username" in identity["connection"]:
-                login_ids.append(user.get("email"))
-                connections.append(identity["connection"])
-            elif "sms" in identity["connection"]:
-                login_ids.append(user.get("phone_number"))
-                connections.append(identity["connection"])
-            elif "-" in identity["connection"]:
-                login_ids.append(
-                    identity["connection"].split("-")[0] + "-" + identity["user_id"]
-                )
-                connections.append(identity["connection"])
-            else:
-                login_ids.append(identity["connection"] + "-" + identity["user_id"])
-                connections.append(identity["connection"])
+    parsed = urlparse(url)
+    if get_rate_limiter(url) is None:
+        # Such as the signed URLs of exported files, which are unique to each request
+        return f"{method.upper()} {parsed.netloc}"
+    segments = parsed.path.split("/")
+    for index in range(1, len(segments)):
+        if segments[index - 1] in ("roles", "organizations", "jobs", "members", "users") and segments[index] not in (
+            "users",
+            "permissions",
+            "members",
+            "users-exports",
+        ):
+            segments[index] = "{id}"
+    return f"{method.upper()} {'/'.join(segments)}"
 
-        emails = [user.get("email")]
 
-        users = []
-        try:
-            resp = descope_client.mgmt.user.search_all(emails=emails)
-            users = resp["users"]
-        except AuthException as error:
-            pass
+def get_response_size(response, stream=False):
+    """
+    Get the size of a response body, without reading streamed bodies.
+    """
+    size = parse_header_number(response.headers, "Content-Length")
+    if size is None and not stream and isinstance(getattr(response, "content", None), bytes):
+        size = len(response.content)
+    return int(size or 0)
 
-        if len(users) == 0:
-            login_id = login_ids[0]
-            email = user.get("email")
-            phone = (
-                user.get("phone_number") if identity.get("provider") == "sms" else None
-            )
-            display_name = user.get("name")
-            given_name = user.get("given_name")
-            family_name = user.get("family_name")
-            picture = user.get("picture")
-            verified_email = user.get("email_verified", False)
-            verified_phone = user.get("phone_verified", False) if phone else False
-            custom_attributes = {
-                "connection": ",".join(map(str, connections)),
-                "freshlyMigrated": True,
-            }
-            additional_login_ids = login_ids[1 : len(login_ids)]
-                
-            # Create the user
-            resp = descope_client.mgmt.user.create(
-                login_id=login_id,
-                email=email,
-                display_name=display_name,
-                given_name=given_name,
-                family_name=family_name,
-                phone=phone,
-                picture=picture,
-                custom_attributes=custom_attributes,
-                verified_email=verified_email,
-                verified_phone=verified_phone,
-                additional_login_ids=additional_login_ids,
-            )
 
-            # Update user status if necessary
-            status = "disabled" if user.get("blocked", False) else "enabled"
-            if status == "disabled":
-                try:
-                    resp = descope_client.mgmt.user.deactivate(login_id=login_id)
-                except AuthException as error:
-                    logging.error(f"Unable to deactivate user.")
-                    logging.error(f"Status Code: {error.status_code}")
-                    logging.error(f"Error: {error.error_message}")
-            elif status == "enabled":
-                try:
-                    resp = descope_client.mgmt.user.activate(login_id=login_id)
-                except AuthException as error:
-                    logging.error(f"Unable to activate user.")
-                    logging.error(f"Status Code: {error.status_code}")
-                    logging.error(f"Error: {error.error_message}")
-            return True, "", False, ""
-        else:
-            user_to_update = users[0]
-            if user.get("picture"):
-                picture = user.get("picture")
-            else:
-                picture = user_to_update["picture"]
+class RateLimiter:
+    """
+    Token bucket pacing the requests sent to one upstream API.
 
-            if user.get("given_name"):
-                given_name = user.get("given_name")
-            else:
-                given_name = user_to_update["givenName"]
+    Every request takes a token, and tokens are refilled at the current rate. The rate
+    starts at max_rate and follows the X-RateLimit-Remaining and X-RateLimit-Reset
+    headers of the responses, so the remaining requests are spread until the limit
+    resets instead of being sent at once and answered with 429 responses. A 429
+    response blocks the bucket for its Retry-After period and halves the rate, which
+    then recovers to max_rate over RECOVERY_SECONDS.
+    """
 
-            if user.get("family_name"):
-                family_name = user.get("family_name")
-            else:
-                family_name = user_to_update["familyName"]
-
-            custom_attributes = user_to_update["customAttributes"]
-            if "connection" in user_to_update["customAttributes"]:
-                for connection in custom_attributes["connection"].split(","):
-                    if connection in connections:
-                        connections.remove(connection)
-            if len(connections) == 0:
-                login_id = user_to_update["loginIds"][0]
-                status = "disabled" if user.get("blocked", False) else "enabled"
-                if status == "disabled" or user_to_update["status"] == "disabled":
-                    try:
-                        resp = descope_client.mgmt.user.deactivate(login_id=login_id)
-                    except AuthException as error:
-                        logging.error(f"Unable to deactivate user.")
-                        logging.error(f"Status Code: {error.status_code}")
-                        logging.error(f"Error: {error.error_message}")
-                    return None, "", True, user.get("user_id")
-                return None, "", None, ""
-            additional_connections = ",".join(map(str, connections))
-            if "connection" in user_to_update["customAttributes"] and additional_connections:
-                custom_attributes["connection"] += "," + additional_connections
+    RECOVERY_SECONDS = 60
+
+    def __init__(self, name, max_rate, min_rate=0.5):
+        self.name = name
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.capacity = max(max_rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Wait until a request can be sent, and take a token for it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait_time)
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        if now < self.blocked_until:
+            return
+        self.rate = min(self.max_rate, self.rate + elapsed * self.max_rate / self.RECOVERY_SECONDS)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def update(self, headers):
+        """
+        Adapt the pace to the rate limit headers of a response.
+
+        Args:
+        - headers (dict): The response headers, responses without rate limit headers are ignored.
+        """
+        remaining = parse_header_number(headers, "X-RateLimit-Remaining")
+        reset = parse_header_number(headers, "X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        reset_in = reset - time.time()
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if reset_in <= 0:
+                self.rate = self.max_rate
+            elif remaining < 1:
+                self.tokens = 0
+                self.blocked_until = max(self.blocked_until, now + reset_in)
             else:
-                custom_attributes["connection"] = additional_connections
+                self.tokens = min(self.tokens, remaining)
+                self.rate = max(self.min_rate, min(self.max_rate, remaining / reset_in))
 
-            try:
-                login_ids.pop(login_ids.index(user_to_update["loginIds"][0]))
-            except Exception as e:
-                pass
-            login_id = user_to_update["loginIds"][0]
-            resp = descope_client.mgmt.user.update(
-                login_id=login_id,
-                email=user_to_update["email"],
-                display_name=user_to_update["name"],
-                given_name=given_name,
-                family_name=family_name,
-                phone=user_to_update["phone"],
-                picture=picture,
-                custom_attributes=custom_attributes,
-                verified_email=user_to_update["verifiedEmail"],
-                verified_phone=user_to_update["verifiedPhone"],
-                additional_login_ids=login_ids,
-            )
-            # TODO: Handle user statuses? Yea, that's my thinking, if either are disabled, merge them, disable the merged one, print the disabled accounts that hit this scenario in the completion?
-            status = "disabled" if user.get("blocked", False) else "enabled"
-            if status == "disabled" or user_to_update["status"] == "disabled":
-                try:
-                    resp = descope_client.mgmt.user.deactivate(login_id=login_id)
+    def backoff(self, seconds):
+        """
+        Stop sending requests after a rate limit response.
 
-                except AuthException as error:
-                    logging.error(f"Unable to deactivate user.")
-                    logging.error(f"Status Code: {error.status_code}")
-                    logging.error(f"Error: {error.error_message}")
-                return True, user.get("name"), True, user.get("user_id")
-            return True, user.get("name"), False, ""
-    except AuthException as error:
-        logging.error(f"Unable to create user {user.get('user_id', 'unknown')}. Error: {error.error_message}")
-        return (
-            False,
-            "",
-            False,
-            user.get("user_id") + " Reason: " + error.error_message,
-        )
+        Args:
+        - seconds (float): How long to wait before the next request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = 0
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+        logging.info(f"{self.name} rate limit reached. Pausing requests for {seconds} seconds...")
+
+    def reset(self, max_rate):
+        """
+        Restart the bucket with a new maximum rate, such as within a worker process
+        sharing the rate limit with other workers.
+
+        Args:
+        - max_rate (float): The new maximum number of requests per second.
+        """
+        self.__init__(self.name, max_rate)
 
+    def status(self):
+        """
+        Describe how the requests are held back, for the progress reporter.
 
-def add_user_to_descope_role(user, role):
+        Returns:
+        - string: The remaining pause or the lowered rate, or None when requests are sent at the full rate.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return f"{self.name} paused for {self.blocked_until - now:.0f}s"
+            if self.rate < self.max_rate * 0.99:
+                return f"{self.name} slowed to {self.rate:.1f}/{self.max_rate:g} req/s"
+        return None
+
+
+def parse_header_number(headers, name):
     """
-    Add a Descope user based on matched Auth0 user data.
+    Read a numeric header of a response.
 
     Args:
-    - user (str): Login ID of the user you wish to add to role
-    - role (str): The name of the role which you want to add the user to
+    - headers (dict): The response headers.
+    - name (string): The header name.
+    Returns:
+    - float: The header value, or None if it is missing or not a number.
     """
-    role_names = [role]
-
+    value = headers.get(name) if hasattr(headers, "get") else None
+    if not isinstance(value, (str, int, float)):
+        return None
     try:
-        resp = descope_client.mgmt.user.add_roles(login_id=user, role_names=role_names)
-        logging.info("User role successfully added")
-        return True, ""
-    except AuthException as error:
-        logging.error(
-            f"Unable to add role to user.  Status code: {error.error_message}"
-        )
-        return False, f"{user} Reason: {error.error_message}"
+        return float(value)
+    except ValueError:
+        return None
+
+
+def get_retry_after(headers, retries):
+    """
+    Get how long to wait before retrying a request answered with a 429 response.
+
+    Args:
+    - headers (dict): The response headers.
+    - retries (int): The number of retries made so far, used when the headers hold no hint.
+    Returns:
+    - float: The number of seconds to wait.
+    """
+    retry_after = parse_header_number(headers, "Retry-After")
+    if retry_after is not None and retry_after > 0:
+        return retry_after
+    reset = parse_header_number(headers, "X-RateLimit-Reset")
+    if reset is not None and reset > time.time():
+        return reset - time.time()
+    return 2**retries
+
+
+# Their rates are set from the migration context once it is created
+auth0_rate_limiter = RateLimiter("Auth0", 10)
+descope_rate_limiter = RateLimiter("Descope", 50)
+
+
+def get_rate_limiter(url):
+    """
+    Get the rate limiter of the upstream API a URL belongs to.
+
+    Args:
+    - url (string): The URL of the request.
+    Returns:
+    - RateLimiter: The limiter of the upstream, or None for other URLs such as export downloads.
+    """
+    context = get_migration_context()
+    if url.startswith(context.auth0_base_url):
+        return auth0_rate_limiter
+    if url.startswith(context.descope_base_url):
+        return descope_rate_limiter
+    return None
+
+
+def format_duration(seconds):
+    """
+    Format a number of seconds for the progress lines, such as "1h 05m" or "2m 30s".
+    """
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class ProgressTask:
+    """
+    Counts the records handled by one process function, for the progress reporter.
+    """
+
+    def __init__(self, reporter, name, total=None):
+        self.reporter = reporter
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        # Counts sampled at each refresh, from which the rate over the sliding window is computed
+        self.samples = deque([(self.started, 0)])
+        self._lock = threading.Lock()
+
+    def advance(self, count=1):
+        """
+        Count records as handled, whether they were migrated or failed.
+        """
+        with self._lock:
+            self.done += count
+
+    def finish(self):
+        """
+        Stop reporting the task, and log how many records it handled.
+        """
+        self.reporter.finish(self)
+
+    def rate(self, now):
+        """
+        Get the records handled per second over the last ProgressReporter.WINDOW_SECONDS.
+        """
+        with self._lock:
+            self.samples.append((now, self.done))
+            while len(self.samples) > 2 and self.samples[1][0] <= now - self.reporter.WINDOW_SECONDS:
+                self.samples.popleft()
+            (first_time, first_count), (last_time, last_count) = self.samples[0], self.samples[-1]
+        return (last_count - first_count) / (last_time - first_time) if last_time > first_time else 0.0
+
+    def describe(self, now):
+        rate = self.rate(now)
+        if not self.total:
+            return f"{self.name}: {self.done:,} at {rate:.1f}/s"
+        remaining = max(self.total - self.done, 0)
+        eta = format_duration(remaining / rate) if rate > 0 else "unknown"
+        percent = min(self.done / self.total, 1) * 100
+        return f"{self.name}: {self.done:,}/{self.total:,} ({percent:.0f}%) at {rate:.1f}/s, ETA {eta}"
+
+
+class ProgressReporter:
+    """
+    Reports the progress of the running process functions at a fixed interval, rather
+    than for every record.
+
+    Each line shows the records handled by each task, their rate over a sliding window
+    and the remaining time when the total is known, along with the number of requests in
+    flight and whether the rate limiters are holding requests back. When the output is a
+    terminal the line is redrawn in place every REFRESH_SECONDS, otherwise a line is written
+    every PROGRESS_INTERVAL seconds. Every line written at the interval is also logged.
+    """
+
+    WINDOW_SECONDS = 60
+    REFRESH_SECONDS = 1
+
+    def __init__(self, stream=None, interval=None):
+        self.stream = stream
+        self._interval = interval
+        self.tasks = []
+        self.totals = {}
+        self._logged = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def interval(self):
+        return self._interval if self._interval is not None else get_migration_context().progress_interval
+
+    @property
+    def output(self):
+        return self.stream or sys.stderr
+
+    @property
+    def is_tty(self):
+        isatty = getattr(self.output, "isatty", None)
+        return bool(isatty and isatty())
+
+    def expect(self, name, total):
+        """
+        Set the number of records a task will handle, before or after it starts, such as
+        once the fetcher feeding it has read the total from the first page.
+        """
+        with self._lock:
+            running = [task for task in self.tasks if task.name == name]
+            for task in running:
+                task.total = total
+            if not running:
+                self.totals[name] = total
+
+    def start(self, name, total=None):
+        """
+        Start reporting a task.
+
+        Args:
+        - name (string): The name of the task, shown in the progress lines.
+        - total (int): The number of records the task will handle, if known.
+        Returns:
+        - ProgressTask: The task, to advance as records are handled and finish at the end.
+        """
+        with self._lock:
+            task = ProgressTask(self, name, total if total is not None else self.totals.pop(name, None))
+            self.tasks.append(task)
+            if self._thread is None:
+                self._wake.clear()
+                self._logged = time.monotonic()
+                self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+                self._thread.start()
+        return task
+
+    def finish(self, task):
+        with self._lock:
+            if task not in self.tasks:
+                return
+            self.tasks.remove(task)
+            if not self.tasks:
+                self._wake.set()
+        elapsed = time.monotonic() - task.started
+        rate = task.done / elapsed if elapsed > 0 else 0.0
+        if self.is_tty:
+            self._write("\r\x1b[K")
+        logging.info(f"{task.name}: handled {task.done:,} in {format_duration(elapsed)} ({rate:.1f}/s)")
+
+    def _run(self):
+        refresh = self.REFRESH_SECONDS if self.is_tty else max(self.interval, self.REFRESH_SECONDS)
+        while True:
+            woken = self._wake.wait(refresh)
+            with self._lock:
+                # A task started after the last one finished keeps this thread running
+                if not self.tasks:
+                    self._thread = None
+                    return
+                self._wake.clear()
+            if not woken:
+                self.report()
+
+    def status(self):
+        """
+        Describe the requests in flight and the state of the rate limiters.
+        """
+        states = [limiter.status() for limiter in (auth0_rate_limiter, descope_rate_limiter)]
+        return ", ".join([f"{metrics.in_flight} in flight"] + [state for state in states if state])
+
+    def report(self):
+        """
+        Write a progress line for the running tasks.
+
+        Returns:
+        - string: The line, or None when no task is running.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tasks = list(self.tasks)
+            log = now - self._logged >= self.interval - 0.5
+            if log:
+                self._logged = now
+        if not tasks:
+            return None
+        line = " | ".join([task.describe(now) for task in tasks] + [self.status()])
+        if self.is_tty:
+            self._write(f"\r\x1b[K{line}")
+        elif log:
+            self._write(f"{line}\n")
+        if log:
+            logging.info(f"Progress: {line}")
+        return line
+
+    def _write(self, text):
+        try:
+            self.output.write(text)
+            self.output.flush()
+        except (OSError, ValueError):
+            # The output was closed, progress is still logged
+            pass
+
+
+progress = ProgressReporter()
+
+
+class RateLimitedClient:
+    """
+    Wraps a Descope client, so every management API call waits for the Descope rate
+    limiter and is retried when Descope answers with a rate limit error.
+    """
+
+    def __init__(self, target, limiter, max_retries=4, name=""):
+        self._target = target
+        self._limiter = limiter
+        self._max_retries = max_retries
+        self._name = name
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        qualified_name = f"{self._name}.{name}" if self._name else name
+        if inspect.isroutine(value):
+            return self._wrap(value, qualified_name)
+        if hasattr(value, "__dict__"):
+            return RateLimitedClient(value, self._limiter, self._max_retries, qualified_name)
+        return value
+
+    def _wrap(self, method, endpoint):
+        upstream = self._limiter.name.lower()
+
+        def call(*args, **kwargs):
+            retries = 0
+            while True:
+                waiting = time.monotonic()
+                self._limiter.acquire()
+                started = time.monotonic()
+                metrics.observe_wait(upstream, endpoint, started - waiting)
+                try:
+                    with metrics.track_request():
+                        result = method(*args, **kwargs)
+                except RateLimitException as error:
+                    metrics.observe(upstream, endpoint, time.monotonic() - started, error=True, rate_limited=True)
+                    retries += 1
+                    if retries > self._max_retries:
+                        raise
+                    retry_after = error.rate_limit_parameters.get(API_RATE_LIMIT_RETRY_AFTER_HEADER)
+                    metrics.observe_retry(upstream, endpoint, retry_after or 2**retries)
+                    self._limiter.backoff(retry_after or 2**retries)
+                    continue
+                except Exception:
+                    metrics.observe(upstream, endpoint, time.monotonic() - started, error=True)
+                    raise
+                # The SDK returns parsed responses, so the bytes of Descope calls are not counted
+                metrics.observe(upstream, endpoint, time.monotonic() - started)
+                return result
+
+        return call
+
+
+descope_client = LazyDescopeClient()
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    Sends the requests of a requests session over HTTP/2, with pooled httpx clients.
+
+    httpx sets the TLS verification, client certificate and proxy per client, so one
+    client is kept for each combination of them the session sends requests with.
+    """
+
+    def __init__(self, pool_size):
+        super().__init__()
+        self.pool_size = pool_size
+        self.clients = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, verify=True, cert=None, proxy=None):
+        """
+        Get the pooled client for the TLS and proxy settings of a request.
+
+        Args:
+        - verify (bool or string): Whether to verify the server certificate, or the path of the CA bundle.
+        - cert (string or tuple): The client certificate, as passed to requests.
+        - proxy (string): The URL of the proxy, or None.
+        Returns:
+        - httpx.Client: The client.
+        """
+        key = (verify, cert, proxy)
+        with self._lock:
+            if key not in self.clients:
+                self.clients[key] = httpx.Client(
+                    http2=True,
+                    verify=verify,
+                    cert=cert,
+                    proxy=proxy,
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+            return self.clients[key]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        client = self.get_client(verify, cert, select_proxy(request.url, proxies) if proxies else None)
+        try:
+            response = client.request(
+                request.method, request.url, headers=dict(request.headers), content=request.body, timeout=timeout
+            )
+        except httpx.TimeoutException as error:
+            raise requests.exceptions.ReadTimeout(error, request=request)
+        except httpx.HTTPError as error:
+            raise requests.exceptions.ConnectionError(error, request=request)
+
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.reason = response.reason_phrase
+        result.headers = CaseInsensitiveDict(response.headers)
+        result.encoding = response.encoding
+        result.url = request.url
+        result.request = request
+        result.raw = io.BytesIO(response.content)
+        result._content = response.content
+        return result
+
+    def close(self):
+        with self._lock:
+            for client in self.clients.values():
+                client.close()
+            self.clients.clear()
+
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """
+    Get the HTTP session shared by all requests, so connections are kept alive and
+    reused instead of opening a new connection per request.
+
+    Each host keeps up to HTTP_POOL_SIZE connections open. When HTTP2_ENABLED is set
+    and httpx is installed with HTTP/2 support, the requests to the Auth0 and Descope
+    APIs are sent over HTTP/2.
+
+    Returns:
+    - requests.Session: The shared session.
+    """
+    global _http_session
+    context = get_migration_context()
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=context.http_pool_size, pool_maxsize=context.http_pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            if context.http2_enabled:
+                if httpx is None:
+                    logging.warning("HTTP/2 requires the httpx[http2] package, using HTTP/1.1")
+                else:
+                    http2_adapter = Http2Adapter(context.http_pool_size)
+                    session.mount(context.auth0_base_url, http2_adapter)
+                    session.mount(context.descope_base_url, http2_adapter)
+            _http_session = session
+    return _http_session
+
+
+class Auth0PasswordRecord:
+    """
+    The fields of an Auth0 password export record which the migration uses.
+
+    Records are parsed into this compact record instead of a dict holding every field
+    of the export. With the msgspec backend, records are decoded straight into an
+    equivalent msgspec struct, so the other fields are never materialized.
+    """
+
+    __slots__ = ("email", "email_verified", "connection", "password_hash", "name")
+
+    def __init__(self, email=None, email_verified=False, connection=None, password_hash=None, name=None):
+        self.email = email
+        self.email_verified = email_verified
+        self.connection = connection
+        self.password_hash = password_hash
+        self.name = name
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(
+            email=record.get("email"),
+            email_verified=record.get("email_verified", False),
+            connection=record.get("connection"),
+            password_hash=record.get("passwordHash"),
+            name=record.get("name"),
+        )
+
+
+def load_json_backend(name=None):
+    """
+    Pick the JSON parser used for the Auth0 export files.
+
+    Args:
+    - name (string): The backend to use, msgspec, orjson or json. By default the fastest
+      installed one.
+    Returns:
+    - name (string): The backend picked.
+    - loads (function): Parses an NDJSON line into a dict.
+    - load_password_record (function): Parses an NDJSON line into an Auth0PasswordRecord.
+    """
+    name = name or ("msgspec" if msgspec else "orjson" if orjson else "json")
+    if name == "msgspec" and msgspec is not None:
+        password_record_type = msgspec.defstruct(
+            "Auth0PasswordRecord",
+            [
+                ("email", Optional[str], None),
+                ("email_verified", bool, False),
+                ("connection", Optional[str], None),
+                ("password_hash", Optional[str], None),
+                ("name", Optional[str], None),
+            ],
+            rename={"password_hash": "passwordHash"},
+        )
+        return name, msgspec.json.Decoder().decode, msgspec.json.Decoder(password_record_type).decode
+    if name == "orjson" and orjson is not None:
+        return name, orjson.loads, lambda line: Auth0PasswordRecord.from_dict(orjson.loads(line))
+    if name != "json":
+        logging.warning(f"JSON backend {name} is not installed, using the standard library")
+    return "json", json.loads, lambda line: Auth0PasswordRecord.from_dict(json.loads(line))
+
+
+def api_request_with_retry(action, url, headers, data=None, max_retries=4, timeout=10, stream=False):
+    """
+    Handles API requests with additional retry on timeout and rate limit.
+
+    Requests are sent with the shared HTTP session. Requests to Auth0 and Descope wait
+    for the rate limiter of their upstream, which is updated from the rate limit
+    headers of every response.
+
+    Args:
+    - action (string): 'get' or 'post'
+    - url (string): The URL of the path for the api request
+    - headers (dict): Headers to be sent with the request
+    - data (json): Optional and used only for post, but the payload to post
+    - max_retries (int): The max number of retries
+    - timeout (int): The timeout for the request in seconds
+    - stream (bool): Optional and used only for get, whether to stream the response body
+    Returns:
+    - API Response
+    - Or None
+    """
+    session = get_http_session()
+    limiter = get_rate_limiter(url)
+    upstream = limiter.name.lower() if limiter else "other"
+    endpoint = get_endpoint_name(action, url)
+    bytes_sent = len(data) if data else 0
+    retries = 0
+    while retries < max_retries:
+        started = time.monotonic()
+        try:
+            if limiter:
+                limiter.acquire()
+                metrics.observe_wait(upstream, endpoint, time.monotonic() - started)
+                started = time.monotonic()
+            with metrics.track_request():
+                if action == "get":
+                    response = session.get(
+                        url, headers=headers, timeout=timeout, stream=stream
+                    )
+                else:
+                    response = session.post(
+                        url, headers=headers, data=data, timeout=timeout
+                    )
+            metrics.observe(
+                upstream,
+                endpoint,
+                time.monotonic() - started,
+                bytes_sent,
+                get_response_size(response, stream),
+                error=response.status_code >= 400,
+                rate_limited=response.status_code == 429,
+            )
+
+            if limiter:
+                limiter.update(response.headers)
+            if (
+                response.status_code != 429
+            ):  # Not a rate limit error, proceed with response
+                return response
+
+            # If rate limit error, prepare for retry
+            retries += 1
+            wait_time = get_retry_after(response.headers, retries)
+            metrics.observe_retry(upstream, endpoint, wait_time)
+            if limiter:
+                limiter.backoff(wait_time)
+            else:
+                logging.info(f"Rate limit reached. Retrying in {wait_time} seconds...")
+                time.sleep(wait_time)
+
+        except requests.exceptions.ReadTimeout as e:
+            # Handle read timeout exception
+            metrics.observe(upstream, endpoint, time.monotonic() - started, bytes_sent, error=True)
+            logging.warning(f"Read timed out. (read timeout={timeout}): {e}")
+            retries += 1
+            wait_time = 5**retries
+            metrics.observe_retry(upstream, endpoint, wait_time)
+            logging.info(f"Retrying attempt {retries}/{max_retries}...")
+            time.sleep(
+                wait_time
+            )  # Wait for 5 seconds before retrying or use a backoff strategy
+
+        except requests.exceptions.RequestException as e:
+            # Handle other request exceptions
+            metrics.observe(upstream, endpoint, time.monotonic() - started, bytes_sent, error=True)
+            logging.error(f"A request exception occurred: {e}")
+            break  # In case of other exceptions, you may want to break the loop
+
+    logging.error("Max retries reached. Giving up.")
+    return None
+
+
+def iter_batches(items, batch_size):
+    """
+    Split an iterable into lists of at most batch_size items.
+
+    Args:
+    - items (iterable): The items to split.
+    - batch_size (int): The maximum number of items in each batch.
+    Yields:
+    - list: The next batch of items.
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_prefetched(items, buffer_size):
+    """
+    Iterate over items produced by a background thread, so producing the next items
+    overlaps with consuming the previous ones.
+
+    Args:
+    - items (iterable): The items to produce, such as users fetched from Auth0.
+    - buffer_size (int): The maximum number of produced items waiting to be consumed.
+    Yields:
+    - The items, in their original order.
+    """
+    buffer = queue.Queue(maxsize=buffer_size)
+    done = object()
+
+    def produce():
+        try:
+            for item in items:
+                buffer.put((item, None))
+        except Exception as error:
+            buffer.put((done, error))
+            return
+        buffer.put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item, error = buffer.get()
+        if item is done:
+            if error is not None:
+                raise error
+            return
+        yield item
+
+
+### Begin Auth0 Actions
+
+
+class Auth0User:
+    """
+    Compact record of an Auth0 user, holding only the fields the migration maps to
+    Descope along with the Descope login IDs and Auth0 connections of the user.
+
+    The fetchers emit these records instead of the raw Auth0 users, so fields the
+    migration does not use, such as app_metadata, are not kept in memory.
+    """
+
+    __slots__ = (
+        "user_id",
+        "email",
+        "email_verified",
+        "name",
+        "given_name",
+        "family_name",
+        "picture",
+        "phone",
+        "phone_verified",
+        "blocked",
+        "login_ids",
+        "connections",
+    )
+
+    def __init__(
+        self,
+        user_id=None,
+        email=None,
+        email_verified=False,
+        name=None,
+        given_name=None,
+        family_name=None,
+        picture=None,
+        phone=None,
+        phone_verified=False,
+        blocked=False,
+        login_ids=(),
+        connections=(),
+    ):
+        self.user_id = user_id
+        self.email = email
+        self.email_verified = email_verified
+        self.name = name
+        self.given_name = given_name
+        self.family_name = family_name
+        self.picture = picture
+        self.phone = phone
+        self.phone_verified = phone_verified
+        self.blocked = blocked
+        self.login_ids = tuple(login_ids)
+        self.connections = tuple(connections)
+
+    @classmethod
+    def from_dict(cls, user):
+        """
+        Build the record of a user returned by the Auth0 API or found in an Auth0 export.
+
+        Args:
+        - user (dict): The Auth0 user, with its identities.
+        Returns:
+        - Auth0User: The record of the user.
+        """
+        login_ids, connections = get_auth0_login_ids_and_connections(user)
+        identities = user.get("identities", [])
+        # Only users whose last identity is passwordless SMS keep their phone number
+        phone = (
+            user.get("phone_number")
+            if identities and identities[-1].get("provider") == "sms"
+            else None
+        )
+        return cls(
+            user_id=user.get("user_id"),
+            email=user.get("email"),
+            email_verified=user.get("email_verified", False),
+            name=user.get("name"),
+            given_name=user.get("given_name"),
+            family_name=user.get("family_name"),
+            picture=user.get("picture"),
+            phone=phone,
+            phone_verified=user.get("phone_verified", False),
+            blocked=user.get("blocked", False),
+            login_ids=login_ids,
+            connections=connections,
+        )
+
+
+def fetch_auth0_users_from_file(file_path, enrich=True, batch_size=AUTH0_ENRICH_BATCH_SIZE, workers=AUTH0_ENRICH_WORKERS, skip=0):
+    """
+    Fetch and parse Auth0 users from the provided file.
+
+    The exported records are used as they are. Records missing fields which are
+    required by the user mapping are enriched from the Auth0 users API, with one
+    query per batch of users.
+
+    Args:
+    - file_path (string): The path to the Auth0 users export, formatted as NDJSON.
+    - enrich (bool): Whether to enrich records which are missing required fields.
+    - batch_size (int): The number of users fetched with each enrichment query.
+    - workers (int): The number of enrichment queries run concurrently.
+    - skip (int): The number of users to skip, such as users already migrated before a resume.
+    Yields:
+    - Auth0User: The next parsed Auth0 user.
+    """
+    _, loads_json, _ = get_migration_context().json_backend
+    with open(file_path, "rb") as file:
+        lines = islice((line for line in file if line.strip()), skip, None)
+        records = (loads_json(line) for line in lines)
+        # Read just enough records at a time to keep all enrichment workers busy
+        for chunk in iter_batches(records, batch_size * workers):
+            if enrich:
+                incomplete_users = [
+                    user
+                    for user in chunk
+                    if "user_id" in user
+                    and any(field not in user for field in AUTH0_REQUIRED_USER_FIELDS)
+                ]
+                enrich_auth0_users(incomplete_users, batch_size, workers)
+            for user in chunk:
+                yield Auth0User.from_dict(auth0_export_record_to_user(user))
+
+
+def enrich_auth0_users(users, batch_size=AUTH0_ENRICH_BATCH_SIZE, workers=AUTH0_ENRICH_WORKERS):
+    """
+    Fill the fields missing from exported Auth0 users with their Auth0 API profile.
+
+    Fields already present in an exported user are kept as they are.
+
+    Args:
+    - users (list): The exported Auth0 users to enrich in place.
+    - batch_size (int): The number of users fetched with each query.
+    - workers (int): The number of queries run concurrently.
+    """
+    batches = list(iter_batches(users, batch_size))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch, api_users in zip(
+            batches,
+            executor.map(
+                fetch_auth0_users_by_id, [[user["user_id"] for user in batch] for batch in batches]
+            ),
+        ):
+            for user in batch:
+                api_user = api_users.get(user["user_id"])
+                if api_user is None:
+                    logging.warning(
+                        f"Unable to enrich Auth0 user {user['user_id']}, it was not found via API and is migrated as exported"
+                    )
+                    continue
+                for field, value in api_user.items():
+                    user.setdefault(field, value)
+
+
+def fetch_auth0_users_by_id(user_ids):
+    """
+    Fetch a batch of Auth0 users by their user IDs with a single query.
+
+    Args:
+    - user_ids (list): The Auth0 user IDs to fetch.
+    Returns:
+    - users (dict): The Auth0 users found, keyed by user ID.
+    """
+    context = get_migration_context()
+    headers = {"Authorization": f"Bearer {context.auth0_token}"}
+    quoted_ids = " OR ".join(
+        '"' + user_id.replace("\\", "\\\\").replace('"', '\\"') + '"' for user_id in user_ids
+    )
+    query = urlencode(
+        {"q": f"user_id:({quoted_ids})", "per_page": len(user_ids), "search_engine": "v3"}
+    )
+    response = api_request_with_retry(
+        "get",
+        f"{context.auth0_base_url}/api/v2/users?{query}",
+        headers=headers,
+    )
+    if response is None or response.status_code != 200:
+        logging.error(
+            f"Error fetching Auth0 users by ID. Status code: {getattr(response, 'status_code', None)}"
+        )
+        return {}
+    return {user["user_id"]: user for user in response.json()}
+
+
+def fetch_auth0_users(skip=0, concurrency=None):
+    """
+    Fetch and parse Auth0 users from the provided endpoint.
+
+    The first page is fetched with the total number of users, then the remaining
+    pages are fetched concurrently, in windows of concurrency pages.
+
+    Args:
+    - skip (int): The number of users to skip, such as users already migrated before a resume.
+    - concurrency (int): The number of pages fetched at once, AUTH0_FETCH_CONCURRENCY by default.
+    Yields:
+    - Auth0User: The next parsed Auth0 user.
+    """
+    concurrency = concurrency or get_migration_context().auth0_fetch_concurrency
+    per_page = AUTH0_PAGE_SIZE
+    page = skip // per_page
+    first = fetch_auth0_pages(AUTH0_USERS_PATH, "users", "users", [page], per_page, include_totals=True)[0]
+    if first is None:
+        return
+    users, total = first
+    if total is not None:
+        progress.expect("Users", max(min(total, AUTH0_USERS_API_LIMIT) - skip, 0))
+        if total > AUTH0_USERS_API_LIMIT:
+            message = (
+                f"Auth0 has {total} users but its users API returns only the first {AUTH0_USERS_API_LIMIT}, "
+                f"the other {total - AUTH0_USERS_API_LIMIT} users are not migrated. Use --from-export-job to migrate all of them."
+            )
+            logging.warning(message)
+            print(message)
+    yield from map(Auth0User.from_dict, users[skip % per_page:])
+
+    if total is None:
+        # The endpoint ignored include_totals, page until a page is not full
+        while len(users) == per_page:
+            page += 1
+            result = fetch_auth0_pages(AUTH0_USERS_PATH, "users", "users", [page], per_page)[0]
+            if result is None:
+                return
+            users = result[0]
+            yield from map(Auth0User.from_dict, users)
+        return
+
+    # The users API returns at most AUTH0_USERS_API_LIMIT users
+    last_page = -(-min(total, AUTH0_USERS_API_LIMIT) // per_page)
+    for window in iter_batches(range(page + 1, last_page), concurrency):
+        for result in fetch_auth0_pages(AUTH0_USERS_PATH, "users", "users", window, per_page):
+            if result is None:
+                return
+            yield from map(Auth0User.from_dict, result[0])
+
+
+def create_auth0_users_export_job(fields=None, connection_id=None):
+    """
+    Create an Auth0 job exporting the tenant users as gzipped NDJSON.
+
+    Args:
+    - fields (list): The user fields to export, AUTH0_EXPORT_FIELDS by default.
+    - connection_id (string): Optional Auth0 connection ID to limit the export to.
+    Returns:
+    - job_id (string): The ID of the created job if successful, None otherwise.
+    """
+    context = get_migration_context()
+    headers = {
+        "Authorization": f"Bearer {context.auth0_token}",
+        "Content-Type": "application/json",
+    }
+    body = {"format": "json", "fields": fields or AUTH0_EXPORT_FIELDS}
+    if connection_id:
+        body["connection_id"] = connection_id
+    response = api_request_with_retry(
+        "post",
+        f"{context.auth0_base_url}/api/v2/jobs/users-exports",
+        headers=headers,
+        data=json.dumps(body),
+    )
+    if response is None or response.status_code not in (200, 201):
+        logging.error(
+            f"Error creating Auth0 users export job. Status code: {getattr(response, 'status_code', None)}"
+        )
+        return None
+    return response.json()["id"]
+
+
+def wait_for_auth0_job(job_id, poll_interval=5):
+    """
+    Poll an Auth0 job until it has completed or failed.
+
+    Args:
+    - job_id (string): The ID of the Auth0 job.
+    - poll_interval (int): The number of seconds to wait between polls.
+    Returns:
+    - job (dict): The completed job if successful, None otherwise.
+    """
+    context = get_migration_context()
+    headers = {"Authorization": f"Bearer {context.auth0_token}"}
+    while True:
+        response = api_request_with_retry(
+            "get",
+            f"{context.auth0_base_url}/api/v2/jobs/{job_id}",
+            headers=headers,
+        )
+        if response is None or response.status_code != 200:
+            logging.error(
+                f"Error polling Auth0 job {job_id}. Status code: {getattr(response, 'status_code', None)}"
+            )
+            return None
+        job = response.json()
+        if job["status"] == "completed":
+            return job
+        if job["status"] == "failed":
+            logging.error(f"Auth0 job {job_id} failed: {job}")
+            return None
+        logging.info(f"Auth0 job {job_id} is {job['status']}, polling again in {poll_interval} seconds")
+        time.sleep(poll_interval)
+
+
+def auth0_export_record_to_user(record):
+    """
+    Map a record of an Auth0 users export to the shape of the Auth0 users API.
+
+    The export holds the connection of the primary identity only, so the identities
+    of the user are rebuilt from it.
+
+    Args:
+    - record (dict): A single user from the Auth0 users export.
+    Returns:
+    - user (dict): The user, with identities as returned by the Auth0 users API.
+    """
+    if "identities" not in record and "connection" in record:
+        provider, _, identity_user_id = record["user_id"].partition("|")
+        record["identities"] = [
+            {
+                "connection": record.pop("connection"),
+                "provider": record.pop("provider", provider),
+                "user_id": identity_user_id,
+            }
+        ]
+    return record
+
+
+def fetch_auth0_users_from_export_job(poll_interval=5, connection_id=None, skip=0, checkpoint=None):
+    """
+    Export the Auth0 users with a users-exports job and stream the exported users.
+
+    The gzipped NDJSON export is decompressed and parsed while it is downloaded, so
+    it is never held in memory or on disk as a whole.
+
+    Args:
+    - poll_interval (int): The number of seconds to wait between polls of the job.
+    - connection_id (string): Optional Auth0 connection ID to limit the export to.
+    - skip (int): The number of users to skip, such as users already migrated before a resume.
+    - checkpoint (MigrationCheckpoint): Optional checkpoint recording the export job, so a resume
+      reads the same export rather than a new one whose order may differ.
+    Yields:
+    - Auth0User: The next exported Auth0 user.
+    """
+    job = None
+    job_id = checkpoint.export_job("users") if checkpoint else None
+    if job_id:
+        job = wait_for_auth0_job(job_id, poll_interval)
+        if job is None and skip:
+            # Users are merged into their existing Descope user, so starting over skips none
+            logging.warning(f"The Auth0 export job {job_id} is no longer available, exporting the users again from the start")
+            print(f"Unable to resume the Auth0 export job {job_id}, exporting the users again from the start")
+            skip = 0
+    if job is None:
+        job_id = create_auth0_users_export_job(connection_id=connection_id)
+        if job_id is None:
+            return
+        if checkpoint:
+            checkpoint.save_export_job("users", job_id)
+        job = wait_for_auth0_job(job_id, poll_interval)
+        if job is None:
+            return
+
+    # The export location is a pre-signed URL and must not receive the Auth0 token
+    response = api_request_with_retry("get", job["location"], headers={}, stream=True)
+    if response is None or response.status_code != 200:
+        logging.error(
+            f"Error downloading Auth0 users export. Status code: {getattr(response, 'status_code', None)}"
+        )
+        return
+    _, loads_json, _ = get_migration_context().json_backend
+    with response, gzip.open(response.raw, "rt", encoding="utf-8") as export:
+        lines = islice((line for line in export if line.strip()), skip, None)
+        for line in lines:
+            yield Auth0User.from_dict(auth0_export_record_to_user(loads_json(line)))
+
+
+async def fetch_auth0_json_async(path, query, description, semaphore):
+    """
+    Send a GET request to an Auth0 list endpoint and parse the response.
+
+    The blocking request runs in a worker thread, so requests are sent concurrently
+    while the semaphore limits how many requests are in flight.
+
+    Args:
+    - path (string): The path of the endpoint, such as /api/v2/roles.
+    - query (dict): The query parameters of the request.
+    - description (string): The items fetched, used in error messages.
+    - semaphore (asyncio.Semaphore): Limits the number of requests in flight.
+    Returns:
+    - The parsed response body if successful, None otherwise.
+    """
+    context = get_migration_context()
+    headers = {"Authorization": f"Bearer {context.auth0_token}"}
+    separator = "&" if "?" in path else "?"
+    async with semaphore:
+        response = await asyncio.to_thread(
+            api_request_with_retry,
+            "get",
+            f"{context.auth0_base_url}{path}{separator}{urlencode(query)}",
+            headers=headers,
+        )
+    if response is None or response.status_code != 200:
+        logging.error(
+            f"Error fetching Auth0 {description}. Status code: {getattr(response, 'status_code', None)}"
+        )
+        return None
+    return response.json()
+
+
+async def fetch_auth0_page_async(path, key, description, page, per_page, semaphore, include_totals=False):
+    """
+    Fetch a single page of an Auth0 list endpoint with offset pagination.
+
+    Args:
+    - path (string): The path of the endpoint, such as /api/v2/roles.
+    - key (string): The key holding the items in responses with totals, such as roles.
+    - description (string): The items fetched, used in error messages.
+    - page (int): The page to fetch.
+    - per_page (int): The number of items per page.
+    - semaphore (asyncio.Semaphore): Limits the number of requests in flight.
+    - include_totals (bool): Whether to request the total number of items.
+    Returns:
+    - (items, total): The items of the page, and the total if the response held one, None otherwise.
+    - Or None if the request failed.
+    """
+    query = {"page": page, "per_page": per_page}
+    if include_totals:
+        query["include_totals"] = "true"
+    body = await fetch_auth0_json_async(path, query, description, semaphore)
+    if body is None:
+        return None
+    if isinstance(body, list):
+        return body, None
+    return body.get(key, []), body.get("total")
+
+
+async def fetch_auth0_checkpoint_list_async(path, key, description, semaphore, take=AUTH0_PAGE_SIZE):
+    """
+    Fetch all the items of an Auth0 list endpoint with checkpoint pagination.
+
+    Each response holds a next token which the following request passes as from, so
+    there is no limit on the number of items and no offset to scan.
+
+    Args:
+    - path (string): The path of the endpoint, such as /api/v2/organizations.
+    - key (string): The key holding the items in the responses, such as organizations.
+    - description (string): The items fetched, used in error messages.
+    - semaphore (asyncio.Semaphore): Limits the number of requests in flight.
+    - take (int): The number of items per request.
+    Returns:
+    - items (list): The items fetched, up to the first failed request.
+    """
+    items = []
+    query = {"take": take}
+    while True:
+        body = await fetch_auth0_json_async(path, query, description, semaphore)
+        if body is None:
+            break
+        if isinstance(body, list):
+            # A plain list holds no next token to continue from
+            items.extend(body)
+            break
+        items.extend(body.get(key, []))
+        if not body.get("next"):
+            break
+        query = {"take": take, "from": body["next"]}
+    return items
+
+
+async def fetch_auth0_list_async(path, key, description, semaphore, per_page=AUTH0_PAGE_SIZE, checkpoint_pagination=False):
+    """
+    Fetch all the items of an Auth0 list endpoint.
+
+    Endpoints supporting checkpoint pagination are fetched with it. Otherwise the
+    first page is fetched with the total number of items, then all the remaining
+    pages are fetched concurrently.
+
+    Args:
+    - path (string): The path of the endpoint, such as /api/v2/roles.
+    - key (string): The key holding the items in responses with totals, such as roles.
+    - description (string): The items fetched, used in error messages.
+    - semaphore (asyncio.Semaphore): Limits the number of requests in flight.
+    - per_page (int): The number of items per page.
+    - checkpoint_pagination (bool): Whether the endpoint supports checkpoint pagination with from and take.
+    Returns:
+    - items (list): The items fetched, up to the first failed page.
+    """
+    if checkpoint_pagination:
+        return await fetch_auth0_checkpoint_list_async(path, key, description, semaphore, per_page)
+
+    first = await fetch_auth0_page_async(path, key, description, 0, per_page, semaphore, include_totals=True)
+    if first is None:
+        return []
+    items, total = first
+    items = list(items)
+
+    if total is None:
+        # The endpoint ignored include_totals, page until a page is not full
+        page_items = items
+        page = 0
+        while len(page_items) == per_page:
+            page += 1
+            result = await fetch_auth0_page_async(path, key, description, page, per_page, semaphore)
+            if result is None:
+                break
+            page_items = result[0]
+            items.extend(page_items)
+        return items
+
+    pages = await asyncio.gather(
+        *(
+            fetch_auth0_page_async(path, key, description, page, per_page, semaphore)
+            for page in range(1, -(-total // per_page))
+        )
+    )
+    for result in pages:
+        if result is None:
+            break
+        items.extend(result[0])
+    return items
+
+
+async def fetch_auth0_lists_async(paths, key, description, concurrency, checkpoint_pagination):
+    """
+    Fetch all the items of several Auth0 list endpoints, sharing one request limit.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(
+        *(
+            fetch_auth0_list_async(path, key, description, semaphore, checkpoint_pagination=checkpoint_pagination)
+            for path in paths
+        )
+    )
+
+
+async def fetch_auth0_pages_async(path, key, description, pages, per_page, include_totals, concurrency):
+    """
+    Fetch several pages of an Auth0 list endpoint, sharing one request limit.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(
+        *(
+            fetch_auth0_page_async(path, key, description, page, per_page, semaphore, include_totals)
+            for page in pages
+        )
+    )
+
+
+def fetch_auth0_lists(paths, key, description, checkpoint_pagination=False, concurrency=None):
+    """
+    Fetch all the items of several Auth0 list endpoints in parallel.
+
+    This is the paginator shared by the Auth0 list fetches, with AUTH0_PAGE_SIZE items
+    per request.
+
+    Args:
+    - paths (list): The paths of the endpoints, such as the permissions path of each role.
+    - key (string): The key holding the items in the responses.
+    - description (string): The items fetched, used in error messages.
+    - checkpoint_pagination (bool): Whether the endpoints support checkpoint pagination with from and take.
+    - concurrency (int): The number of requests in flight, AUTH0_FETCH_CONCURRENCY by default.
+    Returns:
+    - lists (list): The items of each endpoint, in the order of paths.
+    """
+    return asyncio.run(
+        fetch_auth0_lists_async(
+            paths, key, description, concurrency or get_migration_context().auth0_fetch_concurrency, checkpoint_pagination
+        )
+    )
+
+
+def fetch_auth0_pages(path, key, description, pages, per_page, include_totals=False, concurrency=None):
+    """
+    Fetch several pages of an Auth0 list endpoint in parallel.
+
+    Args:
+    - path (string): The path of the endpoint.
+    - key (string): The key holding the items in responses with totals.
+    - description (string): The items fetched, used in error messages.
+    - pages (iterable): The pages to fetch.
+    - per_page (int): The number of items per page.
+    - include_totals (bool): Whether to request the total number of items.
+    - concurrency (int): The number of requests in flight, AUTH0_FETCH_CONCURRENCY by default.
+    Returns:
+    - results (list): The (items, total) of each page or None if it failed, in the order of pages.
+    """
+    return asyncio.run(
+        fetch_auth0_pages_async(
+            path, key, description, pages, per_page, include_totals, concurrency or get_migration_context().auth0_fetch_concurrency
+        )
+    )
+
+
+def fetch_auth0_roles():
+    """
+    Fetch and parse Auth0 roles from the provided endpoint.
+
+    Returns:
+    - all_roles (Dict): A list of parsed Auth0 roles if successful, empty list otherwise.
+    """
+    return fetch_auth0_lists(["/api/v2/roles"], "roles", "roles")[0]
+
+
+def get_users_in_role(role):
+    """
+    Get and parse Auth0 users associated with the provided role.
+
+    Returns:
+    - role (string): The role ID to get the associated members
+    """
+    return get_users_in_roles([role])[role]
+
+
+def get_users_in_roles(roles):
+    """
+    Get the Auth0 users associated with each of the provided roles, in parallel.
+
+    Args:
+    - roles (list): The role IDs to get the associated members of.
+    Returns:
+    - users_by_role (dict): The users of each role, keyed by role ID.
+    """
+    paths = [f"/api/v2/roles/{role}/users" for role in roles]
+    return dict(zip(roles, fetch_auth0_lists(paths, "users", "users in roles", checkpoint_pagination=True)))
+
+
+def get_permissions_for_role(role):
+    """
+    Get and parse Auth0 permissions for a role
+
+    Args:
+    - role (string): The id of the role to query for permissions
+    Returns:
+    - all_permissions (string): Dictionary of all permissions associated to the role.
+    """
+    return get_permissions_for_roles([role])[role]
+
+
+def get_permissions_for_roles(roles):
+    """
+    Get the Auth0 permissions of each of the provided roles, in parallel.
+
+    Args:
+    - roles (list): The role IDs to query for permissions.
+    Returns:
+    - permissions_by_role (dict): The permissions of each role, keyed by role ID.
+    """
+    paths = [f"/api/v2/roles/{role}/permissions" for role in roles]
+    return dict(zip(roles, fetch_auth0_lists(paths, "permissions", "permissions in roles")))
+
+
+def fetch_auth0_organizations():
+    """
+    Fetch and parse Auth0 organization members from the provided endpoint.
+
+    Returns:
+    - all_organizations (string): Dictionary of all organizations within the Auth0 tenant.
+    """
+    return fetch_auth0_lists(
+        ["/api/v2/organizations"], "organizations", "organizations", checkpoint_pagination=True
+    )[0]
+
+
+def fetch_auth0_organization_members(organization):
+    """
+    Fetch and parse Auth0 organization members from the provided endpoint.
+
+    Args:
+    - organization (string): Auth0 organization ID to fetch the members
+    Returns:
+    - all_members (dict): Dictionary of all members within the organization.
+    """
+    return fetch_auth0_organizations_members([organization])[organization]
+
+
+def fetch_auth0_organizations_members(organizations):
+    """
+    Fetch the members of each of the provided Auth0 organizations, in parallel.
+
+    Args:
+    - organizations (list): The Auth0 organization IDs to fetch the members of.
+    Returns:
+    - members_by_organization (dict): The members of each organization, keyed by organization ID.
+    """
+    paths = [f"/api/v2/organizations/{organization}/members" for organization in organizations]
+    return dict(
+        zip(organizations, fetch_auth0_lists(paths, "members", "organization members", checkpoint_pagination=True))
+    )
+
+
+### End Auth0 Actions
+
+### Begin Descope Actions
+
+
+def create_descope_permissions(permissions, snapshot=None):
+    """
+    Create the missing Descope permissions out of the permissions of all the roles.
+
+    The existing Descope permissions are taken from the snapshot, or loaded once without
+    one, and the permissions missing from Descope are created with a single batch
+    request. If the batch fails, they are created one at a time to find the failing
+    permissions.
+
+    Args:
+    - permissions (iterable): The Auth0 permissions of all the roles, which may repeat.
+    - snapshot (DescopeProjectSnapshot): Optional snapshot of the existing Descope permissions,
+      which the created permissions are added to.
+    Returns:
+    - created_permissions (set): The names of the permissions created in Descope.
+    - existing_permissions (set): The names of the permissions which already existed in Descope.
+    - failed_permissions (dict): The errors of the permissions which failed to be created, keyed by name.
+    """
+    descriptions = {}
+    for permission in permissions:
+        descriptions.setdefault(permission["permission_name"], permission.get("description", ""))
+
+    created_permissions = set()
+    existing_permissions = set()
+    failed_permissions = {}
+    missing = []
+    try:
+        if snapshot is not None:
+            existing_permissions = {name for name in descriptions if name in snapshot.permission_names}
+        else:
+            resp = descope_client.mgmt.permission.load_all()
+            existing_permissions = {permission["name"] for permission in resp["permissions"]} & descriptions.keys()
+    except AuthException as error:
+        logging.error(f"Unable to load Descope permissions, creating them one at a time: {error.error_message}")
+        missing = sorted(descriptions)
+    else:
+        batch = sorted(descriptions.keys() - existing_permissions)
+        if batch:
+            try:
+                descope_client.mgmt.permission.create_batch(
+                    [{"name": name, "description": descriptions[name]} for name in batch]
+                )
+                created_permissions.update(batch)
+            except AuthException as error:
+                logging.error(f"Unable to create permissions in a batch, creating them one at a time: {error.error_message}")
+                missing = batch
+
+    for name in missing:
+        try:
+            descope_client.mgmt.permission.create(name=name, description=descriptions[name])
+            created_permissions.add(name)
+        except AuthException as error:
+            logging.error(f"Unable to create permission: {name}.")
+            logging.error(f"Status Code: {error.status_code}")
+            logging.error(f"Error: {error.error_message}")
+            error_message_dict = json.loads(error.error_message)
+            if error_message_dict["errorCode"] == "E024104":
+                existing_permissions.add(name)
+            else:
+                failed_permissions[name] = error.error_message
+    if snapshot is not None:
+        for name in created_permissions | existing_permissions:
+            snapshot.add_permission(name)
+    return created_permissions, existing_permissions, failed_permissions
+
+
+def create_descope_role(role, permission_names, snapshot=None):
+    """
+    Create a Descope role with its permissions using the Descope Python SDK.
+
+    Args:
+    - role (dict): A dictionary containing role details from Auth0.
+    - permission_names (list): The names of the Descope permissions of the role.
+    - snapshot (DescopeProjectSnapshot): Optional snapshot of the existing roles, searched instead of Descope.
+    Returns:
+    - success (bool): Whether the role was created.
+    - role_exists (bool): Whether the role already existed in Descope.
+    - error (string): The error if the role failed to be created, empty otherwise.
+    """
+    role_name = role["name"]
+    if check_role_exists_descope(role_name, snapshot):
+        return False, True, ""
+    role_description = role.get("description", "")
+    try:
+        descope_client.mgmt.role.create(
+            name=role_name,
+            description=role_description,
+            permission_names=permission_names,
+        )
+        if snapshot is not None:
+            snapshot.add_role(role_name)
+        return True, False, ""
+    except AuthException as error:
+        logging.error(f"Unable to create role: {role_name}.")
+        logging.error(f"Status Code: {error.status_code}")
+        logging.error(f"Error: {error.error_message}")
+        return False, False, f"{role_name}  Reason: {error.error_message}"
+
+
+def get_auth0_login_ids_and_connections(user):
+    """
+    Map the identities of an Auth0 user to Descope login IDs and connection names.
+
+    Args:
+    - user (dict): A dictionary containing user details fetched from Auth0 API.
+    Returns:
+    - login_ids (list): The Descope login IDs of the user, the primary login ID first.
+    - connections (list): The Auth0 connections of the user.
+    """
+    login_ids = []
+    connections = []
+    for identity in user.get("identities", []):
+        if "Username" in identity["connection"]:
+            login_ids.append(user.get("email"))
+            connections.append(identity["connection"])
+        elif "sms" in identity["connection"]:
+            login_ids.append(user.get("phone_number"))
+            connections.append(identity["connection"])
+        elif "-" in identity["connection"]:
+            login_ids.append(
+                identity["connection"].split("-")[0] + "-" + identity["user_id"]
+            )
+            connections.append(identity["connection"])
+        else:
+            login_ids.append(identity["connection"] + "-" + identity["user_id"])
+            connections.append(identity["connection"])
+    return login_ids, connections
+
+
+def get_missing_login_id_error(user):
+    """
+    Check that an Auth0 user has a login ID to be migrated with.
+
+    Exported users have no identities when they were not enriched, such as with
+    --no-enrich or when they were deleted from Auth0 since the export.
+
+    Args:
+    - user (Auth0User): The Auth0 user.
+    Returns:
+    - string: The failed user entry when the user has no login ID, None otherwise.
+    """
+    if user.login_ids and user.login_ids[0]:
+        return None
+    logging.error(f"Unable to migrate Auth0 user {user.user_id or 'unknown'}, it has no identity to use as login ID")
+    return f"{user.user_id or 'unknown'} Reason: no identity to use as login ID"
+
+
+def build_descope_user_object(user, assignments=None):
+    """
+    Build the Descope user object for a new user based on Auth0 user data.
+
+    Args:
+    - user (Auth0User): The Auth0 user.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants gathered for the users.
+    Returns:
+    - UserObj: The user to create within Descope.
+    """
+    role_names = user_tenants = None
+    if assignments is not None:
+        _, role_names, user_tenants = assignments.for_user(user.user_id, user.email)
+    return UserObj(
+        login_id=user.login_ids[0],
+        email=user.email,
+        display_name=user.name,
+        given_name=user.given_name,
+        family_name=user.family_name,
+        phone=user.phone,
+        picture=user.picture,
+        custom_attributes={
+            "connection": ",".join(map(str, user.connections)),
+            "freshlyMigrated": True,
+        },
+        verified_email=user.email_verified,
+        verified_phone=user.phone_verified if user.phone else False,
+        additional_login_ids=list(user.login_ids[1:]),
+        status="disabled" if user.blocked else "enabled",
+        role_names=role_names,
+        user_tenants=user_tenants,
+    )
+
+
+class DescopeUserIndex:
+    """
+    In-memory index of the existing Descope users by email and by login ID.
+
+    The index is loaded once before the migration and updated as users are created
+    or merged, so deciding between a create and a merge needs no network call.
+    """
+
+    def __init__(self):
+        self.by_email = {}
+        self.by_login_id = {}
+        self._lock = threading.Lock()
+
+    def load(self, page_size=DEFAULT_BATCH_SIZE):
+        """
+        Page through all existing Descope users and add them to the index.
+
+        Args:
+        - page_size (int): The number of users fetched with each search call.
+        """
+        page = 0
+        while True:
+            resp = descope_client.mgmt.user.search_all(limit=page_size, page=page)
+            users = resp["users"]
+            for user in users:
+                self.add(user, replace=False)
+            if len(users) < page_size:
+                break
+            page += 1
+        logging.info(f"Loaded {len(self.by_login_id)} Descope login IDs into the user index")
+        return self
+
+    def add(self, user, replace=True):
+        """
+        Add or replace a Descope user in the index.
+
+        Args:
+        - user (dict): A Descope user, as returned by the Descope search API.
+        - replace (bool): Whether to replace a user already indexed with the same email.
+        """
+        with self._lock:
+            email = user.get("email")
+            if email and (replace or email not in self.by_email):
+                self.by_email[email] = user
+            for login_id in user.get("loginIds", []):
+                self.by_login_id[login_id] = user
+
+    def add_user_object(self, user_object):
+        """
+        Add a user created or updated by the migration to the index.
+
+        The roles and tenants of a user already indexed are kept, since the migration
+        does not send them when merging.
+
+        Args:
+        - user_object (UserObj): The user as sent to Descope.
+        """
+        previous = self.by_login_id.get(user_object.login_id, {})
+        self.add(
+            {
+                "loginIds": [user_object.login_id] + list(user_object.additional_login_ids or []),
+                "email": user_object.email,
+                "name": user_object.display_name,
+                "givenName": user_object.given_name,
+                "familyName": user_object.family_name,
+                "phone": user_object.phone,
+                "picture": user_object.picture,
+                "customAttributes": dict(user_object.custom_attributes or {}),
+                "verifiedEmail": user_object.verified_email,
+                "verifiedPhone": user_object.verified_phone,
+                "status": user_object.status or "enabled",
+                "roleNames": previous.get("roleNames") or list(user_object.role_names or []),
+                "userTenants": previous.get("userTenants")
+                or [
+                    {"tenantId": tenant.tenant_id, "roleNames": list(tenant.role_names or [])}
+                    for tenant in user_object.user_tenants or []
+                ],
+            }
+        )
+
+    def find(self, email, login_ids=()):
+        """
+        Find an existing Descope user by email, falling back to the login IDs.
+
+        Args:
+        - email (string): The email of the user.
+        - login_ids (list): The Descope login IDs of the user.
+        Returns:
+        - dict: The Descope user if found, None otherwise.
+        """
+        with self._lock:
+            if email and email in self.by_email:
+                return self.by_email[email]
+            for login_id in login_ids:
+                if login_id in self.by_login_id:
+                    return self.by_login_id[login_id]
+        return None
+
+
+def find_descope_user_by_email(email):
+    """
+    Find an existing Descope user with the provided email.
+
+    Args:
+    - email (string): The email of the user to search for.
+    Returns:
+    - dict: The Descope user if found, None otherwise.
+    """
+    try:
+        resp = descope_client.mgmt.user.search_all(emails=[email])
+    except AuthException as error:
+        return None
+    users = resp["users"]
+    return users[0] if users else None
+
+
+def find_existing_descope_user(user, user_index=None):
+    """
+    Find the Descope user an Auth0 user should be merged into.
+
+    Args:
+    - user (Auth0User): The Auth0 user.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users, used instead of searching Descope.
+    Returns:
+    - dict: The Descope user if found, None otherwise.
+    """
+    if user_index is not None:
+        return user_index.find(user.email, user.login_ids)
+    return find_descope_user_by_email(user.email)
+
+
+def build_merged_user_object(user, user_to_update):
+    """
+    Build the update merging an Auth0 user into the existing Descope user it matches.
+
+    The connections already recorded on the Descope user are left out, so a user which
+    was merged before needs no update.
+
+    Args:
+    - user (Auth0User): The Auth0 user.
+    - user_to_update (dict): The existing Descope user, as returned by the Descope search API.
+    Returns:
+    - UserObj: The merged user, or None when the Descope user already has all the connections of the Auth0 user.
+    - disabled (bool): Whether the Descope user must be disabled, since one of the merged accounts is.
+    """
+    login_ids, connections = list(user.login_ids), list(user.connections)
+    disabled = bool(user.blocked) or user_to_update["status"] == "disabled"
+
+    custom_attributes = dict(user_to_update["customAttributes"])
+    if "connection" in user_to_update["customAttributes"]:
+        for connection in custom_attributes["connection"].split(","):
+            if connection in connections:
+                connections.remove(connection)
+    if len(connections) == 0:
+        return None, disabled
+    additional_connections = ",".join(map(str, connections))
+    if "connection" in user_to_update["customAttributes"] and additional_connections:
+        custom_attributes["connection"] += "," + additional_connections
+    else:
+        custom_attributes["connection"] = additional_connections
+
+    login_id = user_to_update["loginIds"][0]
+    if login_id in login_ids:
+        login_ids.remove(login_id)
+    return (
+        UserObj(
+            login_id=login_id,
+            email=user_to_update["email"],
+            display_name=user_to_update["name"],
+            given_name=user.given_name or user_to_update["givenName"],
+            family_name=user.family_name or user_to_update["familyName"],
+            phone=user_to_update["phone"],
+            picture=user.picture or user_to_update["picture"],
+            custom_attributes=custom_attributes,
+            verified_email=user_to_update["verifiedEmail"],
+            verified_phone=user_to_update["verifiedPhone"],
+            additional_login_ids=login_ids,
+            status="disabled" if disabled else user_to_update["status"],
+        ),
+        disabled,
+    )
+
+
+def create_descope_user(user, user_index=None, assignments=None):
+    """
+    Create a Descope user based on matched Auth0 user data using Descope Python SDK.
+
+    Args:
+    - user (Auth0User): The Auth0 user.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users, used instead of searching Descope.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
+      Merged users keep theirs until the assignments are applied.
+    """
+    error_message = get_missing_login_id_error(user)
+    if error_message:
+        return False, "", False, error_message
+    try:
+        user_to_update = find_existing_descope_user(user, user_index)
+
+        if user_to_update is None:
+            user_object = build_descope_user_object(user, assignments)
+            login_id = user_object.login_id
+
+            # Create the user
+            resp = descope_client.mgmt.user.create(
+                login_id=login_id,
+                email=user_object.email,
+                display_name=user_object.display_name,
+                given_name=user_object.given_name,
+                family_name=user_object.family_name,
+                phone=user_object.phone,
+                picture=user_object.picture,
+                custom_attributes=user_object.custom_attributes,
+                verified_email=user_object.verified_email,
+                verified_phone=user_object.verified_phone,
+                additional_login_ids=user_object.additional_login_ids,
+                role_names=user_object.role_names,
+                user_tenants=user_object.user_tenants,
+            )
+            if user_index is not None:
+                user_index.add_user_object(user_object)
+            if assignments is not None:
+                assignments.mark_created(assignments.for_user(user.user_id, user.email)[0])
+
+            # Update user status if necessary
+            status = user_object.status
+            if status == "disabled":
+                try:
+                    resp = descope_client.mgmt.user.deactivate(login_id=login_id)
+                except AuthException as error:
+                    logging.error(f"Unable to deactivate user.")
+                    logging.error(f"Status Code: {error.status_code}")
+                    logging.error(f"Error: {error.error_message}")
+            elif status == "enabled":
+                try:
+                    resp = descope_client.mgmt.user.activate(login_id=login_id)
+                except AuthException as error:
+                    logging.error(f"Unable to activate user.")
+                    logging.error(f"Status Code: {error.status_code}")
+                    logging.error(f"Error: {error.error_message}")
+            return True, "", False, ""
+        else:
+            return merge_descope_user(user, user_to_update, user_index)
+    except AuthException as error:
+        logging.error(f"Unable to create user {user.user_id or 'unknown'}. Error: {error.error_message}")
+        return (
+            False,
+            "",
+            False,
+            user.user_id + " Reason: " + error.error_message,
+        )
+
+
+def merge_descope_user(user, user_to_update, user_index=None):
+    """
+    Merge an Auth0 user into the existing Descope user it matches.
+
+    Args:
+    - user (Auth0User): The Auth0 user.
+    - user_to_update (dict): The existing Descope user, as returned by the Descope search API.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users to update.
+    """
+    try:
+        merged_user, disabled = build_merged_user_object(user, user_to_update)
+        if merged_user is None:
+            if disabled:
+                try:
+                    resp = descope_client.mgmt.user.deactivate(login_id=user_to_update["loginIds"][0])
+                except AuthException as error:
+                    logging.error(f"Unable to deactivate user.")
+                    logging.error(f"Status Code: {error.status_code}")
+                    logging.error(f"Error: {error.error_message}")
+                return None, "", True, user.user_id
+            return None, "", None, ""
+
+        login_id = merged_user.login_id
+        resp = descope_client.mgmt.user.update(
+            login_id=login_id,
+            email=merged_user.email,
+            display_name=merged_user.display_name,
+            given_name=merged_user.given_name,
+            family_name=merged_user.family_name,
+            phone=merged_user.phone,
+            picture=merged_user.picture,
+            custom_attributes=merged_user.custom_attributes,
+            verified_email=merged_user.verified_email,
+            verified_phone=merged_user.verified_phone,
+            additional_login_ids=merged_user.additional_login_ids,
+        )
+        if user_index is not None:
+            user_index.add_user_object(merged_user)
+        if disabled:
+            try:
+                resp = descope_client.mgmt.user.deactivate(login_id=login_id)
+
+            except AuthException as error:
+                logging.error(f"Unable to deactivate user.")
+                logging.error(f"Status Code: {error.status_code}")
+                logging.error(f"Error: {error.error_message}")
+            return True, user.name, True, user.user_id
+        return True, user.name, False, ""
+    except AuthException as error:
+        logging.error(f"Unable to merge user {user.user_id or 'unknown'}. Error: {error.error_message}")
+        return (
+            False,
+            "",
+            False,
+            user.user_id + " Reason: " + error.error_message,
+        )
+
+
+def create_descope_users_batch(user_objects):
+    """
+    Create a batch of Descope users with a single invite_batch call.
+
+    A batch which fails as a whole is split in half and retried until the users
+    causing the failure are isolated.
+
+    Args:
+    - user_objects (list): A list of UserObj to create within Descope.
+    Returns:
+    - failed (dict): The error message of each user which failed to be created, keyed by login ID.
+    """
+    if not user_objects:
+        return {}
+    try:
+        resp = descope_client.mgmt.user.invite_batch(
+            users=user_objects,
+            invite_url="https://localhost",
+            send_mail=False,
+            send_sms=False
+        )
+    except AuthException as error:
+        if len(user_objects) == 1:
+            logging.error(f"Unable to create user {user_objects[0].login_id}.")
+            logging.error(f"Error:, {error.error_message}")
+            return {user_objects[0].login_id: error.error_message}
+        logging.warning(
+            f"Unable to create batch of {len(user_objects)} users, retrying in halves."
+        )
+        middle = len(user_objects) // 2
+        failed = create_descope_users_batch(user_objects[:middle])
+        failed.update(create_descope_users_batch(user_objects[middle:]))
+        return failed
+
+    failed = {}
+    for failed_user in resp.get("failedUsers") or []:
+        login_id = (failed_user.get("user", {}).get("loginIds") or [""])[0]
+        failed[login_id] = failed_user.get("failure", "")
+        logging.error(f"Unable to create user {login_id}.")
+        logging.error(f"Error:, {failed[login_id]}")
+    return failed
+
+
+def patch_descope_users_batch(user_objects):
+    """
+    Patch the roles and tenants of a batch of Descope users with a single patch_batch call.
+
+    Args:
+    - user_objects (list): A list of UserObj holding the login ID, roles and tenants of each user.
+    Returns:
+    - failed (dict): The error message of each user which failed to be updated, keyed by login ID.
+    """
+    failed = {}
+    try:
+        resp = descope_client.mgmt.user.patch_batch(user_objects)
+        for failure in resp.get("failedUsers") or []:
+            failed[failure["user"]["loginIds"][0]] = failure["failure"]
+    except AuthException as error:
+        logging.error(f"Unable to assign roles and tenants to users: {error.error_message}")
+        for user_object in user_objects:
+            failed[user_object.login_id] = error.error_message
+    return failed
+
+
+def create_descope_roles_batch(roles):
+    """
+    Create a batch of Descope roles with a single create_batch call.
+
+    The batch is created in a single transaction, so when it fails the roles are
+    created one at a time to find the failing roles.
+
+    Args:
+    - roles (list): The roles to create, as dicts with a name, description and permission_names.
+    Returns:
+    - failed (dict): The error message of each role which failed to be created, keyed by name.
+    """
+    try:
+        descope_client.mgmt.role.create_batch(
+            [
+                {"name": role["name"], "description": role.get("description", ""), "permissionNames": role["permission_names"]}
+                for role in roles
+            ]
+        )
+        return {}
+    except AuthException as error:
+        logging.error(f"Unable to create roles in a batch, creating them one at a time: {error.error_message}")
+
+    failed = {}
+    for role in roles:
+        try:
+            descope_client.mgmt.role.create(
+                name=role["name"],
+                description=role.get("description", ""),
+                permission_names=role["permission_names"],
+            )
+        except AuthException as error:
+            logging.error(f"Unable to create role: {role['name']}.")
+            logging.error(f"Error: {error.error_message}")
+            failed[role["name"]] = error.error_message
+    return failed
+
+
+def create_descope_tenant(organization, snapshot=None):
+    """
+    Create a Descope create_descope_tenant based on matched Auth0 organization data.
+
+    Args:
+    - organization (dict): A dictionary containing organization details fetched from Auth0 API.
+    - snapshot (DescopeProjectSnapshot): Optional snapshot of the existing tenants to add the tenant to.
+    """
+    name = organization["display_name"]
+    tenant_id = organization["id"]
+
+    try:
+        resp = descope_client.mgmt.tenant.create(name=name, id=tenant_id)
+        if snapshot is not None:
+            snapshot.add_tenant(tenant_id)
+        return True, ""
+    except AuthException as error:
+        logging.error("Unable to create tenant.")
+        logging.error(f"Error:, {error.error_message}")
+        return False, f"Tenant {name} failed to create Reason: {error.error_message}"
+
+
+class DescopeProjectSnapshot:
+    """
+    In-memory snapshot of the names of the existing Descope roles and permissions and
+    the IDs of the existing Descope tenants.
+
+    The snapshot is loaded with one call each before the roles and organizations are
+    migrated and updated as they are created, so existence checks need no network call.
+    """
+
+    def __init__(self):
+        self.role_names = set()
+        self.tenant_ids = set()
+        self.permission_names = set()
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+        Load all existing Descope roles, tenants and permissions into the snapshot.
+        """
+        roles = descope_client.mgmt.role.load_all()["roles"]
+        tenants = descope_client.mgmt.tenant.load_all()["tenants"]
+        permissions = descope_client.mgmt.permission.load_all()["permissions"]
+        with self._lock:
+            self.role_names.update(role["name"] for role in roles)
+            self.tenant_ids.update(tenant["id"] for tenant in tenants)
+            self.permission_names.update(permission["name"] for permission in permissions)
+        logging.info(f"Loaded {len(self.role_names)} Descope roles and {len(self.tenant_ids)} tenants into the snapshot")
+        return self
+
+    def add_role(self, role_name):
+        with self._lock:
+            self.role_names.add(role_name)
+
+    def add_tenant(self, tenant_id):
+        with self._lock:
+            self.tenant_ids.add(tenant_id)
+
+    def add_permission(self, permission_name):
+        with self._lock:
+            self.permission_names.add(permission_name)
+
+
+class DescopeAssignmentAggregator:
+    """
+    Gathers the roles and tenants of each user from all the Auth0 roles and
+    organizations, and applies them with one patch per user, sent in batches, instead
+    of one call per role or tenant assignment.
+
+    The work recorded to the checkpoint by the role and organization phases is
+    deferred until the assignments are applied, so an interrupted run gathers them
+    again on resume. When the roles and organizations are processed before the users,
+    the users are created with their roles and tenants and skipped when applying.
+    """
+
+    def __init__(self):
+        self.roles = {}
+        self.tenants = {}
+        self.role_names = []
+        self.tenant_names = {}
+        self.login_ids_by_user_id = {}
+        self.created = set()
+        self._deferred = []
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Worker processes receive a copy of the gathered roles and tenants, without the lock
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def add_role(self, login_id, role_name, user_id=None):
+        """
+        Record that a user belongs to a role.
+
+        Args:
+        - login_id (string): The login ID of the user.
+        - role_name (string): The name of the role.
+        - user_id (string): Optional Auth0 user ID of the user.
+        """
+        with self._lock:
+            if role_name not in self.role_names:
+                self.role_names.append(role_name)
+            self.roles.setdefault(login_id, set()).add(role_name)
+            if user_id:
+                self.login_ids_by_user_id[user_id] = login_id
+
+    def add_tenant(self, login_id, tenant_id, tenant_name, user_id=None):
+        """
+        Record that a user belongs to a tenant.
+
+        Args:
+        - login_id (string): The login ID of the user.
+        - tenant_id (string): The ID of the tenant.
+        - tenant_name (string): The name of the tenant, used in the summary.
+        - user_id (string): Optional Auth0 user ID of the user.
+        """
+        with self._lock:
+            self.tenant_names.setdefault(tenant_id, tenant_name)
+            self.tenants.setdefault(login_id, set()).add(tenant_id)
+            if user_id:
+                self.login_ids_by_user_id[user_id] = login_id
+
+    def for_user(self, user_id, email):
+        """
+        Get the gathered roles and tenants of an Auth0 user, to create the user with them.
+
+        Args:
+        - user_id (string): The Auth0 user ID of the user, matched first.
+        - email (string): The email of the user, matched when the user ID was not gathered.
+        Returns:
+        - key (string): The login ID the roles and tenants were gathered for, to pass to mark_created.
+        - role_names (list): The names of the roles of the user.
+        - user_tenants (list): The tenants of the user, as AssociatedTenant objects.
+        """
+        key = self.login_ids_by_user_id.get(user_id, email)
+        role_names = sorted(self.roles.get(key, ()))
+        user_tenants = [AssociatedTenant(tenant_id) for tenant_id in sorted(self.tenants.get(key, ()))]
+        return key, role_names, user_tenants
+
+    def mark_created(self, key):
+        """
+        Record that a user was created with its gathered roles and tenants, so apply skips it.
+
+        Args:
+        - key (string): The key returned by for_user.
+        """
+        with self._lock:
+            self.created.add(key)
+
+    def defer(self, phase, item_id=None):
+        """
+        Defer recording a checkpoint item, or the completion of a phase if item_id is None,
+        until the assignments are applied.
+        """
+        with self._lock:
+            self._deferred.append((phase, item_id))
+
+    def pending_login_ids(self):
+        """
+        Returns:
+        - list: The login IDs with gathered roles or tenants, except the users created with them.
+        """
+        return [
+            login_id
+            for login_id in dict.fromkeys(list(self.roles) + list(self.tenants))
+            if login_id not in self.created
+        ]
+
+    def build_user_patch(self, login_id, user):
+        """
+        Build the patch of a Descope user, which keeps the roles and tenants the user
+        already has along with the gathered ones.
+
+        Args:
+        - login_id (string): The login ID the roles and tenants were gathered for.
+        - user (dict): The existing Descope user, as returned by the Descope search API.
+        Returns:
+        - UserObj: The user with its roles and tenants.
+        """
+        role_names = set(user.get("roleNames") or []) | self.roles.get(login_id, set())
+        user_tenants = {
+            tenant["tenantId"]: tenant.get("roleNames") or [] for tenant in user.get("userTenants") or []
+        }
+        for tenant_id in self.tenants.get(login_id, ()):
+            user_tenants.setdefault(tenant_id, [])
+        return UserObj(
+            login_id=login_id,
+            role_names=sorted(role_names),
+            user_tenants=[
+                AssociatedTenant(tenant_id, tenant_role_names)
+                for tenant_id, tenant_role_names in user_tenants.items()
+            ],
+        )
+
+    def apply(self, user_index=None, batch_size=ASSIGNMENT_BATCH_SIZE, checkpoint=None):
+        """
+        Apply the gathered roles and tenants to the Descope users.
+
+        The current roles and tenants of each batch of users are read from the user
+        index, or searched with one request for the users missing from it, and kept
+        along with the gathered ones.
+
+        Args:
+        - user_index (DescopeUserIndex): Optional index of the existing Descope users.
+        - batch_size (int): The number of users patched with each request.
+        - checkpoint (MigrationCheckpoint): Optional checkpoint to record the deferred work to.
+        Returns:
+        - failed (dict): The errors of the users which failed to be updated, keyed by login ID.
+        """
+        failed = {}
+        login_ids = self.pending_login_ids()
+        task = progress.start("Assignments", len(login_ids))
+        for batch in iter_batches(login_ids, batch_size):
+            existing = {}
+            if user_index is not None:
+                # Users indexed without their roles are searched, so their roles are kept
+                existing = {
+                    login_id: user_index.by_login_id[login_id]
+                    for login_id in batch
+                    if "roleNames" in user_index.by_login_id.get(login_id, {})
+                }
+            missing = [login_id for login_id in batch if login_id not in existing]
+            if missing:
+                try:
+                    resp = descope_client.mgmt.user.search_all(login_ids=missing, limit=len(missing))
+                except AuthException as error:
+                    logging.error(f"Unable to load users to assign roles and tenants: {error.error_message}")
+                    for login_id in missing:
+                        failed[login_id] = error.error_message
+                    resp = {"users": []}
+                for user in resp["users"]:
+                    for login_id in user.get("loginIds", []):
+                        existing[login_id] = user
+
+            user_objects = []
+            for login_id in batch:
+                if login_id in failed:
+                    continue
+                user = existing.get(login_id)
+                if user is None:
+                    failed[login_id] = "User not found in Descope"
+                    continue
+                user_objects.append(self.build_user_patch(login_id, user))
+            if not user_objects:
+                task.advance(len(batch))
+                continue
+            failed.update(patch_descope_users_batch(user_objects))
+            task.advance(len(batch))
+        task.finish()
+
+        if checkpoint:
+            for phase, item_id in self._deferred:
+                if item_id is None:
+                    checkpoint.complete(phase)
+                else:
+                    checkpoint.mark_done(phase, item_id)
+        return failed
+
+    def summarize(self, failed):
+        """
+        Summarize the applied assignments per role and per tenant.
+
+        Args:
+        - failed (dict): The errors returned by apply, keyed by login ID.
+        Returns:
+        - roles_and_users (list): The number of users mapped to each role.
+        - failed_roles_and_users (list): The role assignments which failed.
+        - tenant_users (list): The number of users associated with each tenant.
+        - failed_users_added_tenants (list): The tenant assignments which failed.
+        """
+        role_counts = dict.fromkeys(self.role_names, 0)
+        failed_roles_and_users = []
+        for login_id, role_names in self.roles.items():
+            for role_name in sorted(role_names):
+                if login_id in failed:
+                    failed_roles_and_users.append(
+                        f"{login_id} failed to be added to {role_name} Reason: {failed[login_id]}"
+                    )
+                else:
+                    role_counts[role_name] += 1
+        tenant_counts = dict.fromkeys(self.tenant_names, 0)
+        failed_users_added_tenants = []
+        for login_id, tenant_ids in self.tenants.items():
+            for tenant_id in sorted(tenant_ids):
+                if login_id in failed:
+                    failed_users_added_tenants.append(
+                        f"User {login_id} failed to be added to tenant {self.tenant_names[tenant_id]} Reason: {failed[login_id]}"
+                    )
+                else:
+                    tenant_counts[tenant_id] += 1
+        return (
+            [f"Mapped {count} user to {role_name}" for role_name, count in role_counts.items()],
+            failed_roles_and_users,
+            [
+                f"Associated {count} users with tenant: {self.tenant_names[tenant_id]} "
+                for tenant_id, count in tenant_counts.items()
+            ],
+            failed_users_added_tenants,
+        )
+
+
+def check_tenant_exists_descope(tenant_id, snapshot=None):
+
+    if snapshot is not None:
+        return tenant_id in snapshot.tenant_ids
+    try:
+        tenant_resp = descope_client.mgmt.tenant.load(tenant_id)
+        return True
+    except:
+        return False
+
+def check_role_exists_descope(role_name, snapshot=None):
+
+    if snapshot is not None:
+        return role_name in snapshot.role_names
+    try:
+        roles_resp = descope_client.mgmt.role.search(role_names=[role_name])
+        if roles_resp["roles"]:
+            return True
+        else:
+            return False
+    except:
+        return False
+
+
+### End Descope Actions:
+
+### Begin Checkpoint Functions
+
+
+class MigrationCheckpoint:
+    """
+    Durable record of the migration progress, stored as an append-only NDJSON file.
+
+    Each line records the position reached within a phase, an item completed within a
+    phase, or the completion of a whole phase. Replaying the lines on resume restores
+    the progress, so completed work is skipped without any network calls.
+    """
+
+    def __init__(self, file_path, resume=False):
+        self.file_path = file_path
+        self.positions = {}
+        self.done = {}
+        self.completed = set()
+        self.export_jobs = {}
+        self._lock = threading.Lock()
+        needs_newline = False
+        if resume and os.path.exists(file_path):
+            needs_newline = self._replay()
+        self._file = open(file_path, "a" if resume else "w")
+        if needs_newline:
+            self._file.write("\n")
+
+    def _replay(self):
+        """
+        Restore the progress recorded in the checkpoint file.
+
+        Returns:
+        - bool: Whether the file ends with a partially written line.
+        """
+        with open(self.file_path, "r") as file:
+            lines = file.read().split("\n")
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Ignoring partially written checkpoint entry: {line}")
+                continue
+            phase = entry["phase"]
+            if "position" in entry:
+                self.positions[phase] = entry["position"]
+            if "done" in entry:
+                self.done.setdefault(phase, set()).add(entry["done"])
+            if "export_job" in entry:
+                self.export_jobs[phase] = entry["export_job"]
+            if entry.get("completed"):
+                self.completed.add(phase)
+        return lines[-1] != ""
+
+    def _append(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def position(self, phase):
+        """Return the number of items already processed within a phase."""
+        return self.positions.get(phase, 0)
+
+    def save_position(self, phase, position):
+        """Record the number of items processed within a phase."""
+        self.positions[phase] = position
+        self._append({"phase": phase, "position": position})
+
+    def export_job(self, phase):
+        """Return the ID of the Auth0 export job a phase reads its users from, if any."""
+        return self.export_jobs.get(phase)
+
+    def save_export_job(self, phase, job_id):
+        """Record the ID of the Auth0 export job a phase reads its users from."""
+        self.export_jobs[phase] = job_id
+        self._append({"phase": phase, "export_job": job_id})
+
+    def is_done(self, phase, item_id):
+        """Return whether an item, such as a role or organization ID, was completed within a phase."""
+        return item_id in self.done.get(phase, ())
+
+    def mark_done(self, phase, item_id):
+        """Record an item, such as a role or organization ID, as completed within a phase."""
+        self.done.setdefault(phase, set()).add(item_id)
+        self._append({"phase": phase, "done": item_id})
+
+    def is_completed(self, phase):
+        """Return whether a whole phase was completed."""
+        return phase in self.completed
+
+    def complete(self, phase):
+        """Record a whole phase as completed."""
+        self.completed.add(phase)
+        self._append({"phase": phase, "completed": True})
+
+    def close(self):
+        self._file.close()
+
+
+### End Checkpoint Functions
+
+### Begin Scheduler Functions
+
+
+class PhaseScheduler:
+    """
+    Runs the migration phases on threads, starting each phase as soon as the phases it
+    depends on are finished.
+
+    Phases without dependencies, such as the Auth0 reads, start immediately, and the
+    Descope writes start once their prerequisites are met, for example the role and
+    tenant assignments once the users are created.
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    def add(self, name, function, inputs=(), after=()):
+        """
+        Add a phase to run.
+
+        Args:
+        - name (string): The name of the phase, which its result is stored under.
+        - function (callable): The function running the phase.
+        - inputs (tuple): The phases whose results are passed to the function, in order.
+        - after (tuple): Other phases which must be finished before the phase starts.
+        """
+        self.phases[name] = (function, tuple(inputs), tuple(inputs) + tuple(after))
+
+    def run(self):
+        """
+        Run all the phases. A failing phase stops the phases depending on it, directly or
+        not, from starting, while the other phases run to completion. The error of the
+        first failing phase is then raised.
+
+        Returns:
+        - results (dict): The result of each phase, keyed by phase name.
+        """
+        results = {}
+        errors = {}
+        skipped = set()
+        pending = dict(self.phases)
+        running = {}
+        with ThreadPoolExecutor(max_workers=max(len(pending), 1)) as executor:
+            while pending or running:
+                blocked = errors.keys() | skipped
+                while blocked:
+                    # Skip the dependents of the failed phases, and in turn their dependents
+                    blocked = [
+                        name
+                        for name, (_, _, requires) in pending.items()
+                        if any(dependency in errors or dependency in skipped for dependency in requires)
+                    ]
+                    for name in blocked:
+                        del pending[name]
+                        skipped.add(name)
+                        logging.error(f"Skipping the {name} phase, a phase it depends on failed")
+                for name, (function, inputs, requires) in list(pending.items()):
+                    if all(dependency in results for dependency in requires):
+                        del pending[name]
+                        future = executor.submit(self._run_phase, name, function, *(results[dependency] for dependency in inputs))
+                        running[future] = name
+                if not running:
+                    if pending:
+                        raise ValueError(f"Unable to run phases with missing dependencies: {', '.join(pending)}")
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as error:
+                        logging.error(f"The {name} phase failed. Error: {error}")
+                        errors[name] = error
+        if errors:
+            raise next(iter(errors.values()))
+        return results
+
+    @staticmethod
+    def _run_phase(name, function, *args):
+        started = time.monotonic()
+        try:
+            return function(*args)
+        finally:
+            metrics.observe_phase(name, time.monotonic() - started)
+
+
+### End Scheduler Functions
+
+### Begin Process Functions
+
+
+def create_descope_users_sequentially(users, verbose, user_index=None, assignments=None):
+    """
+    Create Descope users one at a time.
+
+    Args:
+    - users (list): A list of users fetched from Auth0 API.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
+    Yields:
+    - The result of create_descope_user for each user, in the original order.
+    """
+    for user in users:
+        if verbose:
+            print(f"\tUser: {user.name}")
+        yield create_descope_user(user, user_index, assignments)
+
+
+def get_user_migration_keys(user):
+    """
+    Get the email and login IDs of an Auth0 user, two users sharing any of which are
+    migrated to the same Descope user.
+
+    Args:
+    - user (Auth0User): The Auth0 user.
+    Returns:
+    - set: The email and login IDs of the user.
+    """
+    return {key for key in (user.email, *user.login_ids) if key}
+
+
+def create_descope_users_in_batches(users, batch_size, verbose, user_index=None, assignments=None):
+    """
+    Create Descope users with batched invite_batch calls.
+
+    New users are packed into batches of up to batch_size users, while users matching
+    an existing Descope user are merged one at a time. Pending users are sent early
+    when a later user shares their email or one of their login IDs, such as the phone
+    number of SMS users, so the merge decision is the same as in a sequential run.
+
+    Args:
+    - users (list): A list of users fetched from Auth0 API.
+    - batch_size (int): The maximum number of users created with a single call.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
+    Yields:
+    - The result of create_descope_user for each user, in the original order.
+    """
+    buffered = []
+    pending_keys = set()
+    for user in users:
+        if verbose:
+            print(f"\tUser: {user.name}")
+        keys = get_user_migration_keys(user)
+        if not pending_keys.isdisjoint(keys):
+            yield from flush_descope_user_batch(buffered, pending_keys, user_index, assignments)
+
+        error_message = get_missing_login_id_error(user)
+        user_to_update = None if error_message else find_existing_descope_user(user, user_index)
+        if error_message:
+            buffered.append((user, None, (False, "", False, error_message)))
+        elif user_to_update is None:
+            user_object = build_descope_user_object(user, assignments)
+            buffered.append((user, user_object, None))
+            pending_keys.update(keys)
+        else:
+            buffered.append((user, None, merge_descope_user(user, user_to_update, user_index)))
+
+        if len(buffered) >= batch_size:
+            yield from flush_descope_user_batch(buffered, pending_keys, user_index, assignments)
+    yield from flush_descope_user_batch(buffered, pending_keys, user_index, assignments)
+
+
+def flush_descope_user_batch(buffered, pending_keys, user_index=None, assignments=None):
+    """
+    Create the pending users of a batch and return the buffered results in order.
+
+    Args:
+    - buffered (list): Tuples of (user, UserObj to create or None, result or None).
+    - pending_keys (set): The emails and login IDs of the users waiting to be created.
+    - user_index (DescopeUserIndex): Optional index to add the created users to.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants the users were created with.
+    Yields:
+    - The result of create_descope_user for each buffered user.
+    """
+    failed = create_descope_users_batch(
+        [user_object for _, user_object, _ in buffered if user_object is not None]
+    )
+    for user, user_object, result in buffered:
+        if user_object is None:
+            yield result
+        elif user_object.login_id in failed:
+            yield (
+                False,
+                "",
+                False,
+                user.user_id + " Reason: " + failed[user_object.login_id],
+            )
+        else:
+            if user_index is not None:
+                user_index.add_user_object(user_object)
+            if assignments is not None:
+                assignments.mark_created(assignments.for_user(user.user_id, user.email)[0])
+            yield True, "", False, ""
+    buffered.clear()
+    pending_keys.clear()
 
 
-def create_descope_tenant(organization):
+def create_descope_user_after(user, previous, user_index=None, assignments=None):
     """
-    Create a Descope create_descope_tenant based on matched Auth0 organization data.
+    Create a Descope user once the migration of a previous user has finished.
 
     Args:
-    - organization (dict): A dictionary containing organization details fetched from Auth0 API.
+    - user (dict): A dictionary containing user details fetched from Auth0 API.
+    - previous (set): The pending migrations of the users sharing its email or a login ID.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
     """
-    name = organization["display_name"]
-    tenant_id = organization["id"]
-
-    try:
-        resp = descope_client.mgmt.tenant.create(name=name, id=tenant_id)
-        return True, ""
-    except AuthException as error:
-        logging.error("Unable to create tenant.")
-        logging.error(f"Error:, {error.error_message}")
-        return False, f"Tenant {name} failed to create Reason: {error.error_message}"
+    if previous:
+        wait(previous)
+    return create_descope_user(user, user_index, assignments)
 
 
-def add_descope_user_to_tenant(tenant, loginId):
+def create_descope_users_concurrently(users, workers, verbose, user_index=None, assignments=None):
     """
-    Map a descope user to a tenant based on Auth0 data using Descope SDK.
+    Create Descope users using a bounded pool of worker threads.
+
+    Users sharing an email or a login ID are migrated one after another in their
+    original order, so the create or merge decision is the same as in a sequential run.
 
     Args:
-    - tenant (string): The tenant ID of the tenant to associate the user.
-    - loginId (string): the loginId of the user to associate to the tenant.
+    - users (list): A list of users fetched from Auth0 API.
+    - workers (int): The number of worker threads.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
+    Yields:
+    - The result of create_descope_user for each user, in the original order.
     """
-    try:
-        resp = descope_client.mgmt.user.add_tenant(login_id=loginId, tenant_id=tenant)
-        return True, ""
-    except AuthException as error:
-        logging.error("Unable to add user to tenant.")
-        logging.error(f"Error:, {error.error_message}")
-        return False, error.error_message
-
-def check_tenant_exists_descope(tenant_id):
-
-    try:
-        tenant_resp = descope_client.mgmt.tenant.load(tenant_id)
-        return True
-    except:
-        return False
-
-def check_role_exists_descope(role_name):
+    in_flight = deque()
+    last_by_key = {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for user in users:
+            if verbose:
+                print(f"\tUser: {user.name}")
+            keys = get_user_migration_keys(user)
+            previous = {last_by_key[key] for key in keys if key in last_by_key}
+            future = executor.submit(
+                create_descope_user_after, user, previous, user_index, assignments
+            )
+            for key in keys:
+                last_by_key[key] = future
+            in_flight.append((keys, future))
 
-    try:
-        roles_resp = descope_client.mgmt.role.search(role_names=[role_name])
-        if roles_resp["roles"]:
-            return True
-        else:
-            return False
-    except:
-        return False
+            while len(in_flight) > workers * 2:
+                yield collect_user_result(in_flight, last_by_key)
+        while in_flight:
+            yield collect_user_result(in_flight, last_by_key)
 
 
-### End Descope Actions:
+def collect_user_result(in_flight, last_by_key):
+    """
+    Wait for the oldest in-flight user migration and return its result.
 
-### Begin Process Functions
+    Args:
+    - in_flight (deque): Pairs of (email and login IDs, Future) in submission order.
+    - last_by_key (dict): The most recently submitted migration for each email and login ID.
+    """
+    keys, future = in_flight.popleft()
+    for key in keys:
+        if last_by_key.get(key) is future:
+            del last_by_key[key]
+    return future.result()
 
 
-def process_users(api_response_users, dry_run, from_json, verbose):
+def process_users(api_response_users, dry_run, from_json, verbose, workers=1, batch_size=None, user_index=None, checkpoint=None, assignments=None):
     """
-    Process the list of users from Auth0 by mapping and creating them in Descope.
+    Process the stream of users from Auth0 by mapping and creating them in Descope.
+
+    Users are fetched on a background thread while earlier users are written, with at
+    most DEFAULT_BATCH_SIZE fetched users waiting at any time.
 
     Args:
-    - api_response_users (list): A list of users fetched from Auth0 API.
+    - api_response_users (iterable): The users fetched from Auth0 API or an Auth0 export.
+    - workers (int): The number of users to migrate concurrently, 1 for a sequential run.
+    - batch_size (int): Create new users in batches of this size, None to create them one at a time.
+    - user_index (DescopeUserIndex): Optional index of the existing Descope users, used instead of searching Descope per user.
+    - checkpoint (MigrationCheckpoint): Optional checkpoint to record progress to. The users must
+      start after the position already recorded in the checkpoint.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
+    Returns:
+    - The failed users, the number of migrated users, the merged users, the users disabled
+      due to a merge, and the number of Auth0 users found.
     """
+    found_users = 0
     failed_users = []
     successful_migrated_users = 0
     merged_users = []
     disabled_users_mismatch = []
-    
-    inital_custom_attributes = {"connection": "String","freshlyMigrated":"Boolean"}
-    create_custom_attributes_in_descope(inital_custom_attributes)
+    if checkpoint and checkpoint.is_completed("users"):
+        print("Skipping users, they were already migrated before resuming")
+        return failed_users, successful_migrated_users, merged_users, disabled_users_mismatch, found_users
 
     if dry_run:
-        print(f"Would migrate {len(api_response_users)} users from Auth0 to Descope")
-        if verbose:
-            for user in api_response_users:
-                print(f"\tUser: {user['name']}")
+        for user in api_response_users:
+            found_users += 1
+            if verbose:
+                print(f"\tUser: {user.name}")
+        print(f"Would migrate {found_users} users from Auth0 to Descope")
 
     else:
+        create_custom_attributes_in_descope(DESCOPE_CUSTOM_ATTRIBUTES)
         if from_json:
             print(
-            f"Starting migration of {len(api_response_users)} users found via Auth0 user Export"
+            f"Starting migration of users found via Auth0 user Export"
             )
         else:
             print(
-            f"Starting migration of {len(api_response_users)} users found via Auth0 API"
+            f"Starting migration of users found via Auth0 API"
             )
-        for user in api_response_users:
-            if verbose:
-                print(f"\tUser: {user['name']}")
-
-            success, merged, disabled_mismatch, user_id_error = create_descope_user(
-                user
+        position = checkpoint.position("users") if checkpoint else 0
+        if position:
+            print(f"Resuming after {position} users already migrated")
+        api_response_users = iter_prefetched(api_response_users, DEFAULT_BATCH_SIZE)
+        task = progress.start("Users")
+        if batch_size:
+            results = create_descope_users_in_batches(
+                api_response_users, batch_size, verbose, user_index, assignments
+            )
+        elif workers > 1:
+            results = create_descope_users_concurrently(
+                api_response_users, workers, verbose, user_index, assignments
+            )
+        else:
+            results = create_descope_users_sequentially(
+                api_response_users, verbose, user_index, assignments
             )
+        for success, merged, disabled_mismatch, user_id_error in results:
+            found_users += 1
             if success:
                 successful_migrated_users += 1
                 if merged:
@@ -687,126 +3260,160 @@ def process_users(api_response_users, dry_run, from_json, verbose):
                     disabled_users_mismatch.append(user_id_error)
             else:
                 failed_users.append(user_id_error)
-            if successful_migrated_users % 10 == 0 and successful_migrated_users > 0 and not verbose:
-                print(f"Still working, migrated {successful_migrated_users} users.")
+            task.advance()
+            if checkpoint and found_users % DEFAULT_BATCH_SIZE == 0:
+                checkpoint.save_position("users", position + found_users)
+        task.finish()
+        if checkpoint:
+            checkpoint.save_position("users", position + found_users)
+            checkpoint.complete("users")
     return (
         failed_users,
         successful_migrated_users,
         merged_users,
         disabled_users_mismatch,
+        found_users,
     )
 
 
-def process_roles(auth0_roles, dry_run, verbose):
+def process_roles(auth0_roles, dry_run, verbose, checkpoint=None, snapshot=None, assignments=None):
     """
     Process the Auth0 organizations - creating roles, permissions, and associating users
 
     Args:
     - auth0_roles (dict): Dictionary of roles fetched from Auth0
+    - checkpoint (MigrationCheckpoint): Optional checkpoint to skip roles already migrated and record progress to.
+    - snapshot (DescopeProjectSnapshot): Optional snapshot of the existing roles, searched instead of Descope.
+    - assignments (DescopeAssignmentAggregator): Optional aggregator to gather the role members into,
+      which applies and summarizes them later. Without it, the role members are applied once all the
+      roles are created.
     """
     failed_roles = []
     successful_migrated_roles = 0
     roles_exist_descope = 0
-    total_existing_permissions_descope = []
-    total_failed_permissions = []
-    successful_migrated_permissions = 0
+    created_permissions = set()
+    existing_permissions = set()
+    failed_permissions = {}
     roles_and_users = []
     failed_roles_and_users = []
-    if dry_run:
+    if checkpoint and checkpoint.is_completed("roles"):
+        print("Skipping roles, they were already migrated before resuming")
+    elif dry_run:
         print(f"Would migrate {len(auth0_roles)} roles from Auth0 to Descope")
         if verbose:
+            permissions_by_role = get_permissions_for_roles([role["id"] for role in auth0_roles])
             for role in auth0_roles:
-                permissions = get_permissions_for_role(role["id"])
+                permissions = permissions_by_role[role["id"]]
                 print(
                     f"\tRole: {role['name']} with {len(permissions)} associated permissions"
                 )
     else:
         print(f"Starting migration of {len(auth0_roles)} roles found via Auth0 API")
-        for role in auth0_roles:
-            permissions = get_permissions_for_role(role["id"])
+        pending_roles = [
+            role for role in auth0_roles if not (checkpoint and checkpoint.is_done("roles", role["id"]))
+        ]
+        pending_role_ids = [role["id"] for role in pending_roles]
+        permissions_by_role = get_permissions_for_roles(pending_role_ids)
+        users_by_role = get_users_in_roles(pending_role_ids)
+        created_permissions, existing_permissions, failed_permissions = create_descope_permissions(
+            (permission for permissions in permissions_by_role.values() for permission in permissions), snapshot
+        )
+        available_permissions = created_permissions | existing_permissions
+        role_assignments = assignments if assignments is not None else DescopeAssignmentAggregator()
+        task = progress.start("Roles", len(pending_roles))
+        for role in pending_roles:
+            permissions = permissions_by_role[role["id"]]
             if verbose:
                 print(
                     f"\tRole: {role['name']} with {len(permissions)} associated permissions"
                 )
-            (
-                success,
-                role_exists,
-                success_permissions,
-                existing_permissions_descope,
-                failed_permissions,
-                error,
-            ) = create_descope_role_and_permissions(role, permissions)
+            permission_names = list(
+                dict.fromkeys(
+                    permission["permission_name"]
+                    for permission in permissions
+                    if permission["permission_name"] in available_permissions
+                )
+            )
+            success, role_exists, error = create_descope_role(role, permission_names, snapshot)
             if success:
                 successful_migrated_roles += 1
-                successful_migrated_permissions += success_permissions
             elif role_exists:
                 roles_exist_descope += 1
-                successful_migrated_permissions += success_permissions
             else:
                 failed_roles.append(error)
-                successful_migrated_permissions += success_permissions
-            if len(failed_permissions) != 0:
-                for item in failed_permissions:
-                    total_failed_permissions.append(item)
-            if len(existing_permissions_descope) != 0:
-                for item in existing_permissions_descope:
-                    if item not in total_existing_permissions_descope:
-                        total_existing_permissions_descope.append(item)
-            users = get_users_in_role(role["id"])
-
-            users_added = 0
+            users = users_by_role[role["id"]]
+
             for user in users:
-                success, error = add_user_to_descope_role(user["email"], role["name"])
-                if success:
-                    users_added += 1
-                else:
-                    failed_roles_and_users.append(
-                        f"{user['user_id']} failed to be added to {role['name']} Reason: {error}"
-                    )
-            roles_and_users.append(f"Mapped {users_added} user to {role['name']}")
-            if successful_migrated_roles % 10 == 0 and successful_migrated_roles > 0 and not verbose:
-                print(f"Still working, migrated {successful_migrated_roles} roles.")
+                role_assignments.add_role(user["email"], role["name"], user.get("user_id"))
+            role_assignments.defer("roles", role["id"])
+            task.advance()
+        task.finish()
+        role_assignments.defer("roles")
+        if assignments is None:
+            roles_and_users, failed_roles_and_users, _, _ = role_assignments.summarize(
+                role_assignments.apply(checkpoint=checkpoint)
+            )
 
     return (
         failed_roles,
         successful_migrated_roles,
         roles_exist_descope,
-        total_failed_permissions,
-        successful_migrated_permissions,
-        total_existing_permissions_descope,
+        [f"{name}, Reason: {error}" for name, error in failed_permissions.items()],
+        len(created_permissions),
+        sorted(existing_permissions),
         roles_and_users,
         failed_roles_and_users,
     )
 
 
-def process_auth0_organizations(auth0_organizations, dry_run, verbose):
+def process_auth0_organizations(auth0_organizations, dry_run, verbose, checkpoint=None, snapshot=None, assignments=None):
     """
     Process the Auth0 organizations - creating tenants and associating users
 
     Args:
     - auth0_organizations (dict): Dictionary of organizations fetched from Auth0
+    - checkpoint (MigrationCheckpoint): Optional checkpoint to skip organizations already migrated and record progress to.
+    - snapshot (DescopeProjectSnapshot): Optional snapshot of the existing tenants, searched instead of Descope.
+    - assignments (DescopeAssignmentAggregator): Optional aggregator to gather the organization members into,
+      which applies and summarizes them later. Without it, the organization members are applied once all
+      the tenants are created.
     """
     successful_tenant_creation = 0
     tenant_exists_descope = 0
     failed_tenant_creation = []
     failed_users_added_tenants = []
     tenant_users = []
-    if dry_run:
+    if checkpoint and checkpoint.is_completed("organizations"):
+        print("Skipping organizations, they were already migrated before resuming")
+    elif dry_run:
         print(
             f"Would migrate {len(auth0_organizations)} organizations from Auth0 to Descope"
         )
         if verbose:
+            members_by_organization = fetch_auth0_organizations_members(
+                [organization["id"] for organization in auth0_organizations]
+            )
             for organization in auth0_organizations:
-                org_members = fetch_auth0_organization_members(organization["id"])
+                org_members = members_by_organization[organization["id"]]
                 print(
                     f"\tOrganization: {organization['display_name']} with {len(org_members)} associated users"
                 )
     else:
         print(f"Starting migration of {len(auth0_organizations)} organizations found via Auth0 API")
-        for organization in auth0_organizations:
-            
-            if not check_tenant_exists_descope(organization["id"]):
-                success, error = create_descope_tenant(organization)
+        pending_organizations = [
+            organization
+            for organization in auth0_organizations
+            if not (checkpoint and checkpoint.is_done("organizations", organization["id"]))
+        ]
+        members_by_organization = fetch_auth0_organizations_members(
+            [organization["id"] for organization in pending_organizations]
+        )
+        tenant_assignments = assignments if assignments is not None else DescopeAssignmentAggregator()
+        task = progress.start("Organizations", len(pending_organizations))
+        for organization in pending_organizations:
+
+            if not check_tenant_exists_descope(organization["id"], snapshot):
+                success, error = create_descope_tenant(organization, snapshot)
                 if success:
                     successful_tenant_creation += 1
                 else:
@@ -815,25 +3422,21 @@ def process_auth0_organizations(auth0_organizations, dry_run, verbose):
                 tenant_exists_descope += 1
                     
 
-            org_members = fetch_auth0_organization_members(organization["id"])
+            org_members = members_by_organization[organization["id"]]
             if verbose:
                 print(f"\tOrganization: {organization['display_name']} with {len(org_members)} associated users")
-            users_added = 0
             for user in org_members:
-                success, error = add_descope_user_to_tenant(
-                    organization["id"], user["email"]
+                tenant_assignments.add_tenant(
+                    user["email"], organization["id"], organization["display_name"], user.get("user_id")
                 )
-                if success:
-                    users_added += 1
-                else:
-                    failed_users_added_tenants.append(
-                        f"User {user['email']} failed to be added to tenant {organization['display_name']} Reason: {error}"
-                    )
-            tenant_users.append(
-                f"Associated {users_added} users with tenant: {organization['display_name']} "
+            tenant_assignments.defer("organizations", organization["id"])
+            task.advance()
+        task.finish()
+        tenant_assignments.defer("organizations")
+        if assignments is None:
+            _, _, tenant_users, failed_users_added_tenants = tenant_assignments.summarize(
+                tenant_assignments.apply(checkpoint=checkpoint)
             )
-            if successful_tenant_creation % 10 == 0 and successful_tenant_creation > 0 and not verbose:
-                print(f"Still working, migrated {successful_tenant_creation} organizations.")
     return (
         successful_tenant_creation,
         tenant_exists_descope,
@@ -847,96 +3450,345 @@ def process_auth0_organizations(auth0_organizations, dry_run, verbose):
 ### Password Functions
 
 
-def read_auth0_export(file_path):
+def split_export_shards(file_path, shard_size=None):
     """
-    Read and parse the Auth0 export file formatted as NDJSON.
+    Split an Auth0 export file formatted as NDJSON into byte ranges ending on line boundaries.
+
+    The file is memory-mapped, so only the bytes around the shard boundaries are read.
+
+    Args:
+    - file_path (str): The path to the Auth0 export file.
+    - shard_size (int): The approximate size of each shard in bytes, PASSWORD_SHARD_SIZE by default.
+    Returns:
+    - list: The (start, end) byte offsets of each shard, in file order.
+    """
+    shard_size = shard_size or get_migration_context().password_shard_size
+    size = os.path.getsize(file_path)
+    shards = []
+    if size == 0:
+        return shards
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            newline = data.find(b"\n", min(start + max(shard_size, 1), size) - 1)
+            end = size if newline == -1 else newline + 1
+            shards.append((start, end))
+            start = end
+    return shards
+
+
+def read_auth0_export_shard(file_path, start, end, skip=0):
+    """
+    Read and parse a shard of the Auth0 export file formatted as NDJSON.
+
+    The file is memory-mapped and the lines of the shard are parsed with the JSON
+    backend into records holding only the fields the migration uses.
 
     Args:
     - file_path (str): The path to the Auth0 export file.
+    - start (int): The byte offset of the first line of the shard.
+    - end (int): The byte offset following the last line of the shard.
+    - skip (int): The number of users of the shard to skip, such as users already migrated before a resume.
+
+    Yields:
+    - Auth0PasswordRecord: The next parsed Auth0 user.
+    """
+    if start >= end:
+        return
+    _, _, load_auth0_password_record = get_migration_context().json_backend
+    with open(file_path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        for line in islice(iter_mapped_lines(data, start, end), skip, None):
+            yield load_auth0_password_record(line)
+
+
+def iter_mapped_lines(data, start, end):
+    """
+    Iterate over the non-empty lines within a byte range of a memory-mapped file.
+
+    Args:
+    - data (mmap): The memory-mapped file.
+    - start (int): The byte offset of the first line.
+    - end (int): The byte offset following the last line.
+    Yields:
+    - bytes: The next line, without its line break.
+    """
+    position = start
+    while position < end:
+        newline = data.find(b"\n", position, end)
+        line_end = end if newline == -1 else newline
+        line = data[position:line_end]
+        position = line_end + 1
+        if line.strip():
+            yield line
+
+
+def count_export_lines(file_path):
+    """
+    Count the lines of an Auth0 export, reading it in chunks.
 
+    Args:
+    - file_path (str): The path to the Auth0 export file.
     Returns:
-    - list: A list of parsed Auth0 user data.
+    - int: The number of records of the export.
+    """
+    count = 0
+    last = b"\n"
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            count += chunk.count(b"\n")
+            last = chunk[-1:]
+    return count + (last != b"\n")
+
+
+def read_auth0_export(file_path, skip=0):
+    """
+    Read and parse the Auth0 export file formatted as NDJSON.
+
+    Args:
+    - file_path (str): The path to the Auth0 export file.
+    - skip (int): The number of users to skip, such as users already migrated before a resume.
+
+    Yields:
+    - Auth0PasswordRecord: The next parsed Auth0 user.
+    """
+    yield from read_auth0_export_shard(file_path, 0, os.path.getsize(file_path), skip)
+
+
+_password_worker_assignments = None
+
+
+def init_password_worker(workers, context, assignments):
+    """
+    Prepare a worker process migrating shards of the Auth0 password export.
+
+    The workers are spawned rather than forked, so none of them inherits a lock held by
+    a thread of the parent process. They use the context of the parent, log to its log
+    file, and share its Descope rate limit. The assignments are sent once per worker
+    rather than with every shard.
+
+    Args:
+    - workers (int): The number of worker processes.
+    - context (MigrationContext): The context of the parent process.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
+    """
+    global _password_worker_assignments
+    set_migration_context(context)
+    if context.log_file:
+        logging.basicConfig(
+            filename=context.log_file,
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s",
+        )
+    descope_rate_limiter.reset(context.descope_rate_limit / workers)
+    _password_worker_assignments = assignments
+
+
+def migrate_password_shard(file_path, index, start, end, skip, dry_run, verbose, batch_size, progress_queue, assignments=None):
+    """
+    Parse and migrate one shard of the Auth0 password export, within a worker.
+
+    After each batch, a (shard index, position, users, failed, created login IDs) tuple
+    is put to the progress queue, so the parent process records the shard progress.
+
+    Args:
+    - file_path (str): The path to the Auth0 password export file.
+    - index (int): The index of the shard.
+    - start (int): The byte offset of the first line of the shard.
+    - end (int): The byte offset following the last line of the shard.
+    - skip (int): The number of users of the shard already migrated before a resume.
+    - dry_run (bool): Whether to only count the users of the shard.
+    - verbose (bool): Whether to print the users found during a dry run.
+    - batch_size (int): The number of users created with each Descope request.
+    - progress_queue (Queue): The queue the progress of the shard is put to.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with,
+      those sent to init_password_worker within a worker process.
+    """
+    if assignments is None:
+        assignments = _password_worker_assignments
+    position = skip
+    users = read_auth0_export_shard(file_path, start, end, skip)
+    for batch in iter_batches(iter_prefetched(users, batch_size), batch_size):
+        position += len(batch)
+        if dry_run:
+            if verbose:
+                for user in batch:
+                    print(f"\tuser: {user.name or user.email}")
+            progress_queue.put((index, position, len(batch), {}, []))
+            continue
+        user_objects = [build_user_object_with_passwords(user, assignments)[0] for user in batch]
+        failed = create_descope_users_batch(user_objects)
+        created = [user_object.login_id for user_object in user_objects if user_object.login_id not in failed]
+        progress_queue.put((index, position, len(batch), failed, created))
+
+
+def process_users_with_passwords(
+    file_path,
+    dry_run,
+    verbose,
+    batch_size=DEFAULT_BATCH_SIZE,
+    checkpoint=None,
+    assignments=None,
+    workers=None,
+    shard_size=None,
+):
     """
-    with open(file_path, "r") as file:
-        data = [json.loads(line) for line in file]
-    return data
+    Migrate the users of the Auth0 password export.
 
-def process_users_with_passwords(file_path, dry_run, verbose):
-    users = read_auth0_export(file_path)
+    The export is split into shards on line boundaries, which are parsed and migrated
+    by up to PASSWORD_WORKERS processes, so decoding the records and building the users
+    scales across cores. The position reached within each shard is recorded to the
+    checkpoint, and shards which were completed are skipped on resume.
+
+    Args:
+    - file_path (str): The path to the Auth0 password export file.
+    - dry_run (bool): Whether to only count the users of the export.
+    - verbose (bool): Whether to print the users found during a dry run.
+    - batch_size (int): The number of users created with each Descope request.
+    - checkpoint (MigrationCheckpoint): Optional checkpoint recording the progress of each shard.
+    - assignments (DescopeAssignmentAggregator): Optional roles and tenants to create new users with.
+    - workers (int): The number of worker processes, PASSWORD_WORKERS by default.
+    - shard_size (int): The approximate size of each shard in bytes, PASSWORD_SHARD_SIZE by default,
+      which must not change between resumes.
+    Returns:
+    - found_password_users (int): The number of users found in the export.
+    - successful_password_users (int): The number of users created within Descope.
+    - failed_password_users (list): The users which failed to be created, with the reason.
+    """
     successful_password_users = 0
     failed_password_users = []
+    found_password_users = 0
 
-    if dry_run:
-        print(
-            f"Would migrate {len(users)} users from Auth0 with Passwords to Descope"
-        )
-        if verbose:
-            for user in users:
-                print(f"\tuser: {user['name']}")
+    if checkpoint and checkpoint.is_completed("password_users"):
+        print("Skipping password users, they were already migrated before resuming")
+        return found_password_users, successful_password_users, failed_password_users
 
-    else:
+    shards = split_export_shards(file_path, shard_size)
+    positions = [checkpoint.position(f"password_users:{index}") if checkpoint else 0 for index in range(len(shards))]
+    if sum(positions):
+        print(f"Resuming after {sum(positions)} users already migrated from Auth0 password file")
+    pending = [
+        (index, start, end)
+        for index, (start, end) in enumerate(shards)
+        if not (checkpoint and checkpoint.is_done("password_users", index))
+    ]
+    if not dry_run:
+        print(f"Starting migration of users from Auth0 password file")
+
+    workers = max(1, min(workers or get_migration_context().password_workers, len(pending)))
+    failed_shards = 0
+    task = progress.start("Password users")
+    # Counting the users reads the whole export, so the total is reported once known
+    threading.Thread(
+        target=lambda: progress.expect(task.name, count_export_lines(file_path) - sum(positions)),
+        daemon=True,
+    ).start()
+    with ExitStack() as stack:
+        if workers > 1:
+            # Forking while the scheduler, progress and prefetch threads hold locks would deadlock the workers
+            mp_context = multiprocessing.get_context("spawn")
+            progress_queue = stack.enter_context(mp_context.Manager()).Queue()
+            executor = stack.enter_context(
+                ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=mp_context,
+                    initializer=init_password_worker,
+                    initargs=(workers, get_migration_context(), assignments),
+                )
+            )
+            shard_assignments = None
+        else:
+            progress_queue = queue.Queue()
+            executor = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+            shard_assignments = assignments
+        futures = {
+            executor.submit(
+                migrate_password_shard,
+                file_path,
+                index,
+                start,
+                end,
+                positions[index],
+                dry_run,
+                verbose,
+                batch_size,
+                progress_queue,
+                shard_assignments,
+            ): index
+            for index, start, end in pending
+        }
+        remaining = set(futures)
+        while remaining:
+            finished, remaining = wait(remaining, timeout=0.5)
+            while True:
+                try:
+                    index, position, count, failed, created = progress_queue.get_nowait()
+                except queue.Empty:
+                    break
+                found_password_users += count
+                task.advance(count)
+                if dry_run:
+                    continue
+                successful_password_users += count - len(failed)
+                for login_id, error in failed.items():
+                    failed_password_users.append(f"{login_id} Reason: {error}")
+                if assignments is not None:
+                    for login_id in created:
+                        assignments.mark_created(login_id)
+                if checkpoint:
+                    checkpoint.save_position(f"password_users:{index}", position)
+            for future in finished:
+                error = future.exception()
+                if error is not None:
+                    failed_shards += 1
+                    logging.error(f"Unable to migrate shard {futures[future]} of the Auth0 password file. Error: {error}")
+                elif checkpoint and not dry_run:
+                    checkpoint.mark_done("password_users", futures[future])
+    task.finish()
+
+    if dry_run:
         print(
-            f"Starting migration of {len(users)} users from Auth0 password file"
+            f"Would migrate {found_password_users} users from Auth0 with Passwords to Descope"
         )
-        for user in users:
-            extracted_user = {
-                'email_verified': user['email_verified'],
-                'email': user['email'],
-                'connection': user['connection'],
-                'passwordHash': user['passwordHash']
-            }
-            user_object = build_user_object_with_passwords(extracted_user)
-            success = create_users_with_passwords(user_object)
-            #user = fetch_auth0_password_user(user['email'])
-            if success:
-                successful_password_users += 1
-            else:
-                failed_password_users += 1
-                failed_password_users.append(user['email'])
-    return len(users), successful_password_users, failed_password_users
+    elif failed_shards:
+        print(f"Unable to migrate {failed_shards} shards of the Auth0 password file, see the logs and resume the migration")
+    elif checkpoint:
+        checkpoint.complete("password_users")
+    return found_password_users, successful_password_users, failed_password_users
 
 
-def build_user_object_with_passwords(extracted_user):
+def build_user_object_with_passwords(extracted_user, assignments=None):
+    role_names = user_tenants = None
+    if assignments is not None:
+        _, role_names, user_tenants = assignments.for_user(None, extracted_user.email)
     userPasswordToCreate=UserPassword(
         hashed=UserPasswordBcrypt(
-            hash=extracted_user['passwordHash']
+            hash=extracted_user.password_hash
         )
     )
     user_object=[
         UserObj(
-            login_id=extracted_user['email'],
-            email=extracted_user['email'],
-            verified_email=extracted_user.get('email_verified', False),
+            login_id=extracted_user.email,
+            email=extracted_user.email,
+            verified_email=extracted_user.email_verified,
             password=userPasswordToCreate,
             custom_attributes = {
                 "connection": "Username-Password-Authentication",
                 "freshlyMigrated": True,
-            }
+            },
+            role_names=role_names,
+            user_tenants=user_tenants,
         )
     ]
     return user_object
 
-def create_users_with_passwords(user_object):
-    # Create the user
-    try:
-        resp = descope_client.mgmt.user.invite_batch(
-            users=user_object,
-            invite_url="https://localhost",
-            send_mail=False,
-            send_sms=False
-        )
-        return True
-    except AuthException as error:
-        logging.error("Unable to create user with password.")
-        logging.error(f"Error:, {error.error_message}")
-        return False
-    
 def create_custom_attributes_in_descope(custom_attr_dict):
     """
     Creates custom attributes in Descope
 
     Args:
     - custom_attr_dict: Dictionary of custom attribute names and assosciated data types {"name" : dataType, ...} 
+    Returns:
+    - failed (dict): The error message keyed by the attribute names if they failed to be created, empty otherwise.
     """
 
     type_mapping = {
@@ -963,10 +3815,11 @@ def create_custom_attributes_in_descope(custom_attr_dict):
     # Combine all custom attribute post request bodies into one
     # Request for custom attributes to be created using a post request
     try:
-        endpoint = "https://api.descope.com/v1/mgmt/user/customattribute/create"
+        context = get_migration_context()
+        endpoint = f"{context.descope_base_url}/v1/mgmt/user/customattribute/create"
         data = {"attributes":custom_attr_post_body}
         headers = {
-            "Authorization": f"Bearer {DESCOPE_PROJECT_ID}:{DESCOPE_MANAGEMENT_KEY}",
+            "Authorization": f"Bearer {context.descope_project_id}:{context.descope_management_key}",
             "Content-Type": "application/json"
             }
         response = api_request_with_retry(
@@ -975,7 +3828,10 @@ def create_custom_attributes_in_descope(custom_attr_dict):
             headers=headers,
             data=json.dumps(data)
             )
-        
+        if response is None:
+            logging.error("Failed to create custom Attributes, no response from Descope")
+            return {",".join(custom_attr_dict): "No response from Descope"}
+
         if response.ok:
             logging.info(f"Custom attributes successfully created in Descope")
         else: 
@@ -988,28 +3844,481 @@ def create_custom_attributes_in_descope(custom_attr_dict):
             "error_message":e.response.text
             }
         logging.error(f"Failed to create custom Attributes: {str(error_dict)}")
+        return {",".join(custom_attr_dict): str(error_dict)}
+    return {}
+
+### End Password Functions
+
+### Begin Plan Functions
+
+
+def user_object_to_dict(user_object):
+    """
+    Serialize a Descope user object for a migration plan, leaving out its unset fields.
+
+    Args:
+    - user_object (UserObj): The user as it would be sent to Descope.
+    Returns:
+    - dict: The user, with its bcrypt password hash under password_hash.
+    """
+    fields = {
+        "login_id": user_object.login_id,
+        "email": user_object.email,
+        "phone": user_object.phone,
+        "display_name": user_object.display_name,
+        "given_name": user_object.given_name,
+        "family_name": user_object.family_name,
+        "picture": user_object.picture,
+        "custom_attributes": user_object.custom_attributes,
+        "verified_email": user_object.verified_email,
+        "verified_phone": user_object.verified_phone,
+        "additional_login_ids": user_object.additional_login_ids,
+        "status": user_object.status,
+        "role_names": user_object.role_names,
+    }
+    if user_object.user_tenants is not None:
+        fields["user_tenants"] = [
+            {"tenant_id": tenant.tenant_id, "role_names": list(tenant.role_names or [])}
+            for tenant in user_object.user_tenants
+        ]
+    if user_object.password is not None and user_object.password.hashed is not None:
+        fields["password_hash"] = user_object.password.hashed.hash
+    return {name: value for name, value in fields.items() if value is not None}
+
+
+class MigrationPlanner:
+    """
+    Writes the plan of a dry run: every write a live run would make to Descope, as one
+    JSON operation per line, decided against a single snapshot of the Descope project.
+
+    The operations are written in the order a graph-first live run makes them. The
+    custom attributes, permissions, roles and tenants come first, then the users created
+    with their roles and tenants, or merged into an existing Descope user, and last the
+    roles and tenants of the existing users. The user index is updated as users are
+    planned, so a user sharing an email with an earlier one is planned as a merge, as in
+    a live run.
+
+    Args:
+    - file (file): The text file the operations are written to.
+    - snapshot (DescopeProjectSnapshot): The existing Descope roles, tenants and permissions.
+    - user_index (DescopeUserIndex): The existing Descope users, with their roles and tenants.
+    """
+
+    VERSION = 1
+
+    def __init__(self, file, snapshot, user_index):
+        self.file = file
+        self.snapshot = snapshot
+        self.user_index = user_index
+        self.assignments = DescopeAssignmentAggregator()
+        self.counts = {}
+        self.existing_roles = 0
+        self.existing_tenants = 0
+        self.existing_permissions = 0
+        self.unchanged_users = 0
+        self.unmatched_login_ids = []
+        self.failed_users = []
+        self.write("plan", version=self.VERSION)
+
+    def write(self, op, **fields):
+        """
+        Write an operation to the plan.
+
+        Args:
+        - op (string): The type of the operation, such as create_user.
+        - fields: The fields of the operation.
+        """
+        self.counts[op] = self.counts.get(op, 0) + 1
+        self.file.write(json.dumps({"op": op, **fields}) + "\n")
+
+    def plan_custom_attributes(self, attributes=DESCOPE_CUSTOM_ATTRIBUTES):
+        self.write("create_custom_attributes", attributes=attributes)
+
+    def plan_roles(self, auth0_roles, permissions_by_role, users_by_role):
+        """
+        Plan the missing permissions and roles, and gather the role members.
+
+        Args:
+        - auth0_roles (list): The Auth0 roles.
+        - permissions_by_role (dict): The Auth0 permissions of each role, keyed by role ID.
+        - users_by_role (dict): The Auth0 users of each role, keyed by role ID.
+        """
+        descriptions = {}
+        for role in auth0_roles:
+            for permission in permissions_by_role[role["id"]]:
+                descriptions.setdefault(permission["permission_name"], permission.get("description", ""))
+        for name in sorted(descriptions):
+            if name in self.snapshot.permission_names:
+                self.existing_permissions += 1
+            else:
+                self.write("create_permission", name=name, description=descriptions[name])
+                self.snapshot.add_permission(name)
+
+        for role in auth0_roles:
+            if role["name"] in self.snapshot.role_names:
+                self.existing_roles += 1
+            else:
+                permission_names = list(
+                    dict.fromkeys(permission["permission_name"] for permission in permissions_by_role[role["id"]])
+                )
+                self.write(
+                    "create_role",
+                    name=role["name"],
+                    description=role.get("description", ""),
+                    permission_names=permission_names,
+                )
+                self.snapshot.add_role(role["name"])
+            for user in users_by_role[role["id"]]:
+                self.assignments.add_role(user["email"], role["name"], user.get("user_id"))
+
+    def plan_organizations(self, auth0_organizations, members_by_organization):
+        """
+        Plan the missing tenants, and gather the organization members.
+
+        Args:
+        - auth0_organizations (list): The Auth0 organizations.
+        - members_by_organization (dict): The Auth0 members of each organization, keyed by organization ID.
+        """
+        for organization in auth0_organizations:
+            if organization["id"] in self.snapshot.tenant_ids:
+                self.existing_tenants += 1
+            else:
+                self.write("create_tenant", id=organization["id"], name=organization["display_name"])
+                self.snapshot.add_tenant(organization["id"])
+            for user in members_by_organization[organization["id"]]:
+                self.assignments.add_tenant(
+                    user["email"], organization["id"], organization["display_name"], user.get("user_id")
+                )
+
+    def plan_password_users(self, records):
+        """
+        Plan the users of the Auth0 password export, which are always created.
+
+        Args:
+        - records (iterable): The Auth0PasswordRecord of each user.
+        """
+        task = progress.start("Planned password users")
+        for record in records:
+            user_object = build_user_object_with_passwords(record, self.assignments)[0]
+            self.write("create_user", user=user_object_to_dict(user_object))
+            self.user_index.add_user_object(user_object)
+            self.assignments.mark_created(self.assignments.for_user(None, record.email)[0])
+            task.advance()
+        task.finish()
+
+    def plan_users(self, users):
+        """
+        Plan the creation of each Auth0 user, or its merge into the existing Descope user.
+
+        Args:
+        - users (iterable): The Auth0User of each user.
+        """
+        task = progress.start("Planned users")
+        for user in users:
+            task.advance()
+            error_message = get_missing_login_id_error(user)
+            if error_message:
+                self.failed_users.append(error_message)
+                continue
+            existing = self.user_index.find(user.email, user.login_ids)
+            if existing is None:
+                user_object = build_descope_user_object(user, self.assignments)
+                self.write("create_user", auth0_user_id=user.user_id, user=user_object_to_dict(user_object))
+                self.user_index.add_user_object(user_object)
+                self.assignments.mark_created(self.assignments.for_user(user.user_id, user.email)[0])
+                continue
+            merged_user, disabled = build_merged_user_object(user, existing)
+            if merged_user is not None:
+                # Merged users are disabled after the update when their status is disabled
+                self.write("update_user", auth0_user_id=user.user_id, user=user_object_to_dict(merged_user))
+                self.user_index.add_user_object(merged_user)
+            elif disabled:
+                self.write("deactivate_user", auth0_user_id=user.user_id, login_id=existing["loginIds"][0])
+            else:
+                self.unchanged_users += 1
+        task.finish()
+
+    def plan_assignments(self):
+        """
+        Plan the roles and tenants of the existing Descope users, along with the ones they already have.
+        """
+        for login_id in self.assignments.pending_login_ids():
+            user = self.user_index.by_login_id.get(login_id)
+            if user is None:
+                self.unmatched_login_ids.append(login_id)
+                continue
+            self.write("patch_user", user=user_object_to_dict(self.assignments.build_user_patch(login_id, user)))
+
+    def summary(self):
+        """
+        Returns:
+        - list: The lines summarizing the plan.
+        """
+        counts = self.counts
+        lines = [
+            f"Would create {counts.get('create_user', 0)} users",
+            f"Would merge {counts.get('update_user', 0)} users into existing Descope users",
+            f"Would disable {counts.get('deactivate_user', 0)} existing users, and leave {self.unchanged_users} unchanged",
+            f"Would create {counts.get('create_permission', 0)} permissions, {self.existing_permissions} already exist",
+            f"Would create {counts.get('create_role', 0)} roles, {self.existing_roles} already exist",
+            f"Would create {counts.get('create_tenant', 0)} tenants, {self.existing_tenants} already exist",
+            f"Would assign roles and tenants to {counts.get('patch_user', 0)} existing users",
+        ]
+        if self.unmatched_login_ids:
+            lines.append(
+                f"Would fail to assign roles and tenants to {len(self.unmatched_login_ids)} users missing from Descope"
+            )
+        if self.failed_users:
+            lines.append(f"Would fail to migrate {len(self.failed_users)} users without a login ID")
+        return lines
+
+
+def user_object_from_dict(fields):
+    """
+    Build the Descope user object of a user serialized in a migration plan.
+
+    Args:
+    - fields (dict): The user, as serialized by user_object_to_dict.
+    Returns:
+    - UserObj: The user to send to Descope.
+    """
+    password = None
+    if fields.get("password_hash"):
+        password = UserPassword(hashed=UserPasswordBcrypt(hash=fields["password_hash"]))
+    user_tenants = fields.get("user_tenants")
+    if user_tenants is not None:
+        user_tenants = [AssociatedTenant(tenant["tenant_id"], tenant.get("role_names") or []) for tenant in user_tenants]
+    return UserObj(
+        login_id=fields["login_id"],
+        email=fields.get("email"),
+        phone=fields.get("phone"),
+        display_name=fields.get("display_name"),
+        given_name=fields.get("given_name"),
+        family_name=fields.get("family_name"),
+        picture=fields.get("picture"),
+        custom_attributes=fields.get("custom_attributes"),
+        verified_email=fields.get("verified_email"),
+        verified_phone=fields.get("verified_phone"),
+        additional_login_ids=fields.get("additional_login_ids"),
+        status=fields.get("status"),
+        role_names=fields.get("role_names"),
+        user_tenants=user_tenants,
+        password=password,
+    )
+
+
+def merge_planned_descope_user(operations):
+    """
+    Apply the merges and deactivations planned for one Descope user, in plan order.
+
+    Args:
+    - operations (list): The update_user and deactivate_user operations of the user.
+    Returns:
+    - failed (dict): The error message of each failed operation, keyed by Auth0 user ID.
+    """
+    failed = {}
+    for operation in operations:
+        try:
+            if operation["op"] == "update_user":
+                user_object = user_object_from_dict(operation["user"])
+                login_id = user_object.login_id
+                descope_client.mgmt.user.update(
+                    login_id=login_id,
+                    email=user_object.email,
+                    display_name=user_object.display_name,
+                    given_name=user_object.given_name,
+                    family_name=user_object.family_name,
+                    phone=user_object.phone,
+                    picture=user_object.picture,
+                    custom_attributes=user_object.custom_attributes,
+                    verified_email=user_object.verified_email,
+                    verified_phone=user_object.verified_phone,
+                    additional_login_ids=user_object.additional_login_ids,
+                )
+                if user_object.status != "disabled":
+                    continue
+            else:
+                login_id = operation["login_id"]
+            descope_client.mgmt.user.deactivate(login_id=login_id)
+        except AuthException as error:
+            logging.error(f"Unable to merge user {operation.get('auth0_user_id')}. Error: {error.error_message}")
+            failed[operation.get("auth0_user_id") or login_id] = error.error_message
+    return failed
+
+
+class MigrationPlanExecutor:
+    """
+    Replays a migration plan written by MigrationPlanner, without any Auth0 request.
+
+    Each type of operation is sent with the most efficient Descope call. Permissions,
+    roles and new users are created in batches, and the roles and tenants of existing
+    users are patched in batches, with up to `workers` requests in flight. Tenants, which
+    have no batch call, and merged users are sent concurrently.
+
+    The plan is read as a stream, and each stage is completed before the next one
+    starts, since the users are created with roles and tenants which must exist. Merges
+    and deactivations are held until the users of their stage are created, since they
+    may target a user created by the plan.
+
+    The plan only holds the permissions, roles and tenants missing from Descope when it
+    was written, so they are tracked in a snapshot which starts empty instead of being
+    loaded from Descope again.
+
+    Args:
+    - workers (int): The number of Descope requests sent at once.
+    - batch_size (int): The number of roles, users or patched users sent with each request.
+    """
+
+    STAGES = {
+        "create_custom_attributes": 0,
+        "create_permission": 1,
+        "create_role": 2,
+        "create_tenant": 3,
+        "create_user": 4,
+        "update_user": 4,
+        "deactivate_user": 4,
+        "patch_user": 5,
+    }
+
+    def __init__(self, workers=4, batch_size=DEFAULT_BATCH_SIZE):
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.snapshot = DescopeProjectSnapshot()
+        self.completed = {}
+        self.failed = []
+        self._stage = None
+        self._buffer = []
+        self._merges = {}
+        self._pending = {}
+        self._executor = None
+        self._task = None
+
+    def execute(self, file_path):
+        """
+        Execute the operations of a plan file.
+
+        Args:
+        - file_path (string): The path of the plan, as written by MigrationPlanner.
+        Returns:
+        - completed (dict): The number of operations which succeeded, keyed by type.
+        - failed (list): The operations which failed, with the reason.
+        """
+        self._task = progress.start("Plan operations", max(count_export_lines(file_path) - 1, 0))
+        with open(file_path) as file, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            self._executor = executor
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                operation = json.loads(line)
+                op = operation.get("op")
+                if op == "plan":
+                    if operation.get("version") != MigrationPlanner.VERSION:
+                        raise ValueError(f"Unsupported migration plan version {operation.get('version')}")
+                    continue
+                if op not in self.STAGES:
+                    raise ValueError(f"Unknown operation {op} on line {number} of the migration plan")
+                self._enter_stage(self.STAGES[op])
+                self._add(operation)
+            self._enter_stage(None)
+        self._task.finish()
+        return self.completed, self.failed
+
+    def _add(self, operation):
+        op = operation["op"]
+        if op == "create_custom_attributes":
+            self._submit(op, 1, create_custom_attributes_in_descope, operation["attributes"])
+        elif op == "create_tenant":
+            self._submit(op, 1, self._create_tenant, operation)
+        elif op in ("update_user", "deactivate_user"):
+            login_id = operation["user"]["login_id"] if op == "update_user" else operation["login_id"]
+            self._merges.setdefault(login_id, []).append(operation)
+        else:
+            self._buffer.append(operation)
+            if op in ("create_user", "patch_user") and len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def _enter_stage(self, stage):
+        if stage == self._stage:
+            return
+        self._flush()
+        self._wait()
+        for operations in self._merges.values():
+            self._submit("merge_user", len(operations), merge_planned_descope_user, operations)
+        self._merges = {}
+        self._wait()
+        self._stage = stage
+
+    def _flush(self):
+        operations, self._buffer = self._buffer, []
+        if not operations:
+            return
+        op = operations[0]["op"]
+        if op == "create_permission":
+            self._submit(op, len(operations), self._create_permissions, operations)
+        elif op == "create_role":
+            for batch in iter_batches(operations, self.batch_size):
+                self._submit(op, len(batch), create_descope_roles_batch, batch)
+        elif op == "create_user":
+            user_objects = [user_object_from_dict(operation["user"]) for operation in operations]
+            self._submit(op, len(user_objects), create_descope_users_batch, user_objects)
+        elif op == "patch_user":
+            user_objects = [user_object_from_dict(operation["user"]) for operation in operations]
+            self._submit(op, len(user_objects), patch_descope_users_batch, user_objects)
+
+    def _submit(self, op, count, function, *args):
+        # Bound the operations held in memory, while keeping every worker busy
+        while len(self._pending) >= self.workers * 2:
+            self._collect(wait(self._pending, return_when=FIRST_COMPLETED)[0])
+        self._pending[self._executor.submit(function, *args)] = (op, count)
+
+    def _wait(self):
+        self._collect(wait(self._pending)[0])
+
+    def _collect(self, finished):
+        for future in finished:
+            op, count = self._pending.pop(future)
+            try:
+                failed = future.result() or {}
+            except Exception as error:
+                logging.error(f"Unable to execute {count} {op} operations of the migration plan. Error: {error}")
+                failed = {f"{count} operations": str(error)}
+            self.completed[op] = self.completed.get(op, 0) + count - len(failed)
+            self.failed.extend(f"{op} {key} Reason: {error}" for key, error in failed.items())
+            self._task.advance(count)
+
+    def _create_permissions(self, operations):
+        _, _, failed = create_descope_permissions(
+            (
+                {"permission_name": operation["name"], "description": operation.get("description", "")}
+                for operation in operations
+            ),
+            self.snapshot,
+        )
+        return failed
+
+    def _create_tenant(self, operation):
+        success, error = create_descope_tenant(
+            {"id": operation["id"], "display_name": operation["name"]}, self.snapshot
+        )
+        return {} if success else {operation["id"]: error}
+
+    def summary(self):
+        """
+        Returns:
+        - list: The lines summarizing the executed plan.
+        """
+        completed = self.completed
+        lines = [
+            f"Created permissions within Descope {completed.get('create_permission', 0)}",
+            f"Created roles within Descope {completed.get('create_role', 0)}",
+            f"Created tenants within Descope {completed.get('create_tenant', 0)}",
+            f"Created users within Descope {completed.get('create_user', 0)}",
+            f"Merged or disabled existing users {completed.get('merge_user', 0)}",
+            f"Assigned roles and tenants to existing users {completed.get('patch_user', 0)}",
+        ]
+        if self.failed:
+            lines.append(f"Failed operations {len(self.failed)}")
+            lines.extend(self.failed)
+        return lines
 
-# def fetch_auth0_password_user(email):
-#     """
-#     Fetch and parse Auth0 users from the provided endpoint.
-
-#     Returns:
-#     - all_users (Dict): A list of parsed Auth0 users if successful, empty list otherwise.
-#     """
-#     headers = {"Authorization": f"Bearer {AUTH0_TOKEN}", "Accept": "application/json"}
-#     page = 0
-#     per_page = 20
-#     user = []
-#     response = api_request_with_retry(
-#         "get",
-#         f"https://{AUTH0_TENANT_ID}.us.auth0.com/api/v2/users-by-email?email=chris%40wa9pie.net",
-#         headers=headers,
-#     )
-#     if response.status_code != 200:
-#         logging.error(
-#             f"Error fetching Auth0 users. Status code: {response.status_code}"
-#         )
-#         return False
-#     return response.json()
-
-### End Password Functions
\ No newline at end of file
+### End Plan Functions
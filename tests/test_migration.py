@@ -1,29 +1,1019 @@
+import gzip
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
 from unittest.mock import patch, Mock
-from src.migration_utils import fetch_auth0_users
+import requests
+from descope import AuthException, RateLimitException, UserObj
+from src.migration_utils import (
+    Auth0User,
+    DescopeAssignmentAggregator,
+    DescopeProjectSnapshot,
+    DescopeUserIndex,
+    Http2Adapter,
+    MigrationCheckpoint,
+    MigrationContext,
+    MigrationMetrics,
+    MigrationPlanExecutor,
+    MigrationPlanner,
+    PhaseScheduler,
+    ProgressReporter,
+    RateLimitedClient,
+    RateLimiter,
+    api_request_with_retry,
+    build_descope_user_object,
+    create_descope_users_batch,
+    fetch_auth0_organizations_members,
+    fetch_auth0_users,
+    fetch_auth0_users_from_export_job,
+    fetch_auth0_users_from_file,
+    get_http_session,
+    get_migration_context,
+    get_permissions_for_roles,
+    load_json_backend,
+    process_roles,
+    process_users,
+    process_users_with_passwords,
+    read_auth0_export_shard,
+    set_migration_context,
+    split_export_shards,
+)
+
+
+def setUpModule():
+    # The tests use their own context, so they need neither a .env file nor credentials
+    set_migration_context(MigrationContext({}))
+
+
+class Auth0ExportJobStub(BaseHTTPRequestHandler):
+    """Serves the Auth0 users export job endpoints and the exported file."""
+
+    users = []
+    polls = 0
+    jobs_created = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        assert self.path == "/api/v2/jobs/users-exports" and body["format"] == "json"
+        Auth0ExportJobStub.jobs_created += 1
+        self.send_json(201, {"id": "job_1", "status": "pending"})
+
+    def do_GET(self):
+        if self.path == "/api/v2/jobs/job_1":
+            Auth0ExportJobStub.polls += 1
+            status = "completed" if Auth0ExportJobStub.polls > 1 else "processing"
+            host = self.server.server_address
+            self.send_json(
+                200,
+                {"id": "job_1", "status": status, "location": f"http://{host[0]}:{host[1]}/exports/users.json.gz"},
+            )
+        elif self.path == "/exports/users.json.gz":
+            assert "Authorization" not in self.headers
+            export = gzip.compress("".join(json.dumps(user) + "\n" for user in self.users).encode())
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(export)))
+            self.end_headers()
+            self.wfile.write(export)
+        else:
+            self.send_json(404, {})
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
 
 
 class TestMigration(unittest.TestCase):
-    @patch("src.migration_utils.requests.get")
+    @patch("src.migration_utils.requests.Session.get")
     def test_fetch_auth0_users_success(self, mock_get):
         # Mock a successful API response
         mock_get.return_value = Mock(status_code=200)
-        mock_get.return_value.json.return_value = [{"id": "user1"}, {"id": "user2"}]
+        mock_get.return_value.json.return_value = [{"user_id": "user1"}, {"user_id": "user2"}]
 
         # Call the function
-        users = fetch_auth0_users()
+        users = list(fetch_auth0_users())
 
         # Assert the results
         self.assertEqual(len(users), 2)
-        self.assertEqual(users[0]["id"], "user1")
-        self.assertEqual(users[1]["id"], "user2")
+        self.assertEqual(users[0].user_id, "user1")
+        self.assertEqual(users[1].user_id, "user2")
+        self.assertIn("sort=created_at:1", mock_get.call_args.args[0])
 
-    @patch("src.migration_utils.requests.get")
+    @patch("src.migration_utils.requests.Session.get")
     def test_fetch_auth0_users_failure(self, mock_get):
         mock_get.return_value = Mock(status_code=500)
-        users = fetch_auth0_users()
+        users = list(fetch_auth0_users())
         self.assertEqual(len(users), 0)
 
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.create_descope_user")
+    def test_process_users_concurrent_matches_sequential(self, mock_create, _):
+        users = [
+            Auth0User(user_id=f"auth0|{i}", name=f"User {i}", email=f"user{i % 7}@example.com")
+            for i in range(50)
+        ]
+
+        def fake_create(user, user_index=None, assignments=None):
+            index = int(user.user_id.split("|")[1])
+            if index % 11 == 0:
+                return False, "", False, f"{user.user_id} Reason: failed"
+            if index >= 7:
+                return True, user.name, index % 3 == 0, user.user_id if index % 3 == 0 else ""
+            return True, "", False, ""
+
+        mock_create.side_effect = fake_create
+        sequential = process_users(users, False, False, False)
+        concurrent = process_users(users, False, False, False, workers=4)
+
+        self.assertEqual(sequential, concurrent)
+        self.assertEqual(mock_create.call_count, 100)
+        concurrent_calls = [call.args[0].user_id for call in mock_create.call_args_list[50:]]
+        for email_index in range(7):
+            same_email = [user.user_id for user in users if user.email == f"user{email_index}@example.com"]
+            self.assertEqual([user_id for user_id in concurrent_calls if user_id in same_email], same_email)
+
+    @patch("src.migration_utils.descope_client")
+    def test_create_descope_users_batch_isolates_failures(self, mock_client):
+        def fake_invite_batch(users, **kwargs):
+            if any(user.login_id == "user5" for user in users):
+                raise AuthException(400, "invalid argument", "Invalid user")
+            return {"createdUsers": [], "failedUsers": []}
+
+        mock_client.mgmt.user.invite_batch.side_effect = fake_invite_batch
+        user_objects = [UserObj(login_id=f"user{i}") for i in range(8)]
+
+        failed = create_descope_users_batch(user_objects)
+
+        self.assertEqual(failed, {"user5": "Invalid user"})
+        self.assertEqual(mock_client.mgmt.user.invite_batch.call_count, 7)
+
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.descope_client")
+    def test_process_users_in_batches(self, mock_client, _):
+        users = [
+            Auth0User.from_dict(
+                {
+                    "user_id": f"auth0|{i}",
+                    "name": f"User {i}",
+                    "email": f"user{i}@example.com",
+                    "identities": [{"connection": "Username-Password-Authentication", "user_id": str(i)}],
+                }
+            )
+            for i in range(7)
+        ]
+        mock_client.mgmt.user.search_all.return_value = {"users": []}
+        mock_client.mgmt.user.invite_batch.side_effect = lambda users, **kwargs: {
+            "failedUsers": [
+                {"user": {"loginIds": [user.login_id]}, "failure": "Invalid user"}
+                for user in users
+                if user.login_id == "user4@example.com"
+            ]
+        }
+
+        failed_users, successful_migrated_users, merged_users, _, found_users = process_users(
+            iter(users), False, False, False, batch_size=3
+        )
+
+        self.assertEqual(mock_client.mgmt.user.invite_batch.call_count, 3)
+        self.assertEqual(successful_migrated_users, 6)
+        self.assertEqual(found_users, 7)
+        self.assertEqual(merged_users, [])
+        self.assertEqual(failed_users, ["auth0|4 Reason: Invalid user"])
+        mock_client.mgmt.user.create.assert_not_called()
+
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.descope_client")
+    def test_process_users_in_batches_searches_merged_users_once(self, mock_client, _):
+        users = [
+            Auth0User.from_dict(
+                {
+                    "user_id": f"google-oauth2|{i}",
+                    "name": f"User {i}",
+                    "email": f"user{i}@example.com",
+                    "identities": [{"connection": "google-oauth2", "user_id": str(i)}],
+                }
+            )
+            for i in range(3)
+        ]
+        existing = {
+            "loginIds": ["user0@example.com"],
+            "email": "user0@example.com",
+            "name": "User 0",
+            "givenName": None,
+            "familyName": None,
+            "phone": None,
+            "picture": None,
+            "verifiedEmail": True,
+            "verifiedPhone": False,
+            "status": "enabled",
+            "customAttributes": {"connection": "Username-Password-Authentication"},
+        }
+        mock_client.mgmt.user.search_all.side_effect = lambda emails, **kwargs: {
+            "users": [existing] if emails == ["user0@example.com"] else []
+        }
+        mock_client.mgmt.user.invite_batch.return_value = {"failedUsers": []}
+
+        _, successful_migrated_users, merged_users, _, _ = process_users(iter(users), False, False, False, batch_size=3)
+
+        self.assertEqual(mock_client.mgmt.user.search_all.call_count, 3)
+        mock_client.mgmt.user.update.assert_called_once()
+        self.assertEqual(merged_users, ["User 0"])
+        self.assertEqual(successful_migrated_users, 3)
+
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.descope_client")
+    def test_process_users_merges_phone_only_users_in_every_mode(self, mock_client, _):
+        def sms_user(user_id):
+            return Auth0User.from_dict(
+                {
+                    "user_id": f"sms|{user_id}",
+                    "phone_number": "+15555550100",
+                    "identities": [{"connection": "sms", "provider": "sms", "user_id": user_id}],
+                }
+            )
+
+        mock_client.mgmt.user.invite_batch.return_value = {"failedUsers": []}
+        for options in ({}, {"batch_size": 10}, {"workers": 4}):
+            mock_client.reset_mock()
+            results = process_users(
+                iter([sms_user("1"), sms_user("2")]), False, False, False, user_index=DescopeUserIndex(), **options
+            )
+            created = mock_client.mgmt.user.create.call_count + sum(
+                len(call.kwargs["users"]) for call in mock_client.mgmt.user.invite_batch.call_args_list
+            )
+            self.assertEqual(created, 1, options)
+            self.assertEqual(results[4], 2)
+
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.descope_client")
+    def test_process_users_with_user_index(self, mock_client, _):
+        mock_client.mgmt.user.search_all.side_effect = [
+            {"users": [{"loginIds": ["existing@example.com"], "email": "existing@example.com"}] * 2},
+            {"users": [{"loginIds": ["other@example.com"], "email": "other@example.com"}]},
+        ]
+        user_index = DescopeUserIndex().load(page_size=2)
+        self.assertEqual(mock_client.mgmt.user.search_all.call_count, 2)
+        self.assertIn("other@example.com", user_index.by_login_id)
+
+        identity = {"connection": "Username-Password-Authentication", "user_id": "1"}
+        users = [
+            Auth0User.from_dict(
+                {"user_id": "auth0|1", "name": "New", "email": "new@example.com", "identities": [identity]}
+            ),
+            Auth0User.from_dict(
+                {
+                    "user_id": "google-oauth2|1",
+                    "name": "New",
+                    "email": "new@example.com",
+                    "identities": [{"connection": "google-oauth2", "user_id": "1"}],
+                }
+            ),
+        ]
+        failed_users, successful_migrated_users, merged_users, _, _ = process_users(
+            users, False, False, False, user_index=user_index
+        )
+
+        self.assertEqual(mock_client.mgmt.user.search_all.call_count, 2)
+        mock_client.mgmt.user.create.assert_called_once()
+        mock_client.mgmt.user.update.assert_called_once()
+        self.assertEqual(successful_migrated_users, 2)
+        self.assertEqual(merged_users, ["New"])
+        self.assertEqual(
+            user_index.find("new@example.com")["customAttributes"]["connection"],
+            "Username-Password-Authentication,google-oauth2",
+        )
+
+    @patch("src.migration_utils.descope_client")
+    def test_migration_planner_writes_plan_without_descope_writes(self, mock_client):
+        snapshot = DescopeProjectSnapshot()
+        snapshot.role_names.add("Admin")
+        snapshot.permission_names.add("read")
+        user_index = DescopeUserIndex()
+        user_index.add(
+            {
+                "loginIds": ["old@example.com"],
+                "email": "old@example.com",
+                "name": "Old",
+                "givenName": None,
+                "familyName": None,
+                "phone": None,
+                "picture": None,
+                "customAttributes": {"connection": "google-oauth2"},
+                "verifiedEmail": True,
+                "verifiedPhone": False,
+                "status": "enabled",
+                "roleNames": ["Viewer"],
+                "userTenants": [],
+            }
+        )
+        identity = {"connection": "Username-Password-Authentication", "user_id": "1"}
+        users = [
+            Auth0User.from_dict({"user_id": "auth0|1", "email": "new@example.com", "identities": [identity]}),
+            Auth0User.from_dict({"user_id": "auth0|2", "email": "old@example.com", "identities": [identity]}),
+            Auth0User.from_dict({"user_id": "auth0|3", "email": "new@example.com", "identities": [identity]}),
+        ]
+        roles = [{"id": "rol_1", "name": "Admin"}, {"id": "rol_2", "name": "Member"}]
+        permissions = {
+            "rol_1": [{"permission_name": "read"}],
+            "rol_2": [{"permission_name": "read"}, {"permission_name": "write", "description": "Write"}],
+        }
+        members = {
+            "rol_1": [{"user_id": "auth0|2", "email": "old@example.com"}],
+            "rol_2": [{"user_id": "auth0|1", "email": "new@example.com"}],
+        }
+        file = io.StringIO()
+
+        planner = MigrationPlanner(file, snapshot, user_index)
+        planner.plan_roles(roles, permissions, members)
+        planner.plan_organizations([{"id": "org_1", "display_name": "Org"}], {"org_1": []})
+        planner.plan_users(users)
+        planner.plan_assignments()
+
+        self.assertEqual(mock_client.mock_calls, [])
+        operations = [json.loads(line) for line in file.getvalue().splitlines()]
+        self.assertEqual(
+            [operation["op"] for operation in operations],
+            ["plan", "create_permission", "create_role", "create_tenant", "create_user", "update_user", "patch_user"],
+        )
+        self.assertEqual(operations[2]["permission_names"], ["read", "write"])
+        self.assertEqual(operations[4]["user"]["role_names"], ["Member"])
+        self.assertEqual(
+            operations[5]["user"]["custom_attributes"]["connection"], "google-oauth2,Username-Password-Authentication"
+        )
+        self.assertEqual(operations[6]["user"], {"login_id": "old@example.com", "role_names": ["Admin", "Viewer"], "user_tenants": []})
+        self.assertEqual(planner.unchanged_users, 1)
+        self.assertIn("Would create 1 roles, 1 already exist", planner.summary())
+
+    @patch("src.migration_utils.requests.Session.post")
+    @patch("src.migration_utils.descope_client")
+    def test_plan_executor_batches_each_operation_type(self, mock_client, mock_post):
+        mock_post.return_value = Mock(status_code=500, ok=False, reason="Internal Server Error", text="error")
+        mock_post.return_value.raise_for_status.side_effect = requests.HTTPError(response=mock_post.return_value)
+        mock_client.mgmt.user.invite_batch.return_value = {"failedUsers": []}
+        mock_client.mgmt.user.patch_batch.side_effect = lambda users: {
+            "failedUsers": [
+                {"user": {"loginIds": [user.login_id]}, "failure": "User not found"}
+                for user in users
+                if user.login_id == "missing@example.com"
+            ]
+        }
+        operations = [
+            {"op": "plan", "version": 1},
+            {"op": "create_custom_attributes", "attributes": {"connection": "String"}},
+            {"op": "create_permission", "name": "read", "description": ""},
+            {"op": "create_role", "name": "Admin", "description": "", "permission_names": ["read"]},
+            {"op": "create_tenant", "id": "org_1", "name": "Org"},
+            *(
+                {"op": "create_user", "user": {"login_id": f"user{i}@example.com", "role_names": ["Admin"]}}
+                for i in range(3)
+            ),
+            {"op": "update_user", "auth0_user_id": "auth0|9", "user": {"login_id": "user0@example.com", "status": "disabled"}},
+            {"op": "patch_user", "user": {"login_id": "old@example.com", "role_names": ["Admin"], "user_tenants": []}},
+            {"op": "patch_user", "user": {"login_id": "missing@example.com", "role_names": ["Admin"]}},
+            {"op": "patch_user", "user": {"login_id": "user@example.com", "role_names": ["Admin"]}},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            plan_file = os.path.join(directory, "plan.ndjson")
+            with open(plan_file, "w") as file:
+                file.writelines(json.dumps(operation) + "\n" for operation in operations)
+            completed, failed = MigrationPlanExecutor(workers=2, batch_size=2).execute(plan_file)
+
+        mock_client.mgmt.permission.load_all.assert_not_called()
+        mock_client.mgmt.permission.create_batch.assert_called_once()
+        mock_client.mgmt.role.create_batch.assert_called_once_with(
+            [{"name": "Admin", "description": "", "permissionNames": ["read"]}]
+        )
+        mock_client.mgmt.tenant.create.assert_called_once_with(name="Org", id="org_1")
+        self.assertEqual(mock_client.mgmt.user.invite_batch.call_count, 2)
+        mock_client.mgmt.user.update.assert_called_once()
+        mock_client.mgmt.user.deactivate.assert_called_once_with(login_id="user0@example.com")
+        self.assertEqual(mock_client.mgmt.user.patch_batch.call_count, 2)
+        self.assertEqual(
+            completed,
+            {
+                "create_custom_attributes": 0,
+                "create_permission": 1,
+                "create_role": 1,
+                "create_tenant": 1,
+                "create_user": 3,
+                "merge_user": 1,
+                "patch_user": 2,
+            },
+        )
+        self.assertEqual(len(failed), 2)
+        self.assertTrue(failed[0].startswith("create_custom_attributes connection Reason: "))
+        self.assertEqual(failed[1], "patch_user missing@example.com Reason: User not found")
+
+    def test_fetch_auth0_users_from_export_job(self):
+        Auth0ExportJobStub.polls = 0
+        Auth0ExportJobStub.users = [
+            {"user_id": f"auth0|{i}", "email": f"user{i}@example.com", "connection": "Username-Password-Authentication"}
+            for i in range(1500)
+        ]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Auth0ExportJobStub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        with patch.object(get_migration_context(), "auth0_base_url", f"http://127.0.0.1:{server.server_address[1]}"):
+            users = list(fetch_auth0_users_from_export_job(poll_interval=0))
+
+        self.assertEqual(len(users), 1500)
+        self.assertEqual(Auth0ExportJobStub.polls, 2)
+        self.assertEqual(users[7].login_ids, ("user7@example.com",))
+        self.assertEqual(users[7].connections, ("Username-Password-Authentication",))
+
+    def test_resume_reads_the_same_export_job(self):
+        Auth0ExportJobStub.polls = 1
+        Auth0ExportJobStub.jobs_created = 0
+        Auth0ExportJobStub.users = [
+            {"user_id": f"auth0|{i}", "email": f"user{i}@example.com", "connection": "Username-Password-Authentication"}
+            for i in range(10)
+        ]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Auth0ExportJobStub)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        checkpoint_file = os.path.join(directory.name, "checkpoint.ndjson")
+
+        with patch.object(get_migration_context(), "auth0_base_url", f"http://127.0.0.1:{server.server_address[1]}"):
+            checkpoint = MigrationCheckpoint(checkpoint_file)
+            list(fetch_auth0_users_from_export_job(poll_interval=0, checkpoint=checkpoint))
+            checkpoint.close()
+            checkpoint = MigrationCheckpoint(checkpoint_file, resume=True)
+            resumed = list(fetch_auth0_users_from_export_job(poll_interval=0, skip=4, checkpoint=checkpoint))
+            checkpoint.close()
+
+            # Once the job expired, the users are exported again from the start
+            with open(checkpoint_file, "a") as file:
+                file.write(json.dumps({"phase": "users", "export_job": "expired_job"}) + "\n")
+            checkpoint = MigrationCheckpoint(checkpoint_file, resume=True)
+            restarted = list(fetch_auth0_users_from_export_job(poll_interval=0, skip=4, checkpoint=checkpoint))
+            checkpoint.close()
+
+        self.assertEqual(resumed[0].user_id, "auth0|4")
+        self.assertEqual(len(restarted), 10)
+        self.assertEqual(Auth0ExportJobStub.jobs_created, 2)
+
+    @patch("src.migration_utils.requests.Session.get")
+    def test_fetch_auth0_users_from_file_enriches_in_batches(self, mock_get):
+        identity = {"connection": "Username-Password-Authentication", "user_id": "1"}
+        records = [
+            {"user_id": "auth0|1", "email": "user1@example.com", "identities": [identity]},
+            {"user_id": "auth0|2", "email": "exported@example.com"},
+            {"user_id": "auth0|3", "email": "user3@example.com"},
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as export:
+            export.write("\n".join(json.dumps(record) for record in records))
+        self.addCleanup(os.remove, export.name)
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = [
+            {"user_id": "auth0|2", "email": "api@example.com", "identities": [identity], "name": "Two"},
+            {"user_id": "auth0|3", "email": "user3@example.com", "identities": [identity]},
+        ]
+
+        users = list(fetch_auth0_users_from_file(export.name))
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn("auth0%7C2", mock_get.call_args.args[0])
+        self.assertEqual([user.user_id for user in users], ["auth0|1", "auth0|2", "auth0|3"])
+        self.assertEqual(users[1].email, "exported@example.com")
+        self.assertEqual(users[1].name, "Two")
+
+        mock_get.reset_mock()
+        self.assertEqual(len(list(fetch_auth0_users_from_file(export.name, enrich=False))), 3)
+        mock_get.assert_not_called()
+
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.descope_client")
+    @patch("src.migration_utils.requests.Session.get")
+    def test_process_users_reports_exported_user_without_login_id(self, mock_get, mock_client, _):
+        identity = {"connection": "Username-Password-Authentication", "user_id": "1"}
+        records = [
+            {"user_id": "auth0|1", "email": "user1@example.com", "identities": [identity]},
+            {"user_id": "auth0|2", "email": "deleted@example.com"},
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as export:
+            export.write("\n".join(json.dumps(record) for record in records))
+        self.addCleanup(os.remove, export.name)
+        # The user was deleted from Auth0 since the export, so enrichment does not return it
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = []
+        mock_client.mgmt.user.search_all.return_value = {"users": []}
+        mock_client.mgmt.user.invite_batch.return_value = {"failedUsers": []}
+
+        for batch_size in (None, 10):
+            failed_users, successful_migrated_users, _, _, found_users = process_users(
+                fetch_auth0_users_from_file(export.name), False, True, False, batch_size=batch_size
+            )
+            self.assertEqual(failed_users, ["auth0|2 Reason: no identity to use as login ID"])
+            self.assertEqual((successful_migrated_users, found_users), (1, 2))
+
+    @patch("src.migration_utils.descope_client")
+    def test_process_users_with_passwords_streams_batches(self, mock_client):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as export:
+            for i in range(5):
+                record = {
+                    "email": f"user{i}@example.com",
+                    "email_verified": True,
+                    "connection": "Username-Password-Authentication",
+                    "passwordHash": "$2b$10$hash",
+                }
+                export.write(json.dumps(record) + "\n")
+        self.addCleanup(os.remove, export.name)
+        mock_client.mgmt.user.invite_batch.return_value = {"failedUsers": []}
+
+        found, successful, failed = process_users_with_passwords(export.name, False, False, batch_size=2)
+
+        self.assertEqual((found, successful, failed), (5, 5, []))
+        self.assertEqual(mock_client.mgmt.user.invite_batch.call_count, 3)
+
+    @patch("src.migration_utils.descope_client")
+    def test_process_users_with_passwords_resumes_shards(self, mock_client):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as export:
+            for i in range(10):
+                export.write(json.dumps({"email": f"user{i}@example.com", "passwordHash": "$2b$10$hash"}) + "\n\n")
+        self.addCleanup(os.remove, export.name)
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        mock_client.mgmt.user.invite_batch.return_value = {"failedUsers": []}
+
+        shards = split_export_shards(export.name, shard_size=150)
+        self.assertGreater(len(shards), 2)
+        with open(export.name, "rb") as file:
+            data = file.read()
+        self.assertEqual((shards[0][0], shards[-1][1]), (0, len(data)))
+        for (_, end), (start, _) in zip(shards, shards[1:]):
+            self.assertEqual((end, data[end - 1:end]), (start, b"\n"))
+        shard_users = [len(list(read_auth0_export_shard(export.name, start, end))) for start, end in shards]
+        self.assertEqual(sum(shard_users), 10)
+
+        found, _, _ = process_users_with_passwords(export.name, True, False, workers=2, shard_size=150)
+        self.assertEqual(found, 10)
+
+        checkpoint = MigrationCheckpoint(os.path.join(checkpoint_dir.name, "checkpoint.ndjson"))
+        checkpoint.mark_done("password_users", 0)
+        checkpoint.save_position("password_users:1", 1)
+        found, successful, failed = process_users_with_passwords(
+            export.name, False, False, batch_size=2, checkpoint=checkpoint, workers=1, shard_size=150
+        )
+
+        invited = [user.login_id for call in mock_client.mgmt.user.invite_batch.call_args_list for user in call.kwargs["users"]]
+        self.assertEqual((found, successful, failed), (9 - shard_users[0], 9 - shard_users[0], []))
+        self.assertEqual(sorted(invited), sorted(f"user{i}@example.com" for i in range(shard_users[0] + 1, 10)))
+        self.assertTrue(all(checkpoint.is_done("password_users", index) for index in range(len(shards))))
+        self.assertTrue(checkpoint.is_completed("password_users"))
+        checkpoint.close()
+
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.create_descope_user")
+    def test_checkpoint_resume_skips_completed_work(self, mock_create, _):
+        checkpoint_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(checkpoint_dir.cleanup)
+        checkpoint_path = os.path.join(checkpoint_dir.name, "checkpoint.ndjson")
+        mock_create.return_value = (True, "", False, "")
+
+        checkpoint = MigrationCheckpoint(checkpoint_path)
+        checkpoint.save_position("users", 3)
+        checkpoint.mark_done("roles", "rol_1")
+        checkpoint.complete("organizations")
+        checkpoint.close()
+        with open(checkpoint_path, "a") as file:
+            file.write('{"phase": "users", "posi')
+
+        checkpoint = MigrationCheckpoint(checkpoint_path, resume=True)
+        self.assertEqual(checkpoint.position("users"), 3)
+        self.assertTrue(checkpoint.is_done("roles", "rol_1"))
+        self.assertTrue(checkpoint.is_completed("organizations"))
+
+        users = [Auth0User(user_id=f"auth0|{i}", name=f"User {i}") for i in range(3, 5)]
+        result = process_users(users, False, False, False, checkpoint=checkpoint)
+        checkpoint.close()
+        self.assertEqual(result[1], 2)
+
+        checkpoint = MigrationCheckpoint(checkpoint_path, resume=True)
+        self.assertEqual(checkpoint.position("users"), 5)
+        self.assertTrue(checkpoint.is_completed("users"))
+        mock_create.reset_mock()
+        self.assertEqual(process_users(iter(users), False, False, False, checkpoint=checkpoint)[4], 0)
+        mock_create.assert_not_called()
+        checkpoint.close()
+
+    def test_phase_scheduler_runs_independent_phases_together(self):
+        write_started = threading.Event()
+        order = []
+
+        def read():
+            # Only returns if the write phase runs at the same time
+            self.assertTrue(write_started.wait(5))
+            order.append("read")
+            return ["role"]
+
+        def write():
+            write_started.set()
+            order.append("write")
+            return 2
+
+        scheduler = PhaseScheduler()
+        scheduler.add("assign", lambda roles, users: (roles, users), inputs=("read", "write"))
+        scheduler.add("read", read)
+        scheduler.add("write", write)
+        scheduler.add("summary", lambda: order[-1], after=("assign",))
+
+        results = scheduler.run()
+
+        self.assertEqual(results["assign"], (["role"], 2))
+        self.assertEqual(results["summary"], "read")
+        scheduler.add("missing", lambda: None, after=("unknown",))
+        with self.assertRaises(ValueError):
+            scheduler.run()
+
+    def test_phase_scheduler_only_skips_dependents_of_failed_phase(self):
+        ran = []
+
+        def fail():
+            raise AuthException(500, "E000", "Descope is unavailable")
+
+        scheduler = PhaseScheduler()
+        scheduler.add("snapshot", fail)
+        scheduler.add("roles", lambda snapshot: ran.append("roles"), inputs=("snapshot",))
+        scheduler.add("assignments", lambda: ran.append("assignments"), after=("roles",))
+        scheduler.add("users", lambda: ran.append("users") or 3)
+
+        with self.assertRaises(AuthException):
+            scheduler.run()
+        self.assertEqual(ran, ["users"])
+
+    @patch("src.migration_utils.requests.Session.get")
+    def test_fetch_auth0_users_warns_past_api_limit(self, mock_get):
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = {"users": [{"user_id": "auth0|1"}], "total": 1500}
+
+        with self.assertLogs(level="WARNING") as logs, patch("src.migration_utils.auth0_rate_limiter", RateLimiter("Auth0", 1000)):
+            users = list(fetch_auth0_users())
+
+        self.assertEqual(len(users), 10)
+        self.assertIn("the other 500 users are not migrated. Use --from-export-job", logs.output[0])
+
+    @patch("src.migration_utils.requests.Session.get")
+    def test_fetch_auth0_users_skips_pages(self, mock_get):
+        mock_get.return_value = Mock(status_code=200)
+        mock_get.return_value.json.return_value = [{"user_id": f"auth0|{i}"} for i in range(200, 205)]
+
+        users = list(fetch_auth0_users(skip=202))
+
+        self.assertIn("page=2&", mock_get.call_args.args[0])
+        self.assertEqual([user.user_id for user in users], ["auth0|202", "auth0|203", "auth0|204"])
+
+    @patch("src.migration_utils.time.monotonic")
+    @patch("src.migration_utils.time.sleep")
+    @patch("src.migration_utils.requests.Session.get")
+    def test_rate_limiter_follows_headers(self, mock_get, mock_sleep, mock_monotonic):
+        clock = [1000.0]
+        mock_monotonic.side_effect = lambda: clock[0]
+        mock_sleep.side_effect = lambda seconds: clock.__setitem__(0, clock[0] + seconds)
+        limiter = RateLimiter("Auth0", 10)
+        reset = str(int(time.time()) + 30)
+        mock_get.side_effect = [
+            Mock(status_code=429, headers={"Retry-After": "3", "X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}),
+            Mock(status_code=200, headers={"X-RateLimit-Remaining": "20", "X-RateLimit-Reset": reset}),
+        ]
+
+        with patch("src.migration_utils.auth0_rate_limiter", limiter):
+            response = api_request_with_retry("get", f"{get_migration_context().auth0_base_url}/api/v2/users", headers={})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(clock[0], 1025)
+        self.assertAlmostEqual(limiter.rate, 20 / 30, delta=0.05)
+
+        responses = [RateLimitException(429, rate_limit_parameters={"Retry-After": 2}), {"user": {}}]
+
+        def load(login_id):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        client = SimpleNamespace(mgmt=SimpleNamespace(user=SimpleNamespace(load=load)))
+        limiter = RateLimiter("Descope", 10)
+        self.assertEqual(RateLimitedClient(client, limiter).mgmt.user.load("user1"), {"user": {}})
+        self.assertEqual(responses, [])
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 2, delta=0.1)
+
+    @patch("src.migration_utils.auth0_rate_limiter.backoff")
+    @patch("src.migration_utils.requests.Session.get")
+    def test_metrics_record_requests_per_endpoint(self, mock_get, _):
+        rate_limited = Mock(status_code=429, headers={"Retry-After": "1"})
+        response = Mock(status_code=200, headers={"Content-Length": "42"})
+        mock_get.side_effect = [rate_limited, response]
+        client = SimpleNamespace(mgmt=SimpleNamespace(role=SimpleNamespace(load_all=lambda: {"roles": []})))
+
+        with patch("src.migration_utils.metrics", MigrationMetrics()) as metrics:
+            api_request_with_retry("get", f"{get_migration_context().auth0_base_url}/api/v2/roles/rol_1/users?take=50", {})
+            RateLimitedClient(client, RateLimiter("Descope", 10)).mgmt.role.load_all()
+            metrics.observe_phase("roles", 1.5)
+
+        endpoints = {stats["endpoint"]: stats for stats in metrics.to_dict()["endpoints"]}
+        users = endpoints["GET /api/v2/roles/{id}/users"]
+        self.assertEqual((users["upstream"], users["requests"], users["retries"], users["rate_limited"]), ("auth0", 2, 1, 1))
+        self.assertEqual(users["bytes_received"], 42)
+        self.assertEqual(endpoints["mgmt.role.load_all"]["requests"], 1)
+        prometheus = metrics.to_prometheus()
+        self.assertIn('migration_phase_seconds{phase="roles"} 1.5', prometheus)
+        self.assertIn(
+            'migration_request_latency_seconds_count{upstream="auth0",endpoint="GET /api/v2/roles/{id}/users"} 2',
+            prometheus,
+        )
+
+    def test_progress_reporter_shows_rate_eta_and_backoff(self):
+        output = io.StringIO()
+        reporter = ProgressReporter(stream=output, interval=0)
+        limiter = RateLimiter("Descope", 10)
+        limiter.blocked_until = time.monotonic() + 30
+
+        with patch("src.migration_utils.descope_rate_limiter", limiter):
+            reporter.expect("Users", 100)
+            task = reporter.start("Users")
+            task.samples[0] = (task.started - 10, 0)
+            task.advance(50)
+            line = reporter.report()
+            task.finish()
+
+        self.assertRegex(line, r"Users: 50/100 \(50%\) at 5\.\d/s, ETA 1\ds")
+        self.assertIn("0 in flight, Descope paused for 30s", line)
+        self.assertIn(line + "\n", output.getvalue())
+        self.assertNotIn("\r", output.getvalue())
+        self.assertIsNone(reporter.report())
+
+    def test_progress_reporter_restarts_after_last_task_finishes(self):
+        output = io.StringIO()
+        reporter = ProgressReporter(stream=output, interval=0)
+        reporter.REFRESH_SECONDS = 0.01
+        reported = threading.Event()
+        report = reporter.report
+        reporter.report = lambda: (report(), reported.set())
+
+        reporter.start("Password users").finish()
+        task = reporter.start("Users", 10)
+        task.advance(5)
+        self.assertTrue(reported.wait(timeout=5))
+        thread = reporter._thread
+        task.finish()
+        thread.join(timeout=5)
+
+        self.assertIn("Users: 5/10", output.getvalue())
+        self.assertIsNone(reporter._thread)
+
+    @patch("src.migration_utils.httpx")
+    def test_http2_adapter_forwards_tls_and_proxy_settings(self, mock_httpx):
+        mock_httpx.Client.return_value.request.return_value = Mock(
+            status_code=200, reason_phrase="OK", headers={}, encoding="utf-8", content=b"[]"
+        )
+        adapter = Http2Adapter(4)
+        request = requests.Request("GET", "https://tenant.us.auth0.com/api/v2/users").prepare()
+
+        for _ in range(2):
+            response = adapter.send(request, verify="/etc/ca.pem", cert=("client.pem", "client.key"), proxies={"https": "http://proxy:3128"})
+
+        self.assertEqual(response.json(), [])
+        mock_httpx.Client.assert_called_once()
+        kwargs = mock_httpx.Client.call_args.kwargs
+        self.assertEqual(
+            (kwargs["verify"], kwargs["cert"], kwargs["proxy"]), ("/etc/ca.pem", ("client.pem", "client.key"), "http://proxy:3128")
+        )
+
+    def test_import_has_no_side_effects(self):
+        environ = {key: value for key, value in os.environ.items() if not key.startswith(("AUTH0_", "DESCOPE_"))}
+        environ["PYTHONPATH"] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with tempfile.TemporaryDirectory() as directory:
+            subprocess.run(
+                [sys.executable, "-c", "import src.migration_utils as m; assert m._migration_context is None"],
+                cwd=directory,
+                env=environ,
+                check=True,
+            )
+            self.assertEqual(os.listdir(directory), [])
+
+        context = MigrationContext({"AUTH0_TENANT_ID": "tenant", "DESCOPE_PROJECT_ID": "P2test"})
+        self.assertEqual(context.auth0_base_url, "https://tenant.us.auth0.com")
+        self.assertIsNone(context._descope_client)
+        self.assertIs(context.descope_client, context.descope_client)
+
+    def test_http_session_is_shared(self):
+        session = get_http_session()
+
+        self.assertIs(get_http_session(), session)
+        self.assertEqual(session.get_adapter("https://api.descope.com")._pool_maxsize, 10)
+
+    @patch("src.migration_utils.requests.Session.get")
+    def test_fetch_auth0_pages_with_totals(self, mock_get):
+        def fake_get(url, **kwargs):
+            query = parse_qs(urlparse(url).query)
+            page = int(query["page"][0])
+            self.assertEqual(query["per_page"], ["100"])
+            if "/roles/" in url:
+                role = url.split("/roles/")[1].split("/")[0]
+                items = [{"permission_name": f"{role}:{i}"} for i in range(page * 100, min(page * 100 + 100, 150))]
+                body = {"permissions": items, "total": 150}
+            else:
+                items = [{"user_id": f"auth0|{i}"} for i in range(page * 100, min(page * 100 + 100, 450))]
+                body = {"users": items, "total": 450}
+            self.assertEqual("include_totals" in query, page == 0)
+            response = Mock(status_code=200, headers={})
+            response.json.return_value = body
+            return response
+
+        mock_get.side_effect = fake_get
+
+        users = list(fetch_auth0_users())
+        permissions = get_permissions_for_roles(["rol_1", "rol_2"])
+
+        self.assertEqual([user.user_id for user in users], [f"auth0|{i}" for i in range(450)])
+        self.assertEqual(list(permissions), ["rol_1", "rol_2"])
+        self.assertEqual(
+            [permission["permission_name"] for permission in permissions["rol_2"]],
+            [f"rol_2:{i}" for i in range(150)],
+        )
+        self.assertEqual(mock_get.call_count, 9)
+
+    @patch("src.migration_utils.requests.Session.get")
+    def test_fetch_auth0_organizations_members_with_checkpoints(self, mock_get):
+        def fake_get(url, **kwargs):
+            query = parse_qs(urlparse(url).query)
+            self.assertEqual(query["take"], ["100"])
+            start = int(query.get("from", ["0"])[0])
+            organization = url.split("/organizations/")[1].split("/")[0]
+            count = 150 if organization == "org_1" else 30
+            members = [{"user_id": f"{organization}|{i}"} for i in range(start, min(start + 100, count))]
+            response = Mock(status_code=200, headers={})
+            response.json.return_value = {"members": members, "next": str(start + 100) if start + 100 < count else None}
+            return response
+
+        mock_get.side_effect = fake_get
+
+        members = fetch_auth0_organizations_members(["org_1", "org_2"])
+
+        self.assertEqual([member["user_id"] for member in members["org_1"]], [f"org_1|{i}" for i in range(150)])
+        self.assertEqual(len(members["org_2"]), 30)
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch("src.migration_utils.get_users_in_roles")
+    @patch("src.migration_utils.get_permissions_for_roles")
+    @patch("src.migration_utils.descope_client")
+    def test_process_roles_creates_shared_permissions_once(self, mock_client, mock_permissions, mock_users):
+        roles = [{"id": f"rol_{i}", "name": f"Role {i}"} for i in range(3)]
+        mock_permissions.return_value = {
+            role["id"]: [{"permission_name": "read"}, {"permission_name": "write"}, {"permission_name": f"own:{i}"}]
+            for i, role in enumerate(roles)
+        }
+        mock_users.return_value = {role["id"]: [] for role in roles}
+        mock_client.mgmt.permission.load_all.return_value = {"permissions": [{"name": "read"}, {"name": "admin"}]}
+        mock_client.mgmt.role.load_all.return_value = {"roles": [{"name": "Role 1"}]}
+        mock_client.mgmt.tenant.load_all.return_value = {"tenants": []}
+        snapshot = DescopeProjectSnapshot().load()
+
+        result = process_roles(roles, False, False, snapshot=snapshot)
+
+        mock_client.mgmt.permission.create.assert_not_called()
+        mock_client.mgmt.permission.create_batch.assert_called_once_with(
+            [{"name": name, "description": ""} for name in ["own:0", "own:1", "own:2", "write"]]
+        )
+        mock_client.mgmt.role.search.assert_not_called()
+        self.assertEqual(mock_client.mgmt.role.create.call_count, 2)
+        self.assertEqual(
+            mock_client.mgmt.role.create.call_args_list[1].kwargs["permission_names"], ["read", "write", "own:2"]
+        )
+        self.assertEqual(result[1:6], (2, 1, [], 4, ["read"]))
+        self.assertEqual(snapshot.role_names, {"Role 0", "Role 1", "Role 2"})
+        # The permissions are checked against the snapshot rather than loaded again
+        mock_client.mgmt.permission.load_all.assert_called_once()
+        self.assertLessEqual({"own:0", "own:1", "own:2", "write"}, snapshot.permission_names)
+
+    @patch("src.migration_utils.descope_client")
+    def test_assignment_aggregator_patches_each_user_once(self, mock_client):
+        user_index = DescopeUserIndex()
+        user_index.add({"loginIds": ["a@example.com"], "email": "a@example.com", "roleNames": ["Existing"], "userTenants": []})
+        user_index.add_user_object(UserObj(login_id="b@example.com", email="b@example.com"))
+        mock_client.mgmt.user.search_all.return_value = {
+            "users": [{"loginIds": ["c@example.com"], "roleNames": [], "userTenants": [{"tenantId": "org_0", "roleNames": ["Admin"]}]}]
+        }
+        mock_client.mgmt.user.patch_batch.return_value = {"patchedUsers": [], "failedUsers": []}
+
+        assignments = DescopeAssignmentAggregator()
+        for login_id in ["a@example.com", "b@example.com", "c@example.com"]:
+            assignments.add_role(login_id, "Member")
+            assignments.add_tenant(login_id, "org_1", "Tenant 1")
+        assignments.add_role("a@example.com", "Admin")
+        assignments.add_tenant("missing@example.com", "org_1", "Tenant 1")
+        failed = assignments.apply(user_index)
+
+        mock_client.mgmt.user.search_all.assert_called_once_with(
+            login_ids=["c@example.com", "missing@example.com"], limit=2
+        )
+        patched = {user.login_id: user for user in mock_client.mgmt.user.patch_batch.call_args.args[0]}
+        self.assertEqual(mock_client.mgmt.user.patch_batch.call_count, 1)
+        self.assertEqual(patched["a@example.com"].role_names, ["Admin", "Existing", "Member"])
+        self.assertEqual(patched["b@example.com"].role_names, ["Member"])
+        self.assertEqual(
+            [(tenant.tenant_id, tenant.role_names) for tenant in patched["c@example.com"].user_tenants],
+            [("org_0", ["Admin"]), ("org_1", [])],
+        )
+        self.assertEqual(list(failed), ["missing@example.com"])
+        roles_and_users, _, tenant_users, failed_tenants = assignments.summarize(failed)
+        self.assertEqual(roles_and_users, ["Mapped 3 user to Member", "Mapped 1 user to Admin"])
+        self.assertEqual(tenant_users, ["Associated 3 users with tenant: Tenant 1 "])
+        self.assertEqual(len(failed_tenants), 1)
+
+    @patch("src.migration_utils.create_custom_attributes_in_descope")
+    @patch("src.migration_utils.descope_client")
+    def test_process_users_graph_first(self, mock_client, _):
+        users = [
+            Auth0User.from_dict(
+                {
+                    "user_id": f"auth0|{i}",
+                    "name": f"User {i}",
+                    "email": f"user{i}@example.com",
+                    "identities": [{"connection": "Username-Password-Authentication", "user_id": str(i)}],
+                }
+            )
+            for i in range(3)
+        ]
+        assignments = DescopeAssignmentAggregator()
+        assignments.add_role("user0@example.com", "Admin", "auth0|0")
+        assignments.add_tenant("user0@example.com", "org_1", "Tenant 1", "auth0|0")
+        assignments.add_role("user2@example.com", "Member", "auth0|2")
+        mock_client.mgmt.user.search_all.return_value = {"users": []}
+        mock_client.mgmt.user.invite_batch.return_value = {"createdUsers": [], "failedUsers": []}
+
+        process_users(iter(users), False, False, False, batch_size=3, assignments=assignments)
+        invited = {user.login_id: user for user in mock_client.mgmt.user.invite_batch.call_args.kwargs["users"]}
+
+        self.assertEqual(invited["user0@example.com"].role_names, ["Admin"])
+        self.assertEqual([tenant.tenant_id for tenant in invited["user0@example.com"].user_tenants], ["org_1"])
+        self.assertEqual(invited["user1@example.com"].role_names, [])
+        self.assertEqual(assignments.apply(), {})
+        mock_client.mgmt.user.patch_batch.assert_not_called()
+        self.assertEqual(assignments.summarize({})[0], ["Mapped 1 user to Admin", "Mapped 1 user to Member"])
+
+    def test_json_backends_project_password_records(self):
+        line = json.dumps(
+            {"email": "user@example.com", "email_verified": True, "passwordHash": "$2b$10$hash", "logins_count": 3}
+        ).encode() + b"\n"
+        for backend in ("msgspec", "orjson", "json"):
+            with self.subTest(backend=backend):
+                if backend != "json" and importlib.util.find_spec(backend) is None:
+                    self.skipTest(f"{backend} is not installed")
+                name, loads, load_password_record = load_json_backend(backend)
+                record = load_password_record(line)
+                self.assertEqual(name, backend)
+                self.assertEqual(loads(line)["logins_count"], 3)
+                self.assertEqual((record.email, record.email_verified, record.password_hash), ("user@example.com", True, "$2b$10$hash"))
+                self.assertIsNone(record.connection)
+                self.assertFalse(hasattr(record, "logins_count"))
+
+        self.assertEqual(MigrationContext({"JSON_BACKEND": "json"}).json_backend[0], "json")
+
+    def test_auth0_user_keeps_mapped_fields(self):
+        user = Auth0User.from_dict(
+            {
+                "user_id": "sms|1",
+                "email": "user@example.com",
+                "phone_number": "+15555550100",
+                "phone_verified": True,
+                "app_metadata": {"plan": "pro"},
+                "identities": [
+                    {"connection": "Username-Password-Authentication", "provider": "auth0", "user_id": "1"},
+                    {"connection": "sms", "provider": "sms", "user_id": "1"},
+                ],
+            }
+        )
+
+        self.assertEqual(user.login_ids, ("user@example.com", "+15555550100"))
+        self.assertEqual(user.connections, ("Username-Password-Authentication", "sms"))
+        self.assertEqual(user.phone, "+15555550100")
+        self.assertFalse(hasattr(user, "__dict__"))
+        user_object = build_descope_user_object(user)
+        self.assertEqual(user_object.additional_login_ids, ["+15555550100"])
+        self.assertTrue(user_object.verified_phone)
+
 
 if __name__ == "__main__":
     unittest.main()